@@ -41,6 +41,7 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'corsheaders',
     'rest_framework',
+    'rest_framework.authtoken',
     
 ]
 
@@ -53,7 +54,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    
+    'wallets.middleware.AccessContextMiddleware',
 ]
 
 CORS_ORIGIN_WHITELIST = [
@@ -142,8 +143,37 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'wallets.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.BasicAuthentication',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'wallets.pagination.HybridPagination',
     'PAGE_SIZE': 10
 }
+
+# Alias of a cache shared by the workers, e.g. Redis or Memcached, through which changes of the
+# reference data (currencies, countries, exchange markets and asset types) reach every worker.
+# Without it each process drops only its own copy when a row is saved or deleted.
+
+REFERENCE_DATA_CACHE = os.environ.get('REFERENCE_DATA_CACHE') or None
+
+# Alias of a cache shared by the workers and the management commands, e.g. Redis or the database
+# cache, holding the valuations of wallets and accounts and the watermarks that expire them when
+# an input changes. Without it valuations are computed on every use, since a cache local to the
+# process would not see the changes made by the other processes.
+
+VALUATION_CACHE = os.environ.get('VALUATION_CACHE') or None
+
+# Token authentication: tokens expire AUTH_TOKEN_LIFETIME seconds after they are issued, and
+# every worker remembers the recently used ones for AUTH_TOKEN_CACHE_TIMEOUT seconds, which
+# bounds how long a revoked token is still accepted by the other workers.
+
+AUTH_TOKEN_LIFETIME = int(os.environ.get('AUTH_TOKEN_LIFETIME', 60 * 60 * 24 * 30))
+
+AUTH_TOKEN_CACHE_TIMEOUT = 60
+
+AUTH_TOKEN_CACHE_SIZE = 10000
+
+# Currency prices are recorded as the value of one unit of the currency in BASE_CURRENCY, other
+# exchange rates are triangulated through it.
+
+BASE_CURRENCY = 'PLN'
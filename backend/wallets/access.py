@@ -0,0 +1,150 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import cached_property
+
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from wallets.models import Account, Wallet
+
+
+_access_contexts = ContextVar('wallets_access_contexts', default=None)
+
+
+class AccessContext:
+    """
+    The wallets and accounts a user owns or co-owns, the accounts of those wallets and the
+    currencies of those accounts, each loaded with a single query on first use
+
+    Attributes:
+    -----
+    wallet_ids: set
+        The ids of the wallets the user owns or co-owns
+    account_ids: set
+        The ids of the accounts the user owns or co-owns
+    wallet_accounts: set
+        The (wallet id, account id) pairs of the accounts of those wallets
+    account_currencies: set
+        The (account id, currency id) pairs of the currencies of those accounts
+    """
+
+    def __init__(self, user):
+
+        self.user = user
+
+    @cached_property
+    def wallet_ids(self):
+        return set(Wallet.objects.filter(Q(owner=self.user) | Q(co_owners=self.user)).values_list('id', flat=True))
+
+    @cached_property
+    def account_ids(self):
+        return set(Account.objects.filter(Q(owner=self.user) | Q(co_owners=self.user)).values_list('id', flat=True))
+
+    @cached_property
+    def wallet_accounts(self):
+        return set(Account.wallets.through.objects.filter(wallet__in=self.wallet_ids).values_list('wallet_id', 'account_id'))
+
+    @cached_property
+    def account_currencies(self):
+        return set(Account.currencies.through.objects.filter(account__in=self.account_ids).values_list('account_id', 'currency_id'))
+
+    def reset(self):
+
+        for name in ['wallet_ids', 'account_ids', 'wallet_accounts', 'account_currencies']:
+            self.__dict__.pop(name, None)
+
+
+@contextmanager
+def access_scope():
+    """
+    Memoize the access checks made inside the block, e.g. while handling a request
+    """
+
+    token = _access_contexts.set({})
+    try:
+        yield
+    finally:
+        _access_contexts.reset(token)
+
+
+def get_access_context(user):
+    """
+    Return the access context of the user in the current scope, or None outside of a scope
+    """
+
+    contexts = _access_contexts.get()
+    if contexts is None or user is None or user.pk is None:
+        return None
+
+    if user.pk not in contexts:
+        contexts[user.pk] = AccessContext(user)
+
+    return contexts[user.pk]
+
+
+def invalidate_access_contexts(*args, **kwargs):
+
+    for context in (_access_contexts.get() or {}).values():
+        context.reset()
+
+
+def can_access_wallet(user, wallet):
+    """
+    Whether the user owns or co-owns the wallet
+    """
+
+    if wallet.owner_id == user.pk:
+        return True
+
+    context = get_access_context(user)
+    if context is not None:
+        return wallet.pk in context.wallet_ids
+
+    return user in wallet.co_owners.all()
+
+
+def can_access_account(user, account):
+    """
+    Whether the user owns or co-owns the account
+    """
+
+    if account.owner_id == user.pk:
+        return True
+
+    context = get_access_context(user)
+    if context is not None:
+        return account.pk in context.account_ids
+
+    return user in account.co_owners.all()
+
+
+def wallet_has_account(user, wallet, account):
+    """
+    Whether the account belongs to the wallet, answered from the access context of the user when the wallet is theirs
+    """
+
+    context = get_access_context(user)
+    if context is not None and wallet.pk in context.wallet_ids:
+        return (wallet.pk, account.pk) in context.wallet_accounts
+
+    return account in wallet.accounts.all()
+
+
+def account_has_currency(user, account, currency):
+    """
+    Whether the account holds the currency, answered from the access context of the user when the account is theirs
+    """
+
+    context = get_access_context(user)
+    if context is not None and account.pk in context.account_ids:
+        return (account.pk, currency.pk) in context.account_currencies
+
+    return currency in account.currencies.all()
+
+
+for model in [Wallet, Account]:
+    post_save.connect(invalidate_access_contexts, sender=model, dispatch_uid=f'invalidate_access_contexts_{model.__name__}_save')
+    post_delete.connect(invalidate_access_contexts, sender=model, dispatch_uid=f'invalidate_access_contexts_{model.__name__}_delete')
+
+for through in [Wallet.co_owners.through, Account.co_owners.through, Account.wallets.through, Account.currencies.through]:
+    m2m_changed.connect(invalidate_access_contexts, sender=through, dispatch_uid=f'invalidate_access_contexts_{through.__name__}')
@@ -5,7 +5,7 @@ from .models import Wallet, MarketAssetTransaction, Deposit, Withdrawal, Treasur
 from .models import Account, AccountInstitutionType, AccountInstitution, AccountType
 from .models import AssetType, MarketAsset, MarketShare, MarketETF, AssetPrice, ExchangeMarket, AssetTypeAssociation
 from .models import Deposit, UserAsset, UserTreasuryBonds
-from .models import TreasuryBonds
+from .models import TreasuryBonds, RetailBondsInterestRate
 
 # Register your models here.
 
@@ -15,7 +15,7 @@ admin.site.register([Account, AccountInstitution, AccountInstitutionType, Accoun
 admin.site.register([AssetType , MarketShare, MarketETF, AssetPrice, AssetTypeAssociation])
 admin.site.register([Deposit])
 admin.site.register([Withdrawal, UserAsset, UserTreasuryBonds])
-admin.site.register([TreasuryBonds])
+admin.site.register([TreasuryBonds, RetailBondsInterestRate])
 admin.site.register([TreasuryBondsTransaction])
 
 @admin.register(MarketAssetTransaction)
@@ -0,0 +1,141 @@
+import copy
+import datetime as dt
+import threading
+import time
+
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+
+def token_lifetime():
+    """
+    How long a token stays valid after it was issued, or None when tokens do not expire
+    """
+
+    seconds = getattr(settings, 'AUTH_TOKEN_LIFETIME', None)
+    return dt.timedelta(seconds=seconds) if seconds else None
+
+
+def token_expires_at(token):
+
+    lifetime = token_lifetime()
+    return token.created + lifetime if lifetime else None
+
+
+class TokenCache:
+    """
+    The recently used tokens and their users, kept in the memory of the process.
+
+    Entries expire after AUTH_TOKEN_CACHE_TIMEOUT seconds, or earlier when the token expires,
+    and the least recently used ones are dropped beyond AUTH_TOKEN_CACHE_SIZE entries. Deleting
+    a token or saving its user drops the entries at once in this process, the timeout bounds
+    how long other workers keep them.
+    """
+
+    def __init__(self):
+
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get(self, key):
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+
+            token, valid_until = entry
+            if valid_until <= time.monotonic():
+                del self.entries[key]
+                return None
+
+            self.entries.move_to_end(key)
+            return token
+
+    def set(self, token, timeout):
+
+        with self.lock:
+            key = token.key
+            self.entries[key] = (token, time.monotonic() + timeout)
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > getattr(settings, 'AUTH_TOKEN_CACHE_SIZE', 10000):
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def delete_user(self, user_id):
+
+        with self.lock:
+            for key in [key for key, (token, _) in self.entries.items() if token.user_id == user_id]:
+                del self.entries[key]
+
+    def clear(self):
+
+        with self.lock:
+            self.entries.clear()
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication answered from the memory of the process for recently used tokens.
+
+    The password is checked once, when the token is issued, instead of on every request as
+    with basic authentication. A token unknown to the process is looked up by its primary key
+    together with its user, and rejected once older than AUTH_TOKEN_LIFETIME seconds.
+    """
+
+    def authenticate_credentials(self, key):
+
+        token = token_cache.get(key)
+        if token is not None:
+            return (copy.copy(token.user), token)
+
+        try:
+            token = Token.objects.select_related('user').get(key=key)
+        except Token.DoesNotExist:
+            raise AuthenticationFailed('Invalid token.')
+
+        if not token.user.is_active:
+            raise AuthenticationFailed('User inactive or deleted.')
+
+        timeout = getattr(settings, 'AUTH_TOKEN_CACHE_TIMEOUT', 60)
+
+        expires_at = token_expires_at(token)
+        if expires_at is not None:
+            remaining = (expires_at - timezone.now()).total_seconds()
+            if remaining <= 0:
+                token.delete()
+                raise AuthenticationFailed('Token has expired.')
+            timeout = min(timeout, remaining)
+
+        token_cache.set(token, timeout)
+
+        return (copy.copy(token.user), token)
+
+
+def revoke_cached_token(sender, instance, **kwargs):
+    token_cache.delete(instance.key)
+
+
+def revoke_cached_user_tokens(sender, instance, **kwargs):
+    token_cache.delete_user(instance.pk)
+
+
+post_delete.connect(revoke_cached_token, sender=Token, dispatch_uid='revoke_cached_token')
+post_save.connect(revoke_cached_user_tokens, sender=User, dispatch_uid='revoke_cached_user_tokens_save')
+post_delete.connect(revoke_cached_user_tokens, sender=User, dispatch_uid='revoke_cached_user_tokens_delete')
@@ -0,0 +1,182 @@
+import datetime as dt
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from rest_framework.exceptions import ValidationError
+
+
+class Filter:
+    """
+    A whitelisted query parameter of a list view and the indexed lookup it filters on
+    """
+
+    def __init__(self, lookup, parse=str):
+
+        self.lookup = lookup
+        self.parse = parse
+
+    def lookups(self, value):
+
+        return {self.lookup: self.parse(value)}
+
+
+class InstrumentFilter(Filter):
+    """
+    Filter on an asset or bond given by its code or, for market assets, by EXCHANGE:CODE
+    """
+
+    def __init__(self, field, with_exchange=False):
+
+        super().__init__(f'{field}__code')
+        self.field = field
+        self.with_exchange = with_exchange
+
+    def lookups(self, value):
+
+        if self.with_exchange and ':' in value:
+            exchange, code = value.split(':', 1)
+            return {f'{self.field}__exchange_market__code': exchange, self.lookup: code}
+
+        return super().lookups(value)
+
+
+class DateBoundFilter(Filter):
+    """
+    Filter on a date time field from or up to a date or a date time.
+
+    Dates are turned into date time bounds, a date upper bound including the whole day,
+    so that the range stays a plain comparison on the indexed field.
+    """
+
+    def __init__(self, field, upper=False):
+
+        super().__init__(field)
+        self.upper = upper
+
+    def lookups(self, value):
+
+        date = parse_date(value)
+        if date is not None:
+            if self.upper:
+                return {f'{self.lookup}__lt': timezone.make_aware(dt.datetime.combine(date + dt.timedelta(days=1), dt.time.min))}
+            return {f'{self.lookup}__gte': timezone.make_aware(dt.datetime.combine(date, dt.time.min))}
+
+        date_time = parse_datetime(value)
+        if date_time is None:
+            raise ValueError('Date has wrong format. Use YYYY-MM-DD or YYYY-MM-DDThh:mm[:ss[.uuuuuu]][+HH:MM|-HH:MM|Z].')
+
+        if timezone.is_naive(date_time):
+            date_time = timezone.make_aware(date_time)
+
+        return {f'{self.lookup}__{"lte" if self.upper else "gte"}': date_time}
+
+
+def parse_id(value):
+
+    if not value.isdigit():
+        raise ValueError('Must be an id.')
+
+    return int(value)
+
+
+def parse_transaction_type(value):
+
+    if value not in ['B', 'S']:
+        raise ValueError('Transaction type must be B or S.')
+
+    return value
+
+
+class FilterSet:
+    """
+    The query parameters a list view can be filtered by.
+
+    Every parameter maps to a lookup backed by an index. Unknown parameters and invalid values
+    are rejected with a 400 response instead of being passed to the queryset, so clients cannot
+    filter on arbitrary relations.
+
+    Attributes:
+    -----
+    filters: dict
+        The Filter of every accepted parameter, keyed by the parameter
+    ignored: list
+        The parameters handled elsewhere, e.g. by the pagination or the view itself
+    """
+
+    filters = {}
+    ignored = ['page', 'page_size', 'cursor', 'count', 'format']
+
+    @classmethod
+    def filter_queryset(cls, queryset, params):
+
+        errors = {}
+        lookups = {}
+
+        for param, value in params.items():
+
+            if param in cls.ignored:
+                continue
+
+            if param not in cls.filters:
+                errors[param] = f'Unknown filter. Use one of: {", ".join(cls.filters)}.'
+                continue
+
+            try:
+                lookups.update(cls.filters[param].lookups(value))
+            except ValueError as error:
+                errors[param] = str(error)
+
+        if errors:
+            raise ValidationError(errors)
+
+        return queryset.filter(**lookups)
+
+
+class MarketAssetTransactionFilterSet(FilterSet):
+
+    filters = {
+        'currency': Filter('account_currency__code'),
+        'after': DateBoundFilter('transaction_date'),
+        'before': DateBoundFilter('transaction_date', upper=True),
+        'asset': InstrumentFilter('asset', with_exchange=True),
+        'type': Filter('transaction_type', parse_transaction_type),
+        'transaction_type': Filter('transaction_type', parse_transaction_type),
+        'account': Filter('account', parse_id),
+        'wallet': Filter('wallet', parse_id),
+    }
+
+
+class TreasuryBondsTransactionFilterSet(FilterSet):
+
+    filters = {
+        'currency': Filter('account_currency__code'),
+        'after': DateBoundFilter('transaction_date'),
+        'before': DateBoundFilter('transaction_date', upper=True),
+        'bond': InstrumentFilter('bond'),
+        'type': Filter('transaction_type', parse_transaction_type),
+        'transaction_type': Filter('transaction_type', parse_transaction_type),
+        'account': Filter('account', parse_id),
+        'wallet': Filter('wallet', parse_id),
+    }
+
+
+class UserAssetFilterSet(FilterSet):
+
+    filters = {
+        'currency': Filter('account_currency__code'),
+        'asset': InstrumentFilter('asset', with_exchange=True),
+        'account': Filter('account', parse_id),
+        'wallet': Filter('wallet', parse_id),
+    }
+    ignored = FilterSet.ignored + ['detailed', 'all', 'reporting_currency']
+
+
+class UserTreasuryBondsFilterSet(FilterSet):
+
+    filters = {
+        'bond': InstrumentFilter('bond'),
+        'account': Filter('account', parse_id),
+        'wallet': Filter('wallet', parse_id),
+    }
+    ignored = FilterSet.ignored + ['detailed', 'all', 'reporting_currency']
@@ -0,0 +1,36 @@
+import datetime as dt
+
+from django.core.management.base import BaseCommand
+
+from wallets.models import Wallet
+from wallets.services import build_wallet_snapshots, rebuild_wallet_snapshots, MissingExchangeRate
+
+
+class Command(BaseCommand):
+    help = 'Extend the daily value snapshots of the wallets up to today'
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('--wallet', type=int, action='append', help='Only build the snapshots of this wallet id, can be repeated')
+        parser.add_argument('--since', type=dt.date.fromisoformat, help='Rebuild the snapshots from this date (YYYY-MM-DD)')
+        parser.add_argument('--until', type=dt.date.fromisoformat, help='Build the snapshots up to this date (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+
+        wallets = Wallet.objects.all()
+        if options['wallet']:
+            wallets = wallets.filter(id__in=options['wallet'])
+
+        total = 0
+        for wallet in wallets.iterator():
+            try:
+                if options['since']:
+                    created = rebuild_wallet_snapshots(wallet, options['since'], options['until'])
+                else:
+                    created = build_wallet_snapshots(wallet, options['until'])
+            except MissingExchangeRate as e:
+                self.stderr.write(self.style.WARNING(f'Skipped wallet {wallet.id}: {e}'))
+                continue
+            total += created
+
+        self.stdout.write(self.style.SUCCESS(f'Created {total} wallet snapshots.'))
@@ -0,0 +1,83 @@
+import csv
+import datetime as dt
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from wallets.models import Wallet
+from wallets.services import compute_returns
+
+
+RETURN_COLUMNS = ['wallet', 'currency', 'net_deposits', 'value', 'xirr', 'twr']
+
+
+def _setup_worker():
+    django.setup()
+
+
+def _returns_rows(wallet_ids, currency, until):
+
+    returns = compute_returns('wallet', wallet_ids, currency, until)
+
+    return [[wallet_id] + [getattr(returns[wallet_id], column) for column in RETURN_COLUMNS[1:]] for wallet_id in wallet_ids]
+
+
+def _compute_chunk(wallet_ids, currency, until):
+    """
+    Compute the returns of a chunk of wallets in a worker process, with its own database connection
+    """
+
+    try:
+        return _returns_rows(wallet_ids, currency, until)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Compute the money-weighted and time-weighted returns of the wallets as CSV'
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('--wallet', type=int, action='append', help='Only compute the returns of this wallet id, can be repeated')
+        parser.add_argument('--currency', help='The code of the currency to report in, the base currency by default')
+        parser.add_argument('--until', type=dt.date.fromisoformat, help='Compute the returns as of this date (YYYY-MM-DD)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='The number of worker processes, 1 computes in this process')
+        parser.add_argument('--chunk-size', type=int, default=500, help='The number of wallets every worker solves at once')
+        parser.add_argument('--output', help='Write the CSV to this file instead of the standard output')
+
+    def handle(self, *args, **options):
+
+        wallets = Wallet.objects.order_by('id')
+        if options['wallet']:
+            wallets = wallets.filter(id__in=options['wallet'])
+
+        wallet_ids = list(wallets.values_list('id', flat=True))
+        chunk_size = max(options['chunk_size'], 1)
+        chunks = [wallet_ids[start:start + chunk_size] for start in range(0, len(wallet_ids), chunk_size)]
+
+        currency, until = options['currency'], options['until']
+
+        if options['workers'] > 1 and len(chunks) > 1:
+            # Worker processes must not share the connections of this one
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers'], initializer=_setup_worker) as executor:
+                results = list(executor.map(_compute_chunk, chunks, [currency] * len(chunks), [until] * len(chunks)))
+        else:
+            results = [_returns_rows(chunk, currency, until) for chunk in chunks]
+
+        output = open(options['output'], 'w', newline='') if options['output'] else self.stdout
+        try:
+            writer = csv.writer(output, lineterminator='\n')
+            writer.writerow(RETURN_COLUMNS)
+            for rows in results:
+                writer.writerows(rows)
+        finally:
+            if options['output']:
+                output.close()
+
+        self.stderr.write(self.style.SUCCESS(f'Computed the returns of {len(wallet_ids)} wallets.'))
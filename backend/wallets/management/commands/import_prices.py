@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from wallets.services import import_asset_prices, import_currency_prices, read_price_file
+
+
+class Command(BaseCommand):
+    help = (
+        'Bulk import asset prices from a CSV or Parquet file with date, price and asset (EXCHANGE:CODE) or exchange and code columns, '
+        'or with --currencies the history of currency prices from a file with currency, date and price columns'
+    )
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('path', help='Path to the price file')
+        parser.add_argument('--format', choices=['csv', 'parquet'], help='File format, guessed from the extension by default')
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Number of rows validated and written at once')
+        parser.add_argument('--source', help='Source stored with rows that do not provide one')
+        parser.add_argument('--currencies', action='store_true', help='Import currency prices in the base currency instead of asset prices')
+
+    def handle(self, *args, **options):
+
+        def report_progress(result):
+            self.stdout.write(f'{result.rows_read} rows read, {result.rows_inserted} inserted ({result.rows_per_second:.0f} rows/s)')
+
+        try:
+            import_prices = import_currency_prices if options['currencies'] else import_asset_prices
+
+            result = import_prices(
+                read_price_file(options['path'], options['format']),
+                chunk_size=options['chunk_size'],
+                source=options['source'],
+                progress=report_progress
+            )
+        except (OSError, ValueError) as error:
+            raise CommandError(str(error))
+
+        for row_number, message in result.errors[:20]:
+            self.stderr.write(f'Row {row_number}: {message}')
+        if result.rows_rejected > 20:
+            self.stderr.write(f'... and {result.rows_rejected - 20} more rejected rows')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {result.rows_inserted} prices, skipped {result.rows_skipped} already loaded and rejected {result.rows_rejected} '
+            f'rows in {result.elapsed:.2f}s ({result.rows_per_second:.0f} rows/s).'
+        ))
@@ -0,0 +1,34 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from wallets.services import import_market_transactions, read_transaction_file
+
+
+class Command(BaseCommand):
+    help = 'Import market asset transactions of a user from a CSV broker statement'
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('path', help='Path to the CSV file, with the fields of the market transaction API as columns')
+        parser.add_argument('--user', required=True, help='Username of the owner of the transactions')
+        parser.add_argument('--dry-run', action='store_true', help='Only validate the file')
+
+    def handle(self, *args, **options):
+
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f'User {options["user"]} does not exist.')
+
+        result = import_market_transactions(user, read_transaction_file(options['path']), dry_run=options['dry_run'])
+
+        if not result.is_valid:
+            for row, errors in result.errors[:20]:
+                for field, message in errors.items():
+                    self.stderr.write(f'Row {row}: {field}: {message}')
+            raise CommandError(f'Rejected {len(result.errors)} rows, nothing was imported.')
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'Validated {len(result.transactions)} transactions.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Imported {len(result.transactions)} transactions.'))
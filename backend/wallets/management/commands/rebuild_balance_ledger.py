@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from wallets.models import AccountCurrencyBalance
+from wallets.services import rebuild_balance_ledger
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the balance ledger of the accounts from their deposits, withdrawals and transactions'
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('--account', type=int, action='append', help='Only rebuild the ledger of this account id, can be repeated')
+
+    def handle(self, *args, **options):
+
+        balances = AccountCurrencyBalance.objects.select_related('account', 'currency')
+        if options['account']:
+            balances = balances.filter(account__in=options['account'])
+
+        rebuilt = 0
+        for balance in balances.iterator():
+            adjustment = rebuild_balance_ledger(balance)
+            rebuilt += 1
+
+            if adjustment:
+                self.stdout.write(self.style.WARNING(f'{balance.account.name} ({balance.currency.code}): adjusted the ledger by {adjustment} to match the stored balance.'))
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt the ledger of {rebuilt} balances.'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from wallets.models import Currency, MarketAsset
+
+
+class Command(BaseCommand):
+    help = 'Backfill the latest price denormalized on MarketAsset and Currency from the price history'
+
+    def handle(self, *args, **options):
+
+        assets = MarketAsset.objects.refresh_latest_prices()
+        currencies = Currency.objects.refresh_latest_prices()
+
+        self.stdout.write(self.style.SUCCESS(f'Refreshed latest prices of {assets} assets and {currencies} currencies.'))
@@ -0,0 +1,17 @@
+from .access import access_scope
+
+
+class AccessContextMiddleware:
+    """
+    Memoize the ownership and membership checks made while handling a request, so that
+    permissions, serializers and model validation share a single load of them
+    """
+
+    def __init__(self, get_response):
+
+        self.get_response = get_response
+
+    def __call__(self, request):
+
+        with access_scope():
+            return self.get_response(request)
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.3 on 2026-10-17 22:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0041_retailbonds_is_first_year_interest_fixed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='currency',
+            name='last_price',
+            field=models.DecimalField(blank=True, decimal_places=10, editable=False, max_digits=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='currency',
+            name='last_price_date',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='marketasset',
+            name='last_price',
+            field=models.DecimalField(blank=True, decimal_places=10, editable=False, max_digits=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='marketasset',
+            name='last_price_date',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+    ]
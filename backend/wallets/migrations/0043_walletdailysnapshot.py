@@ -0,0 +1,31 @@
+# Generated by Django 5.0.3 on 2026-10-17 22:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0042_currency_last_price_currency_last_price_date_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WalletDailySnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('value', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('assets_value', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('bonds_value', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('cash', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('wallet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='wallets.wallet')),
+            ],
+            options={
+                'ordering': ['date'],
+                'unique_together': {('wallet', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.3 on 2026-10-17 22:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0044_userassetsale_usertreasurybondssale'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountBalanceEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('D', 'Deposit'), ('W', 'Withdrawal'), ('B', 'Buy'), ('S', 'Sell'), ('A', 'Adjustment')], max_length=1)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('balance_after', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('effective_at', models.DateTimeField()),
+                ('reference_id', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('balance', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='wallets.accountcurrencybalance')),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['balance', 'id'], name='balance_entry_latest_idx'), models.Index(fields=['balance', 'effective_at'], name='balance_entry_effective_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.0.3 on 2026-10-17 23:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0045_accountbalanceentry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='marketassettransaction',
+            index=models.Index(fields=['user', 'transaction_date', 'id'], name='market_tx_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='marketassettransaction',
+            index=models.Index(fields=['account', 'transaction_date', 'id'], name='market_tx_account_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='marketassettransaction',
+            index=models.Index(fields=['wallet', 'transaction_date', 'id'], name='market_tx_wallet_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='marketassettransaction',
+            index=models.Index(fields=['wallet', 'asset', 'transaction_date'], name='market_tx_wallet_asset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='treasurybondstransaction',
+            index=models.Index(fields=['user', 'transaction_date', 'id'], name='bond_tx_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='treasurybondstransaction',
+            index=models.Index(fields=['account', 'transaction_date', 'id'], name='bond_tx_account_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='treasurybondstransaction',
+            index=models.Index(fields=['wallet', 'transaction_date', 'id'], name='bond_tx_wallet_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='treasurybondstransaction',
+            index=models.Index(fields=['wallet', 'bond', 'transaction_date'], name='bond_tx_wallet_bond_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userasset',
+            index=models.Index(fields=['wallet', 'asset'], name='user_asset_wallet_asset_idx'),
+        ),
+    ]
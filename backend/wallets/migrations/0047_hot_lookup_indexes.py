@@ -0,0 +1,31 @@
+# Generated by Django 5.0.3 on 2026-10-17 23:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0046_transaction_filter_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='assetprice',
+            index=models.Index(fields=['asset', '-date'], include=('price',), name='asset_price_latest_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='currencyprice',
+            index=models.Index(fields=['currency', '-date'], include=('price',), name='currency_price_latest_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userasset',
+            index=models.Index(condition=models.Q(('active', True)), fields=['user', 'asset', 'account', 'created_at', 'id'], include=('amount',), name='user_asset_open_lots_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usertreasurybonds',
+            index=models.Index(condition=models.Q(('active', True)), fields=['user', 'bond', 'account', 'created_at', 'id'], include=('amount',), name='user_bonds_open_lots_idx'),
+        ),
+    ]
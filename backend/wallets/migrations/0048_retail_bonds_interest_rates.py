@@ -0,0 +1,37 @@
+# Generated by Django 5.0.3 on 2026-10-17 23:46
+
+import django.core.validators
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0047_hot_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='retailbonds',
+            name='is_interest_capitalized',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.CreateModel(
+            name='RetailBondsInterestRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.PositiveIntegerField(validators=[django.core.validators.MinValueValidator(1)])),
+                ('rate', models.DecimalField(decimal_places=3, max_digits=5, validators=[django.core.validators.MinValueValidator(Decimal('0.0'))])),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('bond', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='interest_rates', to='wallets.retailbonds')),
+            ],
+            options={
+                'verbose_name': 'Retail Bonds Interest Rate',
+                'verbose_name_plural': 'Retail Bonds Interest Rates',
+                'unique_together': {('bond', 'period')},
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.0.3 on 2026-10-18 00:08
+
+import django.utils.timezone
+import wallets.models.country
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0048_retail_bonds_interest_rates'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='currencyprice',
+            name='date',
+            field=models.DateTimeField(default=django.utils.timezone.now, validators=[wallets.models.country.past_or_present_time]),
+        ),
+    ]
@@ -0,0 +1,101 @@
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import migrations
+from django.utils import timezone
+
+
+CENT = Decimal('0.01')
+
+
+def _cents(value):
+    return Decimal(value).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def _balance_movements(apps):
+    """
+    Load the past movements of every account currency balance as (date, kind, amount, reference id),
+    keyed by (account id, currency id), with the total prices computed like TransactionQuerySet.with_total_price
+    """
+
+    Account = apps.get_model('wallets', 'Account')
+    Deposit = apps.get_model('wallets', 'Deposit')
+    Withdrawal = apps.get_model('wallets', 'Withdrawal')
+    MarketAssetTransaction = apps.get_model('wallets', 'MarketAssetTransaction')
+    TreasuryBondsTransaction = apps.get_model('wallets', 'TreasuryBondsTransaction')
+
+    movements = defaultdict(list)
+
+    for account_id, currency_id, date, amount, reference_id in Deposit.objects.values_list('account', 'currency', 'deposited_at', 'amount', 'id').iterator():
+        movements[(account_id, currency_id)].append((date, 'D', amount, reference_id))
+
+    for account_id, currency_id, date, amount, reference_id in Withdrawal.objects.values_list('account', 'currency', 'withdrawn_at', 'amount', 'id').iterator():
+        movements[(account_id, currency_id)].append((date, 'W', -amount, reference_id))
+
+    held_currencies = set(Account.currencies.through.objects.values_list('account', 'currency'))
+
+    for model, price_currency in [(MarketAssetTransaction, 'asset__price_currency'), (TreasuryBondsTransaction, 'bond__price_currency')]:
+        rows = model.objects.values_list(
+            'account', 'account_currency', price_currency, 'transaction_type', 'amount', 'price', 'currency_price', 'commission', 'transaction_date', 'id'
+        )
+
+        for account_id, currency_id, price_currency_id, transaction_type, amount, price, currency_price, commission, date, reference_id in rows.iterator():
+            if transaction_type == 'B':
+                rate = 1 if price_currency_id == currency_id else currency_price
+                total_price = -(amount * price * rate + commission)
+            else:
+                rate = 1 if (account_id, currency_id) in held_currencies else currency_price
+                total_price = amount * price * rate - commission
+
+            movements[(account_id, currency_id)].append((date, transaction_type, _cents(total_price), reference_id))
+
+    for balance_movements in movements.values():
+        balance_movements.sort(key=lambda movement: movement[0])
+
+    return movements
+
+
+def replay_balance_ledgers(apps, schema_editor):
+    """
+    Replay the ledger of every balance recorded before the ledger existed from its deposits, withdrawals
+    and transactions, as the rebuild_balance_ledger command does, so that balance_as_of also answers for
+    past dates. A balance its history does not add up to is closed with an adjustment entry.
+    """
+
+    AccountCurrencyBalance = apps.get_model('wallets', 'AccountCurrencyBalance')
+    AccountBalanceEntry = apps.get_model('wallets', 'AccountBalanceEntry')
+
+    now = timezone.now()
+    movements = _balance_movements(apps)
+    entries = []
+
+    for balance in AccountCurrencyBalance.objects.filter(entries__isnull=True).iterator():
+        running_balance = 0
+
+        for effective_at, kind, amount, reference_id in movements.get((balance.account_id, balance.currency_id), []):
+            running_balance += amount
+            entries.append(AccountBalanceEntry(
+                balance=balance,
+                kind=kind,
+                amount=amount,
+                balance_after=running_balance,
+                effective_at=effective_at,
+                reference_id=reference_id
+            ))
+
+        adjustment = balance.balance - running_balance
+        if adjustment:
+            entries.append(AccountBalanceEntry(balance=balance, kind='A', amount=adjustment, balance_after=balance.balance, effective_at=now))
+
+    AccountBalanceEntry.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0049_currency_price_history'),
+    ]
+
+    operations = [
+        migrations.RunPython(replay_balance_ledgers, migrations.RunPython.noop),
+    ]
@@ -2,11 +2,12 @@ from .abstract import BaseModel, validate_name_length
 from .country import Country, Currency, CurrencyPrice
 
 from .wallet import Wallet
-from .account import Account, AccountInstitution, AccountInstitutionType, AccountType, AccountCurrencyBalance
-from .asset import AssetType, MarketAsset, MarketShare, MarketETF, AssetPrice, ExchangeMarket, AssetTypeAssociation, UserAsset, TreasuryBonds, UserTreasuryBonds
-from .transaction import TreasuryBondsTransaction, MarketAssetTransaction, Transaction
+from .account import Account, AccountInstitution, AccountInstitutionType, AccountType, AccountCurrencyBalance, AccountBalanceEntry
+from .asset import AssetType, MarketAsset, MarketShare, MarketETF, AssetPrice, ExchangeMarket, AssetTypeAssociation, UserAsset, RetailBonds, TreasuryBonds, UserTreasuryBonds, RetailBondsInterestRate
+from .transaction import TreasuryBondsTransaction, MarketAssetTransaction, Transaction, UserAssetSale, UserTreasuryBondsSale
 from .deposit import Deposit
 from .withdrawal import Withdrawal
+from .snapshot import WalletDailySnapshot
 
 
 
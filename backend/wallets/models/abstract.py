@@ -1,10 +1,15 @@
 from django.db import models
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 
 def validate_name_length(value):
     if len(value) < 3:
         raise ValidationError('Name must be at least 3 characters long')
 
+def past_or_present_time(value):
+    if value > timezone.now():
+        raise ValidationError('Date cannot be in the future.')
+
 class BaseModel(models.Model):
 
     class Meta:
@@ -1,6 +1,9 @@
 import datetime as dt
 
 from django.db import models
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from django.core.exceptions import ValidationError
 
 from . import Wallet, Country, Currency
@@ -154,16 +157,13 @@ class Account(BaseModel):
     @property
     def current_value(self):
         """
-        Get the current value of the account
+        Get the current value of the account in the base currency, raising MissingExchangeRate when a
+        held currency has no price
         """
 
-        active_assets = self.assets.all().filter(active=True)
-        active_bonds = self.bonds.all().filter(active=True)
+        from wallets.services import account_valuation
 
-        total_value = sum([asset.current_value for asset in active_assets])
-        total_value += sum([bond.current_value for bond in active_bonds])
-
-        return total_value
+        return account_valuation(self.id).total
             
     def add_deposit(self, deposit):
         """
@@ -173,17 +173,14 @@ class Account(BaseModel):
         if deposit.account != self:
             raise ValidationError('The deposit must be made to this account.')
         
-        if deposit.currency not in self.currencies.all():
+        from wallets.access import account_has_currency
+
+        if not account_has_currency(deposit.user, self, deposit.currency):
             raise ValidationError('The currency of the deposit must be the same as the currency of the account.')
         
-        account_currency, created = self.balances.get_or_create(
-            currency=deposit.currency,
-            defaults={'balance': deposit.amount})
-
-        if not created:
+        from wallets.services import move_cash
 
-            account_currency.balance += deposit.amount
-            account_currency.save()
+        move_cash(self, deposit.currency, deposit.amount, 'D', deposit.deposited_at, deposit.id, create=True)
 
 
     def remove_deposit(self, deposit):
@@ -194,17 +191,16 @@ class Account(BaseModel):
         if deposit.account != self:
             raise ValidationError('The deposit must be made to this account.')
         
-        if deposit.currency not in self.currencies.all():
-            raise ValidationError('The currency of the deposit must be the same as the currency of the account.')
-
+        from wallets.access import account_has_currency
 
-        account_currency_balance = self.balances.filter(currency=deposit.currency).first()
+        if not account_has_currency(deposit.user, self, deposit.currency):
+            raise ValidationError('The currency of the deposit must be the same as the currency of the account.')
 
-        if account_currency_balance:
-            account_currency_balance.balance -= deposit.amount
-            account_currency_balance.save()
+        from wallets.services import move_cash
 
-        else:
+        try:
+            move_cash(self, deposit.currency, -deposit.amount, 'D', deposit.deposited_at, deposit.id)
+        except AccountCurrencyBalance.DoesNotExist:
             raise ValidationError('The account does not have a balance in the currency of the deposit.')
 
 
@@ -216,16 +212,16 @@ class Account(BaseModel):
         if withdrawal.account != self:
             raise ValidationError('The withdrawal must be made from this account.')
         
-        if withdrawal.currency not in self.currencies.all():
+        from wallets.access import account_has_currency
+
+        if not account_has_currency(withdrawal.user, self, withdrawal.currency):
             raise ValidationError('The currency of the withdrawal must be the same as the currency of the account.')
         
-        account_currency_balance = self.balances.filter(currency=withdrawal.currency).first()
+        from wallets.services import move_cash
 
-        if account_currency_balance:
-            account_currency_balance.balance -= withdrawal.amount
-            account_currency_balance.save()
-        
-        else:
+        try:
+            move_cash(self, withdrawal.currency, -withdrawal.amount, 'W', withdrawal.withdrawn_at, withdrawal.id, allow_negative=False)
+        except AccountCurrencyBalance.DoesNotExist:
             raise ValidationError('The account does not have a balance in the currency of the withdrawal.')
     
 
@@ -237,46 +233,46 @@ class Account(BaseModel):
         if withdrawal.account != self:
             raise ValidationError('The withdrawal must be made from this account.')
         
-        if withdrawal.currency not in self.currencies.all():
+        from wallets.access import account_has_currency
+
+        if not account_has_currency(withdrawal.user, self, withdrawal.currency):
             raise ValidationError('The currency of the withdrawal must be the same as the currency of the account.')
         
-        account_currency_balance = self.balances.filter(currency=withdrawal.currency).first()
+        from wallets.services import move_cash
 
-        if account_currency_balance:
-            account_currency_balance.balance += withdrawal.amount
-            account_currency_balance.save()
-
-        else:
+        try:
+            move_cash(self, withdrawal.currency, withdrawal.amount, 'W', withdrawal.withdrawn_at, withdrawal.id)
+        except AccountCurrencyBalance.DoesNotExist:
             raise ValidationError('The account does not have a balance in the currency of the withdrawal.')
     
     def verify_balance(self, currency):
         """
-        Verify the balance of the account
+        Verify the balance of the account against the sum of its ledger entries, which is recomputed
+        rather than taken from the running balance written together with the balance
         """
 
-        deposits = self.deposits.all()
-        withdrawals = self.withdrawals.all()
+        balance = self.balances.with_ledger_balance().filter(currency=currency).first()
 
-        total_deposits = sum([deposit.amount for deposit in deposits])
-        total_withdrawals = sum([withdrawal.amount for withdrawal in withdrawals])
+        if balance is None:
+            return True
 
-        total_buys = sum(
-            [transaction.total_price for transaction in self.marketassettransaction.filter(transaction_type='B')] +
-            [transaction.total_price for transaction in self.treasurybondstransaction.filter(transaction_type='B')]
-            )
-        total_sells = sum(
-            [transaction.total_price for transaction in self.marketassettransaction.filter(transaction_type='S')] +
-            [transaction.total_price for transaction in self.treasurybondstransaction.filter(transaction_type='S')]
-            )
+        return balance.verify()
 
-        current_balance = total_deposits - total_withdrawals - total_buys + total_sells
+    def balance_as_of(self, currency, date):
+        """
+        Get the balance of the account in the specified currency at the given date or date and time
+        """
 
-        if current_balance != self.get_balance(currency):
-            raise ValidationError(f'The current balance of the account is incorrect. The current balance is {self.get_balance(currency)} but should be {current_balance}.')
-        
-        else:
-            return True
-        
+        if not isinstance(date, dt.datetime):
+            date = timezone.make_aware(dt.datetime.combine(date + dt.timedelta(days=1), dt.time.min)) - dt.timedelta(microseconds=1)
+
+        total = AccountBalanceEntry.objects.filter(
+            balance__account=self,
+            balance__currency=currency,
+            effective_at__lte=date
+        ).aggregate(total=Sum('amount'))['total']
+
+        return total or 0
 
     def buy_asset(self, transaction):
         """
@@ -284,11 +280,14 @@ class Account(BaseModel):
         """
 
         from . import UserAsset
+        from wallets.services import move_cash
 
         if transaction.account != self:
             raise ValidationError('The transaction must be made with this account.')
         
-        if transaction.account_currency not in self.currencies.all():
+        from wallets.access import account_has_currency
+
+        if not account_has_currency(transaction.user, self, transaction.account_currency):
             raise ValidationError('The currency of the transaction must be the same as the currency of the account.')
         
         if transaction.transaction_type != 'B':
@@ -309,40 +308,20 @@ class Account(BaseModel):
         )
         user_asset.save()
 
-        balance_to_update = self.balances.get(currency=transaction.account_currency)
-        balance_to_update.balance -= transaction.total_price
-        balance_to_update.save()
+        move_cash(self, transaction.account_currency, -transaction.total_price, 'B', transaction.transaction_date, transaction.id, allow_negative=False)
 
-    def sell_assets(self, transaction):
+    def sell_assets(self, transaction, method='FIFO'):
+        """
+        Sell assets with the account, consuming the open lots with the given matching method
+        """
 
-        user_assets = transaction.user.assets.filter(asset=transaction.asset, account=self, active=True).order_by('created_at')
+        from . import UserAssetSale
+        from wallets.services import move_cash, sell_lots
 
-        for user_asset in user_assets:
+        user_assets = transaction.user.assets.filter(asset=transaction.asset, account=self)
+        sell_lots(user_assets, transaction, UserAssetSale, method)
 
-            if user_asset.amount > transaction.amount:
-                user_asset.amount -= transaction.amount
-                user_asset.sell_transactions.add(transaction)
-                user_asset.save()
-
-                break
-            
-            elif user_asset.amount == transaction.amount:
-                user_asset.active = False
-                user_asset.amount = 0
-                user_asset.sell_transactions.add(transaction)
-                user_asset.save()
-                break
-
-            else:
-                transaction.amount -= user_asset.amount
-                user_asset.active = False
-                user_asset.amount = 0
-                user_asset.sell_transactions.add(transaction)
-                user_asset.save()
-
-        balance_to_update = self.balances.get(currency=transaction.account_currency)
-        balance_to_update.balance += transaction.total_price
-        balance_to_update.save()
+        move_cash(self, transaction.account_currency, transaction.total_price, 'S', transaction.transaction_date, transaction.id)
 
     def buy_bond(self, transaction):
         """
@@ -350,11 +329,14 @@ class Account(BaseModel):
         """
 
         from . import UserTreasuryBonds
+        from wallets.services import move_cash
 
         if transaction.account != self:
             raise ValidationError('The transaction must be made with this account.')
         
-        if transaction.account_currency not in self.currencies.all():
+        from wallets.access import account_has_currency
+
+        if not account_has_currency(transaction.user, self, transaction.account_currency):
             raise ValidationError('The currency of the transaction must be the same as the currency of the account.')
         
         if transaction.transaction_type != 'B':
@@ -373,44 +355,21 @@ class Account(BaseModel):
         )
         user_bond.save()
 
-        balance_to_update = self.balances.get(currency=transaction.currency_price)
-        balance_to_update.balance -= transaction.total_price
-        balance_to_update.save()
+        move_cash(self, transaction.account_currency, -transaction.total_price, 'B', transaction.transaction_date, transaction.id, allow_negative=False)
 
     
-    def sell_bonds(self, transaction):
+    def sell_bonds(self, transaction, method='FIFO'):
         """
-        Sell bonds with the account
+        Sell bonds with the account, consuming the open lots with the given matching method
         """
 
-        user_bonds = transaction.user.bonds.filter(bond=transaction.bond, account=self, active=True).order_by('created_at')
-
-        for user_bond in user_bonds:
-
-            if user_bond.amount > transaction.amount:
-                user_bond.amount -= transaction.amount
-                user_bond.sell_transactions.add(transaction)
-                user_bond.save()
+        from . import UserTreasuryBondsSale
+        from wallets.services import move_cash, sell_lots
 
-                break
-            
-            elif user_bond.amount == transaction.amount:
-                user_bond.active = False
-                user_bond.amount = 0
-                user_bond.sell_transactions.add(transaction)
-                user_bond.save()
-                break
-
-            else:
-                transaction.amount -= user_bond.amount
-                user_bond.active = False
-                user_bond.amount = 0
-                user_bond.sell_transactions.add(transaction)
-                user_bond.save()
+        user_bonds = transaction.user.bonds.filter(bond=transaction.bond, account=self).annotate(unit_cost=F('buy_transaction__price'))
+        sell_lots(user_bonds, transaction, UserTreasuryBondsSale, method, cost=lambda lot: lot.unit_cost or 0)
 
-        balance_to_update = self.balances.get(currency=transaction.currency)
-        balance_to_update.balance += transaction.total_price
-        balance_to_update.save()
+        move_cash(self, transaction.account_currency, transaction.total_price, 'S', transaction.transaction_date, transaction.id)
 
 
 
@@ -436,14 +395,96 @@ def account_currencies_changed(sender, instance, action, **kwargs):
         #         balance.delete()
 
 
-        
+
+class AccountCurrencyBalanceQuerySet(models.QuerySet):
+
+    def with_ledger_balance(self):
+        """
+        Annotate the sum of the ledger entries of every balance, 0 without entries
+        """
+
+        entries_total = AccountBalanceEntry.objects.filter(balance=OuterRef('pk')).order_by().values('balance').annotate(total=Sum('amount')).values('total')
+
+        return self.annotate(ledger_balance=Coalesce(Subquery(entries_total), Value(0), output_field=DecimalField(max_digits=15, decimal_places=2)))
+
+
 class AccountCurrencyBalance(models.Model):
     account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='balances')
     currency = models.ForeignKey(Currency, on_delete=models.CASCADE)
     balance = models.DecimalField(max_digits=15, decimal_places=2, blank=False, null=False, default=0)
 
+    objects = AccountCurrencyBalanceQuerySet.as_manager()
+
     class Meta:
         unique_together = ['account', 'currency']
 
     def __str__(self):
-        return f'{self.account.name} - {self.currency.code} - {self.balance}'
\ No newline at end of file
+        return f'{self.account.name} - {self.currency.code} - {self.balance}'
+
+    def verify(self):
+        """
+        Verify the balance against the sum of its ledger entries, as annotated by with_ledger_balance
+        or else loaded
+        """
+
+        if not hasattr(self, 'ledger_balance'):
+            self.ledger_balance = self.entries.aggregate(total=Sum('amount'))['total'] or 0
+
+        if self.ledger_balance != self.balance:
+            raise ValidationError(f'The current balance of the account is incorrect. The current balance is {self.balance} but should be {self.ledger_balance}.')
+
+        return True
+
+
+class AccountBalanceEntry(models.Model):
+    """
+    AccountBalanceEntry model
+
+    An append-only ledger of the movements of an account currency balance.
+
+    Attributes:
+    -----
+    balance: models.ForeignKey
+        The account currency balance the movement changed
+    kind: models.CharField
+        The kind of the movement
+    amount: models.DecimalField
+        The signed amount of the movement
+    balance_after: models.DecimalField
+        The balance right after the movement
+    effective_at: models.DateTimeField
+        The date and time of the deposit, withdrawal or transaction behind the movement
+    reference_id: models.PositiveBigIntegerField
+        The id of the deposit, withdrawal or transaction behind the movement
+    created_at: models.DateTimeField
+        The date and time the movement was recorded
+    """
+
+    KINDS = [
+        ('D', 'Deposit'),
+        ('W', 'Withdrawal'),
+        ('B', 'Buy'),
+        ('S', 'Sell'),
+        ('A', 'Adjustment'),
+    ]
+
+    balance = models.ForeignKey(AccountCurrencyBalance, on_delete=models.CASCADE, related_name='entries')
+    kind = models.CharField(max_length=1, choices=KINDS)
+
+    amount = models.DecimalField(max_digits=15, decimal_places=2)
+    balance_after = models.DecimalField(max_digits=15, decimal_places=2)
+
+    effective_at = models.DateTimeField()
+    reference_id = models.PositiveBigIntegerField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['balance', 'id'], name='balance_entry_latest_idx'),
+            models.Index(fields=['balance', 'effective_at'], name='balance_entry_effective_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.balance} - {self.get_kind_display()} - {self.amount}'
@@ -4,11 +4,13 @@ from dateutil.relativedelta import relativedelta
 from decimal import Decimal, ROUND_HALF_UP
 
 from django.db import models
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Concat
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 
-from . import Currency, Country, Account, Wallet, CurrencyPrice
+from . import Currency, Country, Account, Wallet
 
 def past_or_present_date(value):
     if value > timezone.now().date():
@@ -51,6 +53,26 @@ class ExchangeMarket(models.Model):
         super().save(*args, **kwargs)  
 
 
+class MarketAssetQuerySet(models.QuerySet):
+
+    def refresh_latest_prices(self):
+        """
+        Recompute the denormalized latest price of the assets from their price history
+        """
+
+        from wallets.services import invalidate_price_valuations
+
+        latest = AssetPrice.objects.filter(asset=OuterRef('pk')).order_by('-date')
+
+        updated = self.update(
+            last_price=Subquery(latest.values('price')[:1]),
+            last_price_date=Subquery(latest.values('date')[:1])
+        )
+        invalidate_price_valuations()
+
+        return updated
+
+
 class MarketAsset(models.Model):
     
     name = models.CharField(max_length=100, blank=False, null=False)
@@ -62,9 +84,14 @@ class MarketAsset(models.Model):
     price_currency = models.ForeignKey(Currency, on_delete=models.PROTECT)
     asset_type = models.ManyToManyField(AssetType, related_name='assets', through='AssetTypeAssociation')
 
+    last_price = models.DecimalField(max_digits=20, decimal_places=10, null=True, blank=True, editable=False)
+    last_price_date = models.DateField(null=True, blank=True, editable=False)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = MarketAssetQuerySet.as_manager()
+
     def __str__(self):
         return self.name
     
@@ -121,6 +148,8 @@ class MarketShare(MarketAsset):
     company_country = models.ForeignKey(Country, on_delete=models.PROTECT)
 
     def save(self, *args, **kwargs):
+        from wallets.reference import get_reference
+
         is_new = self.id is None
 
         self.is_share = True
@@ -128,7 +157,7 @@ class MarketShare(MarketAsset):
         super().save(*args, **kwargs)
 
         if is_new:
-            AssetTypeAssociation.objects.create(asset=self, asset_type=AssetType.objects.get(name='Share'), percentage=1)
+            AssetTypeAssociation.objects.create(asset=self, asset_type=get_reference(AssetType, name='Share'), percentage=1)
 
 
 class MarketETF(MarketAsset):
@@ -156,6 +185,9 @@ class AssetPrice(models.Model):
 
     class Meta:
         unique_together = ['asset', 'date']
+        indexes = [
+            models.Index(fields=['asset', '-date'], include=['price'], name='asset_price_latest_idx'),
+        ]
 
     def __str__(self):
         return f'{self.asset.name} - {self.date} - {self.price} {self.asset.price_currency.code}'
@@ -168,6 +200,34 @@ class AssetPrice(models.Model):
         self.full_clean()
         super().save(*args, **kwargs)
 
+        MarketAsset.objects.filter(pk=self.asset_id).filter(
+            Q(last_price_date__isnull=True) | Q(last_price_date__lte=self.date)
+        ).update(last_price=self.price, last_price_date=self.date)
+
+    def delete(self, *args, **kwargs):
+
+        super().delete(*args, **kwargs)
+        MarketAsset.objects.filter(pk=self.asset_id).refresh_latest_prices()
+
+
+class UserAssetQuerySet(models.QuerySet):
+
+    def holdings(self):
+        """
+        Aggregate the lots into one row per held asset, with its EXCHANGE:CODE label, price currency,
+        latest price and market value in the price currency, resolved in the aggregate query itself
+        """
+
+        return self.values('asset').annotate(
+            label=Concat('asset__exchange_market__code', Value(':'), 'asset__code', output_field=models.CharField()),
+            price_currency=F('asset__price_currency__code'),
+            last_price=F('asset__last_price'),
+            last_price_date=F('asset__last_price_date'),
+            amount=Sum('amount')
+        ).annotate(
+            market_value=ExpressionWrapper(F('amount') * F('last_price'), output_field=DecimalField(max_digits=32, decimal_places=12))
+        ).order_by('label')
+
 
 class UserAsset(models.Model):
 
@@ -193,6 +253,19 @@ class UserAsset(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = UserAssetQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['wallet', 'asset'], name='user_asset_wallet_asset_idx'),
+            models.Index(
+                fields=['user', 'asset', 'account', 'created_at', 'id'],
+                include=['amount'],
+                condition=Q(active=True),
+                name='user_asset_open_lots_idx'
+            ),
+        ]
+
     def __str__(self):
         return f'{self.user.username} - {self.asset.name} - {self.amount} {self.currency.code}'
 
@@ -214,20 +287,29 @@ class UserAsset(models.Model):
         commission = self.commission
 
         return price_in_account_currency + commission
+
+    @property
+    def cost_basis(self):
+        """
+        The price paid for the amount still held, in the account currency and without the commission
+        """
+
+        if self.asset.price_currency_id != self.account_currency_id:
+            return self.amount * self.price * self.currency_price
+
+        return self.amount * self.price
     
     @property
     def current_value(self):
 
-        try:
-            recent_price = self.asset.prices.latest('date').price
-        except AssetPrice.DoesNotExist:
-            recent_price = self.price
+        recent_price = self.asset.last_price if self.asset.last_price is not None else self.price
 
-        if self.asset.price_currency != self.account_currency:
-            try:
-                recent_currency_price = self.asset.price_currency.prices.latest('date').price
-            except CurrencyPrice.DoesNotExist:
-                recent_currency_price = self.currency_price
+        if self.asset.price_currency_id != self.account_currency_id:
+
+            # Both prices are in the base currency, the exchange rate is triangulated through it
+            price_rate = self.asset.price_currency.base_rate
+            account_rate = self.account_currency.base_rate
+            recent_currency_price = price_rate / account_rate if price_rate and account_rate else self.currency_price
             
             return self.amount * recent_price * recent_currency_price
         
@@ -253,6 +335,7 @@ class RetailBonds(models.Model):
     initial_interest_rate = models.DecimalField(max_digits=5, decimal_places=3, validators=[MinValueValidator(Decimal('0.01'))])
     is_intrest_rate_fixed = models.BooleanField(default=True, blank=False, null=False)
     is_first_year_interest_fixed = models.BooleanField(default=True, blank=False, null=False)
+    is_interest_capitalized = models.BooleanField(default=True, blank=False, null=False)
 
     premature_withdrawal_fee = models.DecimalField(max_digits=5, decimal_places=3, validators=[MinValueValidator(Decimal('0.0'))])
     
@@ -274,16 +357,63 @@ class RetailBonds(models.Model):
             return relativedelta(months=self.duration)
         if self.duration_unit == 'Y':
             return relativedelta(years=self.duration)
-        
 
-            
-        
+    def unit_value(self, issue_date, date, redeemed=False):
+        """
+        Get the value of a single bond bought on issue_date on the given date, after the
+        premature withdrawal fee when redeemed
+        """
+
+        from wallets.services import bond_unit_value
+
+        return bond_unit_value(self, issue_date, date, redeemed)
+
+
+class RetailBondsInterestRate(models.Model):
+    """
+    RetailBondsInterestRate model
+
+    The annual interest rate of a bond series in one of its interest periods, e.g. inflation
+    plus margin announced for an indexed period. Fixed periods use the initial interest rate
+    of the series.
+
+    Attributes:
+    -----
+    bond: models.ForeignKey
+        The bond series
+    period: models.PositiveIntegerField
+        The number of the interest period, starting from 1
+    rate: models.DecimalField
+        The annual interest rate of the period, in percent
+    """
+
+    bond = models.ForeignKey(RetailBonds, related_name='interest_rates', on_delete=models.CASCADE)
+    period = models.PositiveIntegerField(validators=[MinValueValidator(1)])
+    rate = models.DecimalField(max_digits=5, decimal_places=3, validators=[MinValueValidator(Decimal('0.0'))])
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Retail Bonds Interest Rate'
+        verbose_name_plural = 'Retail Bonds Interest Rates'
+        unique_together = ['bond', 'period']
+
+    def __str__(self):
+        return f'{self.bond.code} - {self.period} - {self.rate}'
+
+    def save(self, *args, **kwargs):
+
+        self.full_clean()
+        super().save(*args, **kwargs)
 
 
 class TreasuryBonds(RetailBonds):
 
     def limit_to_bond_countries():
-        return {'name__in': [country.name for country in Country.objects.all()]}
+        from wallets.reference import reference_objects
+
+        return {'name__in': [country.name for country in reference_objects(Country)]}
 
     issuer_country = models.ForeignKey(Country, on_delete=models.PROTECT, limit_choices_to=limit_to_bond_countries)
 
@@ -292,16 +422,17 @@ class TreasuryBonds(RetailBonds):
         verbose_name_plural = 'Treasury Bonds'
 
     def save(self, *args, **kwargs):
+        from wallets.reference import get_reference, reference_objects
 
-        if self.issuer_country.name not in [country.name for country in Country.objects.all()]:
+        if self.issuer_country_id not in [country.pk for country in reference_objects(Country)]:
             raise ValidationError('Issuer must be a country issuing government bonds.')
 
-        if self.issuer_country == Country.objects.get(name='Poland'):
+        if self.issuer_country_id == get_reference(Country, name='Poland').pk:
 
             self.nominal_value = Decimal('100.00')
-            self.price_currency = Currency.objects.get(code='PLN')
+            self.price_currency = get_reference(Currency, code='PLN')
 
-        self.asset_type = AssetType.objects.get(name='Treasury Bonds')
+        self.asset_type = get_reference(AssetType, name='Treasury Bonds')
 
         self.clean_fields()
         super().save(*args, **kwargs)
@@ -334,6 +465,14 @@ class UserTreasuryBonds(models.Model):
     class Meta:
         verbose_name = 'User Bonds'
         verbose_name_plural = 'User Bonds'
+        indexes = [
+            models.Index(
+                fields=['user', 'bond', 'account', 'created_at', 'id'],
+                include=['amount'],
+                condition=Q(active=True),
+                name='user_bonds_open_lots_idx'
+            ),
+        ]
 
     def save(self, *args, **kwargs):
 
@@ -341,44 +480,32 @@ class UserTreasuryBonds(models.Model):
         super().save(*args, **kwargs)
 
     @property
-    def current_value(self):
+    def cost_basis(self):
+        """
+        The nominal value paid for the amount still held
+        """
 
-        years_from_issue = (timezone.now().date() - self.issue_date).days / 365
-
-        if years_from_issue < 1:
-
-            if self.bond.is_intrest_rate_fixed or self.bond.is_first_year_interest_fixed:
-                current_single_value = self.__first_year_interest()
-            else:
-                current_single_value = self.bond.nominal_value
-        
-        else:
-            current_single_value = self.bond.nominal_value
+        return self.amount * self.bond.nominal_value
 
-        return current_single_value * self.amount
-        
-    def __first_year_interest(self):
+    @property
+    def current_value(self):
 
-        days_from_issue = (timezone.now().date() - self.issue_date).days
+        return self.value_on(timezone.localdate())
 
-        if self.__check_if_contains_leap_year():
-            daily_interest_rate = self.bond.initial_interest_rate / 366
-        else:
-            daily_interest_rate = self.bond.initial_interest_rate / 365
-
-        current_interest_rate = round(daily_interest_rate * days_from_issue, 2) / 100
-        current_single_value = self.bond.nominal_value  * (1 + current_interest_rate)
+    @property
+    def redemption_value(self):
+        """
+        The value of the lot if redeemed today, after the premature withdrawal fee
+        """
 
-        return current_single_value 
-        
-    def __check_if_contains_leap_year(self):
-        import calendar
-        ## add a year to the issue date and check if it has a additional day
+        return self.value_on(timezone.localdate(), redeemed=True)
 
-        year = self.issue_date.year+1
-        _, days_in_feb = calendar.monthrange(year, 2)
+    def value_on(self, date, redeemed=False):
+        """
+        Get the value of the lot on the given date
+        """
 
-        return days_in_feb == 29
+        return self.bond.unit_value(self.issue_date, date, redeemed) * self.amount
  
 
 
@@ -1,8 +1,13 @@
+from decimal import Decimal
+
+from django.conf import settings
 from django.db import models
+from django.db.models import OuterRef, Q, Subquery
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
 
-from .abstract import BaseModel, validate_name_length
+from .abstract import BaseModel, past_or_present_time, validate_name_length
 
 
 class Country(models.Model):
@@ -25,6 +30,26 @@ class Country(models.Model):
         super().save(*args, **kwargs)
     
 
+class CurrencyQuerySet(models.QuerySet):
+
+    def refresh_latest_prices(self):
+        """
+        Recompute the denormalized latest price of the currencies from their price history
+        """
+
+        from wallets.services import invalidate_price_valuations
+
+        latest = CurrencyPrice.objects.filter(currency=OuterRef('pk')).order_by('-date')
+
+        updated = self.update(
+            last_price=Subquery(latest.values('price')[:1]),
+            last_price_date=Subquery(latest.values('date')[:1])
+        )
+        invalidate_price_valuations()
+
+        return updated
+
+
 class Currency(models.Model):
     name = models.CharField(max_length=100, unique=True)
     code = models.CharField(max_length=100, unique=True)
@@ -32,20 +57,34 @@ class Currency(models.Model):
     countries = models.ManyToManyField(Country, related_name='currencies')
     description = models.CharField(blank=True, max_length=1000)
 
+    last_price = models.DecimalField(max_digits=20, decimal_places=10, null=True, blank=True, editable=False)
+    last_price_date = models.DateTimeField(null=True, blank=True, editable=False)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CurrencyQuerySet.as_manager()
+
     class Meta:
         verbose_name_plural = "Currencies"
 
     def __str__(self):
         return self.code
 
+    @property
+    def base_rate(self):
+        """
+        The value of one unit of the currency in the base currency, None while it has no price
+        """
+
+        return Decimal(1) if self.code == settings.BASE_CURRENCY else self.last_price
+
 
 class CurrencyPrice(models.Model):
     currency = models.ForeignKey(Currency, related_name='prices', on_delete=models.CASCADE)
     price = models.DecimalField(max_digits=20, decimal_places=10, validators=[MinValueValidator(0)], default=0)
-    date = models.DateTimeField(auto_now_add=True)
+    # The moment the price is effective from, now unless a historical rate is recorded
+    date = models.DateTimeField(default=timezone.now, validators=[past_or_present_time])
     source = models.CharField(max_length=100, blank=True, null=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
@@ -53,6 +92,9 @@ class CurrencyPrice(models.Model):
 
     class Meta:
         verbose_name_plural = "Currency Prices"
+        indexes = [
+            models.Index(fields=['currency', '-date'], include=['price'], name='currency_price_latest_idx'),
+        ]
     
     def __str__(self):
         return f'{self.currency.code} - {self.price} - {self.date}'
@@ -63,4 +105,13 @@ class CurrencyPrice(models.Model):
             raise ValidationError('Updating a asset price is not allowed.')
         
         self.full_clean()
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+
+        Currency.objects.filter(pk=self.currency_id).filter(
+            Q(last_price_date__isnull=True) | Q(last_price_date__lte=self.date)
+        ).update(last_price=self.price, last_price_date=self.date)
+
+    def delete(self, *args, **kwargs):
+
+        super().delete(*args, **kwargs)
+        Currency.objects.filter(pk=self.currency_id).refresh_latest_prices()
\ No newline at end of file
@@ -1,13 +1,10 @@
-from django.db import models
+from django.db import models, transaction as db_transaction
 from django.utils import timezone
 from django.core.validators import MinValueValidator
 from django.core.exceptions import ValidationError
 
 from . import Account, Wallet, Currency
-
-def past_or_present_time(value):
-    if value > timezone.now():
-        raise ValidationError('Date cannot be in the future.')
+from .abstract import past_or_present_time
 
 class Deposit(models.Model):
     """
@@ -63,16 +60,18 @@ class Deposit(models.Model):
     
     def clean(self):
 
-        if self.user != self.wallet.owner and self.user not in self.wallet.co_owners.all():
+        from wallets.access import account_has_currency, can_access_account, can_access_wallet, wallet_has_account
+
+        if not can_access_wallet(self.user, self.wallet):
             raise ValidationError({'unauthorized_deposit':'The user must be the owner or a co-owner of the wallet to make a deposit.'})
         
-        if self.account not in self.wallet.accounts.all():
+        if not wallet_has_account(self.user, self.wallet, self.account):
             raise ValidationError({'account_wallet_mismatch':'The account must belong to the wallet to make a deposit.'})
         
-        if self.user != self.account.owner and self.user not in self.account.co_owners.all():
+        if not can_access_account(self.user, self.account):
             raise ValidationError({'unauthorized_deposit': 'You are not authorized to make this deposit.'})
     
-        if self.currency not in self.account.currencies.all():
+        if not account_has_currency(self.user, self.account, self.currency):
             raise ValidationError({'currency':'The currency of the deposit must be the same as the currency of the account.'})
         
         if self.amount is None:
@@ -85,14 +84,16 @@ class Deposit(models.Model):
         if is_new:
 
             self.full_clean()
-            super().save(*args, **kwargs)
 
-            self.account.add_deposit(self)
+            with db_transaction.atomic():
+                super().save(*args, **kwargs)
+                self.account.add_deposit(self)
 
         else:
             raise ValidationError({'update_deposit': 'Updating deposits will be added soon.'})
 
     def delete(self, *args, **kwargs):
 
-        self.account.remove_deposit(self)
-        super().delete(*args, **kwargs)
+        with db_transaction.atomic():
+            self.account.remove_deposit(self)
+            super().delete(*args, **kwargs)
@@ -0,0 +1,48 @@
+from django.db import models
+
+from . import Wallet
+
+
+class WalletDailySnapshot(models.Model):
+    """
+    WalletDailySnapshot model
+
+    Attributes:
+    -----
+    wallet: models.ForeignKey
+        The wallet the snapshot belongs to
+    date: models.DateField
+        The day the snapshot describes
+    value: models.DecimalField
+        The total value of the wallet at the end of the day, cash included, in the base currency
+    assets_value: models.DecimalField
+        The value of the market assets held at the end of the day, in the base currency
+    bonds_value: models.DecimalField
+        The value of the bonds held at the end of the day, in the base currency
+    cash: models.JSONField
+        The cash held at the end of the day in every currency, keyed by currency code
+    created_at: models.DateTimeField
+        The date and time the snapshot was created
+
+    Relationships:
+    -----
+    wallet: Wallet
+        The wallet the snapshot belongs to
+    """
+
+    wallet = models.ForeignKey(Wallet, related_name='snapshots', on_delete=models.CASCADE)
+    date = models.DateField()
+
+    value = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    assets_value = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    bonds_value = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    cash = models.JSONField(default=dict, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ['wallet', 'date']
+        ordering = ['date']
+
+    def __str__(self):
+        return f'{self.wallet.name} - {self.date} - {self.value}'
@@ -1,14 +1,50 @@
-from django.db import models
+from decimal import Decimal
+
+from django.db import models, transaction as db_transaction
 from django.utils import timezone
-from django.db.models import Sum
+from django.db.models import Case, DecimalField, Exists, F, OuterRef, Sum, Value, When
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
 
 from . import  Account, Wallet, Currency, MarketAsset, TreasuryBonds
+from .abstract import past_or_present_time
+
+class TransactionQuerySet(models.QuerySet):
+
+    def with_total_price(self):
+        """
+        Annotate the total price of every transaction in the account currency, computed by the database.
+
+        Buys are converted with the currency price when the asset or bond is not priced in the
+        account currency and include the commission; sells are converted when the account does
+        not hold the account currency and are net of the commission. The annotation can be
+        summed, filtered and ordered on like a field.
+        """
+
+        price_currency = f'{self.model.INSTRUMENT_FIELD}__price_currency'
+        held_currency = Account.currencies.through.objects.filter(account=OuterRef('account'), currency=OuterRef('account_currency'))
+        gross_price = F('amount') * F('price')
+
+        return self.annotate(
+            total_price=Case(
+                When(
+                    transaction_type='B',
+                    then=gross_price * Case(
+                        When(**{price_currency: F('account_currency')}, then=Value(Decimal(1))),
+                        default=F('currency_price')
+                    ) + F('commission')
+                ),
+                When(
+                    transaction_type='S',
+                    then=gross_price * Case(
+                        When(Exists(held_currency), then=Value(Decimal(1))),
+                        default=F('currency_price')
+                    ) - F('commission')
+                ),
+                output_field=DecimalField(max_digits=40, decimal_places=14)
+            )
+        )
 
-def past_or_present_time(value):
-    if value > timezone.now():
-        raise ValidationError('Date cannot be in the future.')
 
 class Transaction(models.Model):
     TRANSACTION_TYPES = [
@@ -36,24 +72,25 @@ class Transaction(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = TransactionQuerySet.as_manager()
+
     class Meta:
         abstract = True
 
     @property
     def total_price(self):  
+        if '_total_price' in self.__dict__:
+            return self._total_price
+
         if self.transaction_type == 'B':
 
             price_in_asset_currency = self.amount * self.price
-            try:
-                if self.asset.price_currency != self.account_currency:  
-                    price_in_account_currency = price_in_asset_currency * self.currency_price
-                else:
-                    price_in_account_currency = price_in_asset_currency
-            except AttributeError:
-                if self.bond.price_currency != self.account_currency:
-                    price_in_account_currency = price_in_asset_currency * self.currency_price
-                else:
-                    price_in_account_currency = price_in_asset_currency
+            instrument = getattr(self, self.INSTRUMENT_FIELD)
+
+            if instrument.price_currency_id != self.account_currency_id:
+                price_in_account_currency = price_in_asset_currency * self.currency_price
+            else:
+                price_in_account_currency = price_in_asset_currency
 
             commission = self.commission
 
@@ -63,7 +100,9 @@ class Transaction(models.Model):
 
             price_in_asset_currency = self.amount * self.price
 
-            if self.account_currency not in self.account.currencies.all():
+            from wallets.access import account_has_currency
+
+            if not account_has_currency(self.user, self.account, self.account_currency):
                 price_in_account_currency = price_in_asset_currency * self.currency_price
             else:
                 price_in_account_currency = price_in_asset_currency
@@ -74,6 +113,11 @@ class Transaction(models.Model):
 
             return price_in_account_currency - commission
 
+    @total_price.setter
+    def total_price(self, value):
+        # Set by TransactionQuerySet.with_total_price
+        self._total_price = value
+
     # def __str__(self):
 
     #     return f'{self.account.name} - {self.asset.name} - {self.amount} {self.currency.code}'
@@ -97,7 +141,9 @@ class Transaction(models.Model):
 
         if self.transaction_type == 'B':
 
-            if self.account not in self.wallet.accounts.all():
+            from wallets.access import wallet_has_account
+
+            if not wallet_has_account(self.user, self.wallet, self.account):
                 raise ValidationError({'account_wallet_mismatch': 'The account must belong to the wallet to make a transaction.'})
             
             if self.total_price > self.account.get_balance(self.account_currency):
@@ -110,19 +156,21 @@ class Transaction(models.Model):
         if is_new:
 
             self.clean()
-            super().save(*args, **kwargs)
 
-            if self.transaction_type == 'S':
-                if hasattr(self, 'asset'):
-                    self.account.sell_assets(self)
-                elif hasattr(self, 'bond'):
-                    self.account.sell_bonds(self)
+            with db_transaction.atomic():
+                super().save(*args, **kwargs)
+
+                if self.transaction_type == 'S':
+                    if hasattr(self, 'asset'):
+                        self.account.sell_assets(self)
+                    elif hasattr(self, 'bond'):
+                        self.account.sell_bonds(self)
 
-            if self.transaction_type == 'B':
-                if hasattr(self, 'asset'):
-                    self.account.buy_asset(self)
-                elif hasattr(self, 'bond'):
-                    self.account.buy_bond(self)
+                if self.transaction_type == 'B':
+                    if hasattr(self, 'asset'):
+                        self.account.buy_asset(self)
+                    elif hasattr(self, 'bond'):
+                        self.account.buy_bond(self)
 
         else:
             raise ValidationError({'transaction_update_unavailable': 'Updating transactions will be added soon.'})
@@ -134,13 +182,61 @@ class Transaction(models.Model):
 
 class MarketAssetTransaction(Transaction):
 
+    INSTRUMENT_FIELD = 'asset'
+
     asset = models.ForeignKey(MarketAsset, related_name='transactions', on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'transaction_date', 'id'], name='market_tx_user_date_idx'),
+            models.Index(fields=['account', 'transaction_date', 'id'], name='market_tx_account_date_idx'),
+            models.Index(fields=['wallet', 'transaction_date', 'id'], name='market_tx_wallet_date_idx'),
+            models.Index(fields=['wallet', 'asset', 'transaction_date'], name='market_tx_wallet_asset_idx'),
+        ]
+
 
 class TreasuryBondsTransaction(Transaction):
 
+    INSTRUMENT_FIELD = 'bond'
+
     bond = models.ForeignKey(TreasuryBonds, related_name='transactions', on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'transaction_date', 'id'], name='bond_tx_user_date_idx'),
+            models.Index(fields=['account', 'transaction_date', 'id'], name='bond_tx_account_date_idx'),
+            models.Index(fields=['wallet', 'transaction_date', 'id'], name='bond_tx_wallet_date_idx'),
+            models.Index(fields=['wallet', 'bond', 'transaction_date'], name='bond_tx_wallet_bond_idx'),
+        ]
+
+
+class LotSale(models.Model):
+    """
+    Abstract model of the part of a lot consumed by a sell transaction
+
+    Attributes:
+    -----
+    amount: models.DecimalField
+        The amount of the lot consumed by the sell transaction
+    created_at: models.DateTimeField
+        The date and time the sale was recorded
+    """
+
+    amount = models.DecimalField(max_digits=12, decimal_places=2, validators=[MinValueValidator(0)])
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        abstract = True
+
+
+class UserAssetSale(LotSale):
+
+    lot = models.ForeignKey('UserAsset', related_name='sales', on_delete=models.CASCADE)
+    transaction = models.ForeignKey(MarketAssetTransaction, related_name='lot_sales', on_delete=models.CASCADE)
 
 
+class UserTreasuryBondsSale(LotSale):
 
+    lot = models.ForeignKey('UserTreasuryBonds', related_name='sales', on_delete=models.CASCADE)
+    transaction = models.ForeignKey(TreasuryBondsTransaction, related_name='lot_sales', on_delete=models.CASCADE)
@@ -1,4 +1,6 @@
+from django.conf import settings
 from django.db import models
+from django.db.models import Sum
 from django.core.exceptions import ValidationError
 
 from . import BaseModel, validate_name_length
@@ -56,57 +58,44 @@ class Wallet(BaseModel):
     @property
     def current_value(self):
         """
-        Get the current value of the account
+        Get the current value of the wallet in the base currency, raising MissingExchangeRate when a
+        held currency has no price
         """
 
-        active_assets = self.assets.all().filter(active=True)
-        active_bonds = self.bonds.all().filter(active=True)
+        from wallets.services import wallet_valuation
 
-        total_value_assets = sum([asset.current_value for asset in active_assets])
-        total_value_bonds = sum([bond.current_value for bond in active_bonds])
-
-        total_value = total_value_assets + total_value_bonds
-
-        wallet_proportion = {
-            'assets': (total_value_assets/total_value) if total_value != 0 else 0,
-            'bonds': (total_value_bonds/total_value) if total_value != 0 else 0
-        }
-
-        return round(total_value,2)
+        return wallet_valuation(self.id).total
     
     @property
     def wallet_proportion(self):
         """
-        Get the proportion of the wallet value that is in assets and bonds
+        Get the proportion of the wallet value that is in assets and bonds, valued in the base currency
         """
 
+        from wallets.services import wallet_valuation
 
-        active_assets = self.assets.all().filter(active=True)
-        active_bonds = self.bonds.all().filter(active=True)
-
-        total_value_assets = sum([asset.current_value for asset in active_assets])
-        total_value_bonds = sum([bond.current_value for bond in active_bonds])
-
-        total_value = total_value_assets + total_value_bonds
-
-        wallet_proportion = {
-            'assets': ((total_value_assets/total_value) if total_value != 0 else 0, total_value_assets),
-            'bonds': ((total_value_bonds/total_value) if total_value != 0 else 0, total_value_bonds)
-        }
-
-        return wallet_proportion
+        return wallet_valuation(self.id).proportion
     
     @property
     def cash_balance(self):
         """
-        Get the cash balance of the account
+        Get the net deposits of the wallet in the base currency
+        """
+
+        return self.cash_balance_in(settings.BASE_CURRENCY)
+
+    def cash_balance_in(self, currency):
+        """
+        Get the net deposits of the wallet converted to the given currency code, raising
+        MissingExchangeRate when a deposited currency has no price
         """
 
-        deposits = self.deposits.all()
-        withdrawals = self.withdrawals.all()
+        from wallets.services import fx_matrix
 
-        total_deposits = sum([deposit.amount for deposit in deposits])
-        total_withdrawals = sum([withdrawal.amount for withdrawal in withdrawals])
+        balances = {}
 
-        return total_deposits - total_withdrawals
+        for related, sign in [(self.deposits, 1), (self.withdrawals, -1)]:
+            for code, amount in related.values_list('currency__code').annotate(total=Sum('amount')).order_by():
+                balances[code] = balances.get(code, 0) + sign * amount
 
+        return fx_matrix().total(balances, currency)
@@ -1,14 +1,11 @@
 
 from django.utils import timezone
-from django.db import models
+from django.db import models, transaction as db_transaction
 from django.core.validators import MinValueValidator
 from django.core.exceptions import ValidationError
 
 from . import Account, Wallet, Currency
-
-def past_or_present_time(value):
-    if value > timezone.now():
-        raise ValidationError('Date cannot be in the future.')
+from .abstract import past_or_present_time
 
 class Withdrawal(models.Model):
     """
@@ -65,16 +62,18 @@ class Withdrawal(models.Model):
     
     def clean(self):
 
-        if self.user != self.wallet.owner and self.user not in self.wallet.co_owners.all():
+        from wallets.access import account_has_currency, can_access_account, can_access_wallet, wallet_has_account
+
+        if not can_access_wallet(self.user, self.wallet):
             raise ValidationError({'unauthorized_withdrawal': 'You are not authorized to make this withdrawal.'})
         
-        if self.account not in self.wallet.accounts.all():
+        if not wallet_has_account(self.user, self.wallet, self.account):
             raise ValidationError({'account_wallet_mismatch': 'The account must belong to the wallet to make a withdrawal.'})
         
-        if self.user != self.account.owner and self.user not in self.account.co_owners.all():
+        if not can_access_account(self.user, self.account):
             raise ValidationError({'unauthorized_withdrawal': 'You are not authorized to make this withdrawal.'})
         
-        if self.currency not in self.account.currencies.all():
+        if not account_has_currency(self.user, self.account, self.currency):
             raise ValidationError({'currency':'The currency of the withdrawal must be the same as the currency of the account.'})
         
         if self.amount is None:
@@ -90,15 +89,17 @@ class Withdrawal(models.Model):
         if is_new:
 
             self.full_clean()
-            super().save(*args, **kwargs)
 
-            self.account.add_withdrawal(self)
+            with db_transaction.atomic():
+                super().save(*args, **kwargs)
+                self.account.add_withdrawal(self)
 
         else:
             raise ValidationError({'update_withdrawal': 'Updating withdrawals will be added soon.'})
 
     def delete(self, *args, **kwargs):
 
-        self.account.remove_withdrawal(self)
-        super().delete(*args, **kwargs)
+        with db_transaction.atomic():
+            self.account.remove_withdrawal(self)
+            super().delete(*args, **kwargs)
 
@@ -0,0 +1,193 @@
+import base64
+import json
+
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class HybridPagination(PageNumberPagination):
+    """
+    Page number pagination with a keyset mode for long histories.
+
+    By default pages are numbered as with PageNumberPagination. Requesting cursor (empty for
+    the first page) switches to keyset pagination: the rows are ordered by the keyset_ordering
+    of the view, e.g. (transaction_date, id), and every page continues after the last row of
+    the previous one, so deep pages cost as much as the first and no count is run.
+
+    Query parameters:
+        page_size: The number of results per page, at most max_page_size.
+        count: false skips the count query of page number pagination; count is then null.
+        cursor: The cursor of the next page, as returned in next.
+    """
+
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    default_keyset_ordering = ('id',)
+
+    def paginate_queryset(self, queryset, request, view=None):
+
+        self.request = request
+        self.keyset = self.cursor_query_param in request.query_params
+        self.counted = request.query_params.get(self.count_query_param, '').lower() not in ['0', 'false']
+        self.ordering = tuple(getattr(view, 'keyset_ordering', self.default_keyset_ordering))
+
+        if self.keyset:
+            return self.paginate_keyset(queryset, request)
+
+        if not queryset.ordered:
+            queryset = queryset.order_by(*self.ordering)
+
+        if not self.counted:
+            return self.paginate_uncounted(queryset, request)
+
+        return super().paginate_queryset(queryset, request, view)
+
+    def paginate_keyset(self, queryset, request):
+
+        page_size = self.get_page_size(request)
+        cursor = request.query_params[self.cursor_query_param]
+
+        queryset = queryset.order_by(*self.ordering)
+        if cursor:
+            queryset = queryset.filter(self.after(self.decode_cursor(cursor, queryset.model)))
+
+        rows = list(queryset[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        self.page = rows[:page_size]
+
+        return self.page
+
+    def paginate_uncounted(self, queryset, request):
+
+        page_size = self.get_page_size(request)
+
+        try:
+            self.page_number = int(request.query_params.get(self.page_query_param, 1))
+        except ValueError:
+            self.page_number = 0
+        if self.page_number < 1:
+            raise NotFound('Invalid page.')
+
+        offset = (self.page_number - 1) * page_size
+        rows = list(queryset[offset:offset + page_size + 1])
+        self.has_next = len(rows) > page_size
+        self.page = rows[:page_size]
+
+        if not self.page and self.page_number > 1:
+            raise NotFound('Invalid page.')
+
+        return self.page
+
+    def get_paginated_response(self, data):
+
+        if self.keyset or not self.counted:
+            return Response(OrderedDict([
+                ('count', None),
+                ('next', self.get_next_link()),
+                ('previous', self.get_previous_link()),
+                ('results', data)
+            ]))
+
+        return super().get_paginated_response(data)
+
+    def get_next_link(self):
+
+        if self.keyset:
+            if not self.has_next:
+                return None
+            url = self.request.build_absolute_uri()
+            return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+        if not self.counted:
+            if not self.has_next:
+                return None
+            url = self.request.build_absolute_uri()
+            return replace_query_param(url, self.page_query_param, self.page_number + 1)
+
+        return super().get_next_link()
+
+    def get_previous_link(self):
+
+        if self.keyset:
+            return None
+
+        if not self.counted:
+            if self.page_number == 1:
+                return None
+            url = self.request.build_absolute_uri()
+            if self.page_number == 2:
+                return remove_query_param(url, self.page_query_param)
+            return replace_query_param(url, self.page_query_param, self.page_number - 1)
+
+        return super().get_previous_link()
+
+    def get_html_context(self):
+
+        if self.keyset or not self.counted:
+            return {'previous_url': self.get_previous_link(), 'next_url': self.get_next_link(), 'page_links': []}
+
+        return super().get_html_context()
+
+    def after(self, values):
+        """
+        Build the filter selecting the rows that come after the given keyset values
+        """
+
+        condition = Q()
+        equal = Q()
+
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+
+        return condition
+
+    def encode_cursor(self, row):
+
+        values = []
+        for field in self.ordering:
+            name = field.lstrip('-')
+            value = row[name] if isinstance(row, dict) else getattr(row, name)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else str(value))
+
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def decode_cursor(self, cursor, model):
+        """
+        Decode the keyset values of the cursor, converted to the types of the ordering fields.
+        Values of annotations, which are not fields of the model, are kept as strings.
+        """
+
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (ValueError, TypeError):
+            raise NotFound('Invalid cursor.')
+
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound('Invalid cursor.')
+
+        decoded = []
+        for field, value in zip(self.ordering, values):
+            if not isinstance(value, str):
+                raise NotFound('Invalid cursor.')
+            try:
+                value = model._meta.get_field(field.lstrip('-')).to_python(value)
+            except FieldDoesNotExist:
+                pass
+            except ValidationError:
+                raise NotFound('Invalid cursor.')
+            decoded.append(value)
+
+        return decoded
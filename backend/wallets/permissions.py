@@ -1,5 +1,10 @@
+from django.contrib.auth.models import User
+
 from rest_framework import permissions
 
+from wallets.access import can_access_account, can_access_wallet
+from wallets.models import Account, Wallet
+
 class IsOwnerOrCoOwner(permissions.BasePermission):
     """
     Custom permission to only allow owners or co-owners of an object to read, update it.
@@ -9,10 +14,14 @@ class IsOwnerOrCoOwner(permissions.BasePermission):
         """
         Return True if permission is granted to the wallet owner or is on the co-owner list.
         """
-        try:
-            return obj.owner == request.user or request.user in obj.co_owners.all()
-        except AttributeError:
-            return obj.wallet.owner == request.user or request.user in obj.wallet.co_owners.all()
+        if isinstance(obj, Wallet):
+            return can_access_wallet(request.user, obj)
+        if isinstance(obj, Account):
+            return can_access_account(request.user, obj)
+        if isinstance(obj, User):
+            return obj == request.user
+
+        return can_access_wallet(request.user, obj.wallet)
            
     
 class IsOwner(permissions.BasePermission):
@@ -0,0 +1,140 @@
+import copy
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+
+from wallets.models import AssetType, Country, Currency, ExchangeMarket
+
+
+class ReferenceCache:
+    """
+    The rows of a reference table, loaded with a single query on first use and kept for the
+    lifetime of the process.
+
+    Reference tables are small and change only through the admin, so every lookup by a unique
+    field is answered from memory. Saving or deleting a row drops the rows of its table. When
+    the REFERENCE_DATA_CACHE setting names a shared cache, e.g. Redis or Memcached, the drop is
+    published there as a new version of the table so that the other workers reload it too.
+
+    Lookups return copies, callers can change them without affecting the cache.
+
+    Attributes:
+    -----
+    model: Model
+        The reference model
+    deferred: list
+        The fields not kept in memory, loaded from the database when read, e.g. denormalized
+        prices updated without saving the row
+    """
+
+    def __init__(self, model, deferred=()):
+
+        self.model = model
+        self.deferred = list(deferred)
+        self.lock = threading.Lock()
+        self.rows = None
+        self.indexes = {}
+        self.version = None
+
+    @property
+    def version_key(self):
+        return f'wallets:reference:{self.model._meta.label_lower}'
+
+    def shared_cache(self):
+
+        alias = getattr(settings, 'REFERENCE_DATA_CACHE', None)
+        return caches[alias] if alias else None
+
+    def load(self):
+
+        shared = self.shared_cache()
+        version = shared.get(self.version_key) if shared is not None else None
+
+        with self.lock:
+            if self.rows is None or version != self.version:
+                self.rows = list(self.model.objects.defer(*self.deferred).order_by('pk'))
+                self.indexes = {}
+                self.version = version
+
+            return self.rows
+
+    def index(self, field):
+
+        rows = self.load()
+
+        if field not in self.indexes:
+            self.indexes[field] = {getattr(row, field): row for row in rows}
+
+        return self.indexes[field]
+
+    def all(self):
+
+        return [copy.copy(row) for row in self.load()]
+
+    def get(self, **lookup):
+        """
+        Return the row with the given value of a unique field, e.g. get(code='PLN')
+        """
+
+        [(field, value)] = lookup.items()
+        field = 'pk' if field in ['pk', 'id'] else field
+
+        row = self.index(field).get(value)
+        if row is None:
+            # Rows added by another worker are found in the database until the next reload
+            row = self.model.objects.defer(*self.deferred).get(**{field: value})
+
+        return copy.copy(row)
+
+    def invalidate(self, *args, **kwargs):
+
+        with self.lock:
+            self.rows = None
+            self.indexes = {}
+
+        shared = self.shared_cache()
+        if shared is not None:
+            shared.set(self.version_key, uuid.uuid4().hex, None)
+
+
+REFERENCE_CACHES = {
+    Currency: ReferenceCache(Currency, deferred=['last_price', 'last_price_date']),
+    Country: ReferenceCache(Country),
+    ExchangeMarket: ReferenceCache(ExchangeMarket),
+    AssetType: ReferenceCache(AssetType),
+}
+
+
+def is_reference_model(model):
+
+    return model in REFERENCE_CACHES
+
+
+def get_reference(model, **lookup):
+    """
+    Return the reference row with the given value of a unique field, raising model.DoesNotExist when missing
+    """
+
+    return REFERENCE_CACHES[model].get(**lookup)
+
+
+def reference_objects(model):
+    """
+    Return every row of the reference table
+    """
+
+    return REFERENCE_CACHES[model].all()
+
+
+def invalidate_reference_data():
+
+    for reference_cache in REFERENCE_CACHES.values():
+        reference_cache.invalidate()
+
+
+for model, reference_cache in REFERENCE_CACHES.items():
+    post_save.connect(reference_cache.invalidate, sender=model, weak=False, dispatch_uid=f'invalidate_reference_{model.__name__}_save')
+    post_delete.connect(reference_cache.invalidate, sender=model, weak=False, dispatch_uid=f'invalidate_reference_{model.__name__}_delete')
@@ -6,3 +6,7 @@ from .deposit import DepositSerializer, DepositCreateSerializer
 from .transaction import TransactionSerializer, TransactionCreateSerializer, MarketAssetTransactionSerializer, MarketAssetTransactionCreateSerializer, TreasuryBondsTransactionCreateSerializer, TreasuryBondsTransactionSerializer
 from .withdrawal import WithdrawalSerializer, WithdrawalCreateSerializer
 from .assets import UserDetailedAssetSerializer, UserSimpleAssetSerializer, UserDetailedTreasuryBondsSerializer, UserSimpleTreasuryBondsSerializer
+from .snapshot import WalletDailySnapshotSerializer
+from .performance import CurrencyPerformanceSerializer
+from .allocation import AllocationSerializer
+from .returns import ReturnsSerializer
@@ -5,10 +5,18 @@ from rest_framework.fields import CharField
 from django.core.exceptions import ValidationError
 
 
-from wallets.models import Wallet, Account, AccountInstitution, AccountInstitutionType, AccountType, Currency
+from django.db.models import Prefetch
 
+from wallets.models import Wallet, Account, AccountCurrencyBalance, AccountInstitution, AccountInstitutionType, AccountType, Currency
+from wallets.access import can_access_wallet
+from wallets.reference import get_reference
+from wallets.services import account_valuations
 
-class AccountSerializer(serializers.ModelSerializer):
+from .eager import EagerLoadingMixin
+from .fields import ReferenceSlugRelatedField, ReportingCurrencyMixin, ValuationMixin, ValuedListSerializer
+
+
+class AccountSerializer(EagerLoadingMixin, ValuationMixin, ReportingCurrencyMixin, serializers.ModelSerializer):
     """
     Serializer for the Account model.
 
@@ -18,8 +26,16 @@ class AccountSerializer(serializers.ModelSerializer):
 
     Attributes:
         wallet_id: A PrimaryKeyRelatedField that represents the wallet associated with the account.
+
+    With a reporting currency the current value of the holdings and the cash balance of the
+    account are added, converted to it.
+
+    The balances are loaded with the running balances of their ledgers, which they are verified
+    against, and the accounts of a list are valued at once.
     """
 
+    valuations = staticmethod(account_valuations)
+
     owner_id = CharField(source='owner.id', read_only=True)
     wallets = serializers.PrimaryKeyRelatedField(many=True, queryset=Wallet.objects.all())
 
@@ -31,7 +47,7 @@ class AccountSerializer(serializers.ModelSerializer):
         slug_field='name',
         queryset=AccountInstitution.objects.all()
     )
-    currencies = serializers.SlugRelatedField(
+    currencies = ReferenceSlugRelatedField(
         many=True,
         slug_field='code',
         queryset=Currency.objects.all()
@@ -41,16 +57,32 @@ class AccountSerializer(serializers.ModelSerializer):
     class Meta:
         model = Account
         fields = ['id', 'owner_id', 'name', 'wallets', 'type', 'institution', 'description', 'currencies', 'balances', 'created_at', 'updated_at']
+        list_serializer_class = ValuedListSerializer
+        select_related = ['owner']
+        prefetch_related = ['currencies', Prefetch('balances', queryset=AccountCurrencyBalance.objects.with_ledger_balance())]
 
     def to_representation(self, instance):
 
         representation = super().to_representation(instance)
-        
-        for currency in instance.currencies.all():
+
+        held = {currency.id for currency in instance.currencies.all()}
+        balances = {get_reference(Currency, pk=balance.currency_id).code: balance for balance in instance.balances.all()}
+
+        for code, balance in balances.items():
+            if balance.currency_id not in held:
+                continue
             try:
-                instance.verify_balance(currency)
+                balance.verify()
             except ValidationError as e:
-                representation[f'balance_error_{currency.code}'] = str(e)
+                representation[f'balance_error_{code}'] = str(e)
+
+        if self.reporting_currency:
+            field = serializers.DecimalField(max_digits=15, decimal_places=2)
+            balances = {code: balance.balance for code, balance in balances.items()}
+
+            representation['current_value'] = field.to_representation(self.to_reporting_currency(self.valuation(instance).values_by_currency))
+            representation['cash_balance'] = field.to_representation(self.to_reporting_currency(balances))
+            representation['currency'] = self.reporting_currency
 
         return representation
 
@@ -83,7 +115,7 @@ class AccountCreateSerializer(serializers.ModelSerializer):
         required=True
     )
     other_institution = serializers.CharField(max_length=100, required=False, allow_blank=True)
-    currencies = serializers.SlugRelatedField(
+    currencies = ReferenceSlugRelatedField(
         many=True,
         slug_field='code',
         queryset=Currency.objects.all(),
@@ -118,7 +150,7 @@ class AccountCreateSerializer(serializers.ModelSerializer):
         owner = self.context['request'].user
 
         for wallet in value:
-            if wallet.owner != owner and owner not in wallet.co_owners.all():
+            if not can_access_wallet(owner, wallet):
                 raise serializers.ValidationError("You do not have permission to create an account for this wallet.")
         
         return value
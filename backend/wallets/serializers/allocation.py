@@ -0,0 +1,38 @@
+from rest_framework import serializers
+
+
+class ExposureSerializer(serializers.Serializer):
+    """
+    Serializer for the exposure of a wallet to a single asset type or country.
+    """
+
+    name = serializers.CharField()
+    value = serializers.DecimalField(max_digits=20, decimal_places=2)
+    share = serializers.DecimalField(max_digits=7, decimal_places=4)
+
+
+class AllocationSerializer(serializers.Serializer):
+    """
+    Serializer for a wallet allocation report.
+
+    This serializer is used to convert the Allocation computed by wallet_allocation into JSON
+    representations, with the exposures ordered from the largest.
+    """
+
+    currency = serializers.CharField()
+    total = serializers.DecimalField(max_digits=20, decimal_places=2)
+    asset_types = serializers.SerializerMethodField()
+    countries = serializers.SerializerMethodField()
+
+    def exposures(self, allocation, exposures):
+
+        shares = allocation.shares(exposures)
+        rows = [{'name': name, 'value': value, 'share': shares[name]} for name, value in exposures.items()]
+
+        return ExposureSerializer(sorted(rows, key=lambda row: (-row['value'], row['name'])), many=True).data
+
+    def get_asset_types(self, allocation):
+        return self.exposures(allocation, allocation.asset_types)
+
+    def get_countries(self, allocation):
+        return self.exposures(allocation, allocation.countries)
@@ -7,11 +7,15 @@ from django.db.models import Sum
 from rest_framework.fields import CharField
 
 from wallets.models import Wallet, Account, Currency, Deposit, MarketAssetTransaction, MarketAsset, Transaction, TreasuryBondsTransaction, TreasuryBonds, UserAsset, UserTreasuryBonds
+from wallets.reference import get_reference
 
+from .eager import EagerLoadingMixin
+from .fields import ReferenceSlugRelatedField, ReportingCurrencyMixin
 
-class UserDetailedAssetSerializer(serializers.ModelSerializer):
 
-    currency = serializers.SlugRelatedField(
+class UserDetailedAssetSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+
+    account_currency = ReferenceSlugRelatedField(
         slug_field='code',
         queryset=Currency.objects.all(),
         required=True,
@@ -34,24 +38,33 @@ class UserDetailedAssetSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
     
-class UserSimpleAssetSerializer(UserDetailedAssetSerializer):
+class UserSimpleAssetSerializer(ReportingCurrencyMixin, serializers.Serializer):
+    """
+    Serializes the rows of UserAsset.objects.holdings(), which already carry every presented field.
 
-    asset = serializers.SerializerMethodField()
+    With a reporting currency the market value is also given converted to it as value.
+    """
 
-    def get_asset(self, obj):
+    asset = serializers.CharField(source='label', read_only=True)
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+    price_currency = serializers.CharField(read_only=True)
+    last_price = serializers.DecimalField(max_digits=20, decimal_places=10, read_only=True)
+    last_price_date = serializers.DateField(read_only=True)
+    market_value = serializers.DecimalField(max_digits=32, decimal_places=2, read_only=True)
 
-        asset_to_present = MarketAsset.objects.get(id=obj['asset'])
-        return f'{asset_to_present.exchange_market.code}:{asset_to_present.code}'
+    def to_representation(self, instance):
 
-    class Meta:
-        model = UserAsset
-        fields = [
-            "asset",
-            "amount"
-        ]
+        representation = super().to_representation(instance)
+
+        if self.reporting_currency:
+            value = self.to_reporting_currency({instance['price_currency']: instance['market_value'] or 0})
+            representation['value'] = self.fields['market_value'].to_representation(value)
+            representation['currency'] = self.reporting_currency
+
+        return representation
 
 
-class UserDetailedTreasuryBondsSerializer(serializers.ModelSerializer):
+class UserDetailedTreasuryBondsSerializer(EagerLoadingMixin, serializers.ModelSerializer):
 
     bond = serializers.SlugRelatedField(
         slug_field='code',
@@ -65,10 +78,13 @@ class UserDetailedTreasuryBondsSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserTreasuryBonds
         fields = '__all__'
+        prefetch_related = ['bond__interest_rates']
 
 
-class UserSimpleTreasuryBondsSerializer(UserDetailedTreasuryBondsSerializer):
-    
+class UserSimpleTreasuryBondsSerializer(ReportingCurrencyMixin, UserDetailedTreasuryBondsSerializer):
+
+        current_value = serializers.SerializerMethodField()
+
         class Meta:
             model = UserTreasuryBonds
             fields = [
@@ -76,3 +92,25 @@ class UserSimpleTreasuryBondsSerializer(UserDetailedTreasuryBondsSerializer):
                 "amount",
                 "current_value"
             ]
+            prefetch_related = ['bond__interest_rates']
+
+        def get_current_value(self, lot):
+
+            # Lot values of an already computed valuation, e.g. the cached valuation of the wallet
+            bond_values = self.context.get('bond_values', {})
+
+            value = bond_values[lot.id] if lot.id in bond_values else lot.current_value
+
+            if self.reporting_currency:
+                return self.to_reporting_currency({get_reference(Currency, pk=lot.bond.price_currency_id).code: value})
+
+            return value
+
+        def to_representation(self, instance):
+
+            representation = super().to_representation(instance)
+
+            if self.reporting_currency:
+                representation['currency'] = self.reporting_currency
+
+            return representation
@@ -6,8 +6,12 @@ from rest_framework import serializers
 from rest_framework.fields import CharField
 
 from wallets.models import Wallet, Account, Currency, Deposit
+from wallets.access import can_access_account, can_access_wallet, account_has_currency, wallet_has_account
 
-class DepositSerializer(serializers.ModelSerializer):
+from .eager import EagerLoadingMixin
+from .fields import ReferenceSlugRelatedField
+
+class DepositSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     """
     Serializer for the Deposit model.
 
@@ -25,7 +29,7 @@ class DepositSerializer(serializers.ModelSerializer):
     account_id = serializers.PrimaryKeyRelatedField(queryset=Account.objects.all())
     user_id = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())
 
-    currency = serializers.SlugRelatedField(
+    currency = ReferenceSlugRelatedField(
         slug_field='code',
         queryset=Currency.objects.all()
     )
@@ -51,7 +55,7 @@ class DepositCreateSerializer(serializers.ModelSerializer):
     wallet = serializers.PrimaryKeyRelatedField(queryset=Wallet.objects.all())
     account = serializers.PrimaryKeyRelatedField(queryset=Account.objects.all())
 
-    currency = serializers.SlugRelatedField(
+    currency = ReferenceSlugRelatedField(
         slug_field='code',
         queryset=Currency.objects.all(),
         required=True,
@@ -67,14 +71,14 @@ class DepositCreateSerializer(serializers.ModelSerializer):
 
     def validate_wallet(self, value):
 
-        if value.owner != self.context['request'].user and self.context['request'].user not in value.co_owners.all():
+        if not can_access_wallet(self.context['request'].user, value):
             raise serializers.ValidationError('You do not own this wallet.')
 
         return value
     
     def validate_account(self, value):
 
-        if value.owner != self.context['request'].user and self.context['request'].user not in value.co_owners.all():
+        if not can_access_account(self.context['request'].user, value):
             raise serializers.ValidationError('You do not own this account.')
 
         return value
@@ -83,11 +87,11 @@ class DepositCreateSerializer(serializers.ModelSerializer):
 
         account_id = self.initial_data.get('account')
         try:
-            account = Account.objects.first()
+            account = Account.objects.get(pk=account_id)
         except ObjectDoesNotExist:
             return value
 
-        if value not in account.currencies.all():
+        if not account_has_currency(self.context['request'].user, account, value):
             raise serializers.ValidationError('This currency is not supported by this account.')
         
         return value
@@ -99,7 +103,7 @@ class DepositCreateSerializer(serializers.ModelSerializer):
         account = data.get('account')
 
         if wallet and account:
-            if not wallet.accounts.filter(pk=account.pk).exists():
+            if not wallet_has_account(self.context['request'].user, wallet, account):
                 raise serializers.ValidationError({'account_wallet_mismatch': 'The account must belong to the wallet to make a deposit.'})
 
         return data
\ No newline at end of file
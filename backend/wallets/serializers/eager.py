@@ -0,0 +1,39 @@
+from rest_framework import serializers
+
+from .fields import ReferenceSlugRelatedField
+
+
+class EagerLoadingMixin:
+    """
+    Mixin for model serializers building the loading plan of the querysets they serialize.
+
+    Relations presented by more than their primary key are joined with select_related and
+    many-to-many fields are prefetched, both derived from the serializer fields. Relations
+    used by presented properties, which the fields do not reveal, are declared on Meta as
+    select_related and prefetch_related lists, the latter possibly holding Prefetch objects.
+    Reference fields are resolved from the reference data cache and need no join.
+    """
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+
+        select_related = list(getattr(cls.Meta, 'select_related', []))
+        prefetch_related = list(getattr(cls.Meta, 'prefetch_related', []))
+
+        # Relations declared with a Prefetch on Meta are loaded with its queryset only
+        declared = {getattr(lookup, 'prefetch_through', lookup) for lookup in prefetch_related}
+
+        for field in cls().fields.values():
+
+            if field.write_only or field.source == '*':
+                continue
+
+            if isinstance(field, ReferenceSlugRelatedField):
+                continue
+            elif isinstance(field, serializers.ManyRelatedField):
+                if field.source.replace('.', '__') not in declared:
+                    prefetch_related.append(field.source.replace('.', '__'))
+            elif isinstance(field, serializers.RelatedField) and not field.use_pk_only_optimization():
+                select_related.append(field.source.replace('.', '__'))
+
+        return queryset.select_related(*select_related).prefetch_related(*prefetch_related)
@@ -0,0 +1,119 @@
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+
+from rest_framework import serializers
+
+from wallets.reference import get_reference
+from wallets.services import MissingExchangeRate, fx_matrix
+
+
+class ReferenceSlugRelatedField(serializers.SlugRelatedField):
+    """
+    Slug related field of a reference model, e.g. a currency given by its code.
+
+    Both the submitted slugs and the related rows of the serialized instances are resolved
+    from the reference data cache, so the field needs neither a query nor a join.
+    """
+
+    def to_internal_value(self, data):
+
+        model = self.get_queryset().model
+
+        try:
+            return get_reference(model, **{self.slug_field: data})
+        except model.DoesNotExist:
+            self.fail('does_not_exist', slug_name=self.slug_field, value=str(data))
+        except (TypeError, ValueError):
+            self.fail('invalid')
+
+    def get_attribute(self, instance):
+
+        field = self.foreign_key(instance)
+        if field is None or field.is_cached(instance):
+            return super().get_attribute(instance)
+
+        pk = getattr(instance, field.attname)
+        if pk is None:
+            return None
+
+        return get_reference(field.related_model, pk=pk)
+
+    def foreign_key(self, instance):
+
+        if len(self.source_attrs) != 1 or not hasattr(instance, '_meta'):
+            return None
+
+        try:
+            field = instance._meta.get_field(self.source_attrs[0])
+        except FieldDoesNotExist:
+            return None
+
+        return field if field.many_to_one else None
+
+
+class ReportingCurrencyMixin:
+    """
+    Presents the values of a serializer in the reporting currency requested with ?currency=.
+
+    The view puts the code of the currency in the context as reporting_currency and the cross
+    rates of the latest currency prices as fx, so the values are converted without any query.
+    """
+
+    @property
+    def reporting_currency(self):
+        return self.context.get('reporting_currency')
+
+    def to_reporting_currency(self, amounts_by_currency):
+        """
+        Sum amounts keyed by their currency code in the reporting currency
+        """
+
+        try:
+            return self.context['fx'].total(amounts_by_currency, self.reporting_currency)
+        except MissingExchangeRate as e:
+            raise serializers.ValidationError({'currency': str(e)})
+
+    def to_base_currency(self, amounts_by_currency):
+        """
+        Sum amounts keyed by their currency code in the base currency, with the cross rates loaded
+        once for all presented objects. Raises MissingExchangeRate when a currency has no price.
+        """
+
+        if 'fx' not in self.context:
+            self.context['fx'] = fx_matrix()
+
+        return self.context['fx'].total(amounts_by_currency, settings.BASE_CURRENCY)
+
+
+class ValuedListSerializer(serializers.ListSerializer):
+    """
+    List serializer letting its child serializer value all the listed instances at once, e.g. with
+    wallet_valuations, instead of once per instance
+    """
+
+    def to_representation(self, data):
+
+        instances = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        self.context['listed_ids'] = [instance.id for instance in instances]
+
+        return super().to_representation(instances)
+
+
+class ValuationMixin:
+    """
+    Provides the valuation of the serialized instance. The first valuation needed values all the
+    instances of the list, so serializers set valuations to the function valuing many instances
+    by id and ValuedListSerializer as the list_serializer_class of their Meta.
+    """
+
+    def valuation(self, instance):
+
+        if 'valuations' not in self.context:
+            self.context['valuations'] = self.valuations(self.context.get('listed_ids', [instance.id]))
+
+        valuations = self.context['valuations']
+        if instance.id not in valuations:
+            valuations = self.valuations([instance.id])
+
+        return valuations[instance.id]
@@ -0,0 +1,17 @@
+from rest_framework import serializers
+
+
+class CurrencyPerformanceSerializer(serializers.Serializer):
+    """
+    Serializer for a single currency of a wallet performance report.
+
+    This serializer is used to convert the figures computed by wallet_performance into JSON
+    representations, with every amount rounded to two decimal places.
+    """
+
+    currency = serializers.CharField()
+    net_deposits = serializers.DecimalField(max_digits=20, decimal_places=2)
+    fees = serializers.DecimalField(max_digits=20, decimal_places=2)
+    realized = serializers.DecimalField(max_digits=20, decimal_places=2)
+    unrealized = serializers.DecimalField(max_digits=20, decimal_places=2)
+    holdings_value = serializers.DecimalField(max_digits=20, decimal_places=2)
@@ -0,0 +1,16 @@
+from rest_framework import serializers
+
+
+class ReturnsSerializer(serializers.Serializer):
+    """
+    Serializer for the returns of a wallet or an account.
+
+    This serializer is used to convert the Returns computed by compute_returns into JSON
+    representations; the rates are fractions, e.g. 0.05 for 5%, and null when unknown.
+    """
+
+    currency = serializers.CharField()
+    net_deposits = serializers.DecimalField(max_digits=20, decimal_places=2, allow_null=True)
+    value = serializers.DecimalField(max_digits=20, decimal_places=2, allow_null=True)
+    xirr = serializers.DecimalField(max_digits=20, decimal_places=6, allow_null=True)
+    twr = serializers.DecimalField(max_digits=20, decimal_places=6, allow_null=True)
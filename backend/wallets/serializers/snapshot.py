@@ -0,0 +1,16 @@
+from rest_framework import serializers
+
+from wallets.models import WalletDailySnapshot
+
+
+class WalletDailySnapshotSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the WalletDailySnapshot model.
+
+    This serializer is used to convert WalletDailySnapshot model instances into JSON
+    representations of a single point of the wallet value history.
+    """
+
+    class Meta:
+        model = WalletDailySnapshot
+        fields = ['date', 'value', 'assets_value', 'bonds_value', 'cash']
@@ -6,8 +6,12 @@ from django.db.models import Sum
 from rest_framework.fields import CharField
 
 from wallets.models import Wallet, Account, Currency, Deposit, MarketAssetTransaction, MarketAsset, Transaction, TreasuryBondsTransaction, TreasuryBonds
+from wallets.access import can_access_account, can_access_wallet, account_has_currency, wallet_has_account
 
-class TransactionSerializer(serializers.ModelSerializer):
+from .eager import EagerLoadingMixin
+from .fields import ReferenceSlugRelatedField
+
+class TransactionSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     """
     Serializer for the Transaction model.
 
@@ -21,7 +25,7 @@ class TransactionSerializer(serializers.ModelSerializer):
 
     account_id = serializers.PrimaryKeyRelatedField(queryset=Account.objects.all())
 
-    account_currency = serializers.SlugRelatedField(
+    account_currency = ReferenceSlugRelatedField(
         slug_field='code',
         queryset=Currency.objects.all(),
         required=True,
@@ -48,6 +52,11 @@ class TransactionSerializer(serializers.ModelSerializer):
         ]
         abstract = True
 
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+
+        return super().setup_eager_loading(queryset).with_total_price()
+
 class TransactionCreateSerializer(serializers.ModelSerializer):
     """
     Serializer for creating a Transaction model instance.
@@ -64,7 +73,7 @@ class TransactionCreateSerializer(serializers.ModelSerializer):
 
     code = serializers.CharField(max_length=10, required=True, write_only=True)
 
-    account_currency = serializers.SlugRelatedField(
+    account_currency = ReferenceSlugRelatedField(
         slug_field='code',
         queryset=Currency.objects.all(),
         required=True,
@@ -84,14 +93,14 @@ class TransactionCreateSerializer(serializers.ModelSerializer):
 
     def validate_wallet(self, value):
 
-        if value.owner != self.context['request'].user and self.context['request'].user not in value.co_owners.all():
+        if not can_access_wallet(self.context['request'].user, value):
             raise serializers.ValidationError('You do not own this wallet.')
 
         return value
     
     def validate_account(self, value):
 
-        if value.owner != self.context['request'].user and self.context['request'].user not in value.co_owners.all():
+        if not can_access_account(self.context['request'].user, value):
             raise serializers.ValidationError('You do not own this account.')
 
         return value
@@ -104,7 +113,7 @@ class TransactionCreateSerializer(serializers.ModelSerializer):
         except ObjectDoesNotExist:
             return value
 
-        if value not in account.currencies.all():
+        if not account_has_currency(self.context['request'].user, account, value):
             raise serializers.ValidationError('This currency is not supported by this account.')
         
         return value   
@@ -114,10 +123,9 @@ class TransactionCreateSerializer(serializers.ModelSerializer):
 
         wallet = data.get('wallet')
         account = data.get('account')
-        account_currency = Currency.objects.get(code=self.initial_data.get('account_currency'))
 
         if wallet and account:
-            if not wallet.accounts.filter(pk=account.pk).exists():
+            if not wallet_has_account(self.context['request'].user, wallet, account):
                 raise serializers.ValidationError({'account_wallet_mismatch': 'The account must belong to the wallet to make a transaction.'})
             
     #     total_price = self.calculate_total_price()
@@ -218,7 +226,7 @@ class MarketAssetTransactionCreateSerializer(TransactionCreateSerializer):
 
         code = data.get('code')
         exchange_market = data.get('exchange_market')
-        account_currency = Currency.objects.get(code=self.initial_data.get('account_currency'))
+        account_currency = data.get('account_currency')
         user = self.context['request'].user
         account = data.get('account')
 
@@ -234,7 +242,7 @@ class MarketAssetTransactionCreateSerializer(TransactionCreateSerializer):
         
         if data.get('transaction_type') == 'B':
 
-            total_price = self.calculate_total_price(asset)
+            total_price = self.calculate_total_price(asset, account_currency)
 
             if total_price > account.get_balance(account_currency):
                 raise serializers.ValidationError({"not_enough_funds":'Insufficient funds in the account.'})
@@ -256,19 +264,18 @@ class MarketAssetTransactionCreateSerializer(TransactionCreateSerializer):
 
         return data
 
-    def calculate_total_price(self, asset):
+    def calculate_total_price(self, asset, account_currency):
 
         try:
   
             amount = float(self.initial_data.get('amount'))
             price = float(self.initial_data.get('price'))
-            account_currency = self.initial_data.get('account_currency')
             currency_price = float(self.initial_data.get('currency_price'))
             commission = float(self.initial_data.get('commission'))
 
             price_in_asset_currency = amount * price
 
-            if asset.price_currency.code != account_currency:
+            if asset.price_currency_id != account_currency.id:
                 price_in_account_currency = price_in_asset_currency * currency_price
 
             else:
@@ -294,7 +301,7 @@ class TreasuryBondsTransactionSerializer(TransactionSerializer):
     """
 
     
-    account_currency = serializers.SlugRelatedField(
+    account_currency = ReferenceSlugRelatedField(
         slug_field='code',
         queryset=Currency.objects.all(),
         required=True,
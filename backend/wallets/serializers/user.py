@@ -5,7 +5,10 @@ from rest_framework import serializers
 
 from wallets.models import Wallet
 
-class UserSerializer(serializers.ModelSerializer):
+from .eager import EagerLoadingMixin
+
+
+class UserSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     """
     Serializer for the User model.
 
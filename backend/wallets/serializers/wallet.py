@@ -1,13 +1,18 @@
 from django.contrib.auth.models import User
+from django.db.models import Prefetch
 
 from rest_framework import serializers
 from rest_framework.fields import CharField
 
 from wallets.models import Wallet, Account, TreasuryBonds, UserTreasuryBonds
 from wallets.serializers.assets import UserSimpleTreasuryBondsSerializer
+from wallets.services import MissingExchangeRate, wallet_valuations
 
+from .eager import EagerLoadingMixin
+from .fields import ReportingCurrencyMixin, ValuationMixin, ValuedListSerializer
 
-class WalletSerializer(serializers.ModelSerializer):
+
+class WalletSerializer(EagerLoadingMixin, ValuationMixin, ReportingCurrencyMixin, serializers.ModelSerializer):
     """
     Serializer for the Wallet model.
 
@@ -18,18 +23,57 @@ class WalletSerializer(serializers.ModelSerializer):
     Attributes:
         owner_id: A UserSerializer instance that represents the owner of the wallet.
         co_owners: A UserSerializer instance that represents the co-owner of the wallet.
+
+    The current value of the wallet is taken from its valuation, of all the listed wallets at once
+    when listing, and is in the base currency. Without a price of a held currency it is null and
+    current_value_error names the missing rate. With a reporting currency it and the bonds are
+    converted to it.
     """
 
+    valuations = staticmethod(wallet_valuations)
+
     owner_id = CharField(source='owner.id', read_only=True)
     co_owners = serializers.PrimaryKeyRelatedField(many=True, queryset=User.objects.all(), required=False)
-    current_value = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
-    bonds = UserSimpleTreasuryBondsSerializer(many=True, read_only=True)
+    bonds = serializers.SerializerMethodField()
 
 
     class Meta:
         model = Wallet
-        fields = ['id', 'owner_id', 'co_owners', 'name', 'description', 'created_at', 'updated_at', 'current_value', 'bonds']
+        fields = ['id', 'owner_id', 'co_owners', 'name', 'description', 'created_at', 'updated_at', 'bonds']
+        list_serializer_class = ValuedListSerializer
+        select_related = ['owner']
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+
+        lots = UserSimpleTreasuryBondsSerializer.setup_eager_loading(UserTreasuryBonds.objects.all())
+
+        return super().setup_eager_loading(queryset).prefetch_related(Prefetch('bonds', queryset=lots))
+
+    def get_bonds(self, wallet):
+
+        context = {**self.context, 'bond_values': self.valuation(wallet).bond_lots}
+
+        return UserSimpleTreasuryBondsSerializer(wallet.bonds.all(), many=True, context=context).data
+
+    def to_representation(self, instance):
+
+        representation = super().to_representation(instance)
+
+        field = serializers.DecimalField(max_digits=12, decimal_places=2)
+        valuation = self.valuation(instance)
+
+        if self.reporting_currency:
+            representation['current_value'] = field.to_representation(self.to_reporting_currency(valuation.values_by_currency))
+            representation['currency'] = self.reporting_currency
+        else:
+            try:
+                representation['current_value'] = field.to_representation(self.to_base_currency(valuation.values_by_currency))
+            except MissingExchangeRate as e:
+                representation['current_value'] = None
+                representation['current_value_error'] = str(e)
 
+        return representation
 
 
 class WalletCreateSerializer(serializers.ModelSerializer):
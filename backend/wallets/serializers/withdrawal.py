@@ -4,8 +4,13 @@ from django.core.exceptions import ObjectDoesNotExist
 from rest_framework import serializers
 
 from wallets.models import Wallet, Account, Currency, Withdrawal
+from wallets.reference import get_reference
+from wallets.access import can_access_account, can_access_wallet, account_has_currency, wallet_has_account
 
-class WithdrawalSerializer(serializers.ModelSerializer):
+from .eager import EagerLoadingMixin
+from .fields import ReferenceSlugRelatedField
+
+class WithdrawalSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     """
     Serializer for the Withdrawal model.
 
@@ -23,7 +28,7 @@ class WithdrawalSerializer(serializers.ModelSerializer):
     account_id = serializers.PrimaryKeyRelatedField(queryset=Account.objects.all())
     user_id = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())
 
-    currency = serializers.SlugRelatedField(
+    currency = ReferenceSlugRelatedField(
         slug_field='code',
         queryset=Currency.objects.all()
     )
@@ -49,7 +54,7 @@ class WithdrawalCreateSerializer(serializers.ModelSerializer):
     wallet = serializers.PrimaryKeyRelatedField(queryset=Wallet.objects.all())
     account = serializers.PrimaryKeyRelatedField(queryset=Account.objects.all())
 
-    currency = serializers.SlugRelatedField(
+    currency = ReferenceSlugRelatedField(
         slug_field='code',
         queryset=Currency.objects.all(),
         required=True,
@@ -65,14 +70,14 @@ class WithdrawalCreateSerializer(serializers.ModelSerializer):
 
     def validate_wallet(self, value):
 
-        if value.owner != self.context['request'].user and self.context['request'].user not in value.co_owners.all():
+        if not can_access_wallet(self.context['request'].user, value):
             raise serializers.ValidationError('You do not own this wallet.')
 
         return value
     
     def validate_account(self, value):
 
-        if value.owner != self.context['request'].user and self.context['request'].user not in value.co_owners.all():
+        if not can_access_account(self.context['request'].user, value):
             raise serializers.ValidationError('You do not own this account.')
 
         return value
@@ -85,7 +90,7 @@ class WithdrawalCreateSerializer(serializers.ModelSerializer):
         except ObjectDoesNotExist:
             return value
 
-        if value not in account.currencies.all():
+        if not account_has_currency(self.context['request'].user, account, value):
             raise serializers.ValidationError('This currency is not supported by this account.')
         
         return value
@@ -100,7 +105,7 @@ class WithdrawalCreateSerializer(serializers.ModelSerializer):
 
         if self.initial_data.get('currency'):
             try:
-                currency = Currency.objects.get(code=self.initial_data.get('currency'))
+                currency = get_reference(Currency, code=self.initial_data.get('currency'))
             except ObjectDoesNotExist:
                 raise serializers.ValidationError('Invalid currency.')
             if value > account.get_balance(currency):
@@ -115,7 +120,7 @@ class WithdrawalCreateSerializer(serializers.ModelSerializer):
         account = data.get('account')
 
         if wallet and account:
-            if not wallet.accounts.filter(pk=account.pk).exists():
+            if not wallet_has_account(self.context['request'].user, wallet, account):
                 raise serializers.ValidationError({'account_wallet_mismatch': 'The account must belong to the wallet to make a withdrawal.'})
 
         return data
@@ -0,0 +1,13 @@
+from .bonds import BondTerms, accrue_unit_values, bond_unit_value, value_bond_lots
+from .history import PriceHistory
+from .fx import FXMatrix, FXHistory, MissingExchangeRate
+from .valuation import Valuation, value_holdings, value_holdings_by, value_wallet, value_account, wallet_valuation, account_valuation, wallet_valuations, account_valuations, invalidate_valuations, invalidate_price_valuations, fx_matrix
+from .prices import PriceImportResult, import_asset_prices, import_currency_prices, read_price_file
+from .snapshots import build_wallet_snapshots, rebuild_wallet_snapshots, downsample_snapshots, invalidate_wallet_snapshots
+from .lots import LOT_MATCHING_METHODS, match_lots, sell_lots
+from .performance import wallet_performance, invalidate_wallet_performance
+from .allocation import Allocation, wallet_allocation
+from .ledger import rebuild_balance_ledger
+from .cash import move_cash
+from .transactions import TransactionImportResult, import_market_transactions, read_transaction_file
+from .returns import Returns, xirr, time_weighted_returns, compute_returns, wallet_returns, account_returns
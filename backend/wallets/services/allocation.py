@@ -0,0 +1,154 @@
+from decimal import Decimal
+
+import numpy as np
+
+from django.conf import settings
+from django.db.models import CharField, DecimalField, F, Value
+from django.db.models.functions import Coalesce
+
+from wallets.models import MarketAsset, RetailBonds
+
+from .valuation import fx_matrix, wallet_valuation
+
+
+UNCLASSIFIED = 'Unclassified'
+
+
+class Allocation:
+    """
+    Exposure of a wallet by asset type and by country, in a single currency
+
+    Attributes:
+    -----
+    currency: str
+        The code of the currency of every value
+    total: Decimal
+        The value of all positions
+    asset_types: dict
+        The exposure to every AssetType, keyed by its name
+    countries: dict
+        The exposure to every company, fund or issuer country, keyed by its name
+    """
+
+    def __init__(self, currency, total, asset_types, countries):
+
+        self.currency = currency
+        self.total = total
+        self.asset_types = asset_types
+        self.countries = countries
+
+    def shares(self, exposures):
+        """
+        Get the share of every exposure in the total
+        """
+
+        return {name: (value / self.total if self.total else Decimal(0)) for name, value in exposures.items()}
+
+
+def _instrument_rows(asset_ids, bond_ids):
+    """
+    Load the asset type splits and the country of the held instruments with a single query.
+
+    Every row is (kind, instrument id, asset type name, percentage, country name). Market assets
+    have a row per AssetTypeAssociation, or a single row without an asset type when they have
+    none, bonds have a single row with their asset type in full.
+    """
+
+    # Every column is an annotation, so both sides of the union select them in the same order
+    columns = ['kind', 'instrument', 'type_name', 'share', 'country']
+
+    assets = MarketAsset.objects.filter(pk__in=asset_ids).annotate(
+        kind=Value('asset', output_field=CharField()),
+        instrument=F('pk'),
+        type_name=F('assettypeassociation__asset_type__name'),
+        share=F('assettypeassociation__percentage'),
+        country=Coalesce('marketshare__company_country__name', 'marketetf__fund_country__name'),
+    ).values_list(*columns)
+
+    bonds = RetailBonds.objects.filter(pk__in=bond_ids).annotate(
+        kind=Value('bond', output_field=CharField()),
+        instrument=F('pk'),
+        type_name=F('asset_type__name'),
+        share=Value(Decimal(1), output_field=DecimalField(max_digits=3, decimal_places=2)),
+        country=F('treasurybonds__issuer_country__name'),
+    ).values_list(*columns)
+
+    return list(assets.union(bonds, all=True))
+
+
+def _exposures(values, rows, index, labels, weights):
+    """
+    Multiply the position values by the (positions, labels) weight matrix in one step
+    """
+
+    matrix = np.zeros((len(values), len(labels)))
+    matrix[rows, index] = weights
+
+    return dict(zip(labels, values @ matrix))
+
+
+def wallet_allocation(wallet_id, currency=None, fx=None):
+    """
+    Break the value of the wallet down by asset type and by country, looking through ETFs.
+
+    The positions come from the cached valuation of the wallet and are converted to the
+    currency, the base currency by default. Their values are multiplied by the matrix of the
+    asset type percentages, and by the matrix assigning them to their country, so each
+    breakdown is a single vectorized product. The part of an ETF not covered by its asset
+    type splits, and positions without a country, are reported as unclassified.
+    """
+
+    currency = currency or settings.BASE_CURRENCY
+    fx = fx or fx_matrix()
+
+    valuation = wallet_valuation(wallet_id)
+
+    positions = [('asset', asset_id, code, value) for (asset_id, code), value in valuation.asset_positions.items()]
+    positions += [('bond', bond_id, code, value) for (bond_id, code), value in valuation.bond_positions.items()]
+
+    values = fx.convert([value for _, _, _, value in positions], [code for _, _, code, _ in positions], currency)
+
+    rows = _instrument_rows(
+        {instrument for kind, instrument, _, _ in positions if kind == 'asset'},
+        {instrument for kind, instrument, _, _ in positions if kind == 'bond'}
+    )
+
+    splits = {}
+    countries = {}
+    for kind, instrument, asset_type, percentage, country in rows:
+        if asset_type is not None:
+            splits.setdefault((kind, instrument), []).append((asset_type, float(percentage)))
+        countries[(kind, instrument)] = country or UNCLASSIFIED
+
+    type_labels = sorted({asset_type for split in splits.values() for asset_type, _ in split}) + [UNCLASSIFIED]
+    country_labels = sorted(set(countries.values()) | {UNCLASSIFIED})
+
+    type_columns = {label: column for column, label in enumerate(type_labels)}
+    country_columns = {label: column for column, label in enumerate(country_labels)}
+
+    type_rows, type_index, type_weights = [], [], []
+    country_index = []
+
+    for position, (kind, instrument, _, _) in enumerate(positions):
+        split = splits.get((kind, instrument), [])
+
+        for asset_type, percentage in split:
+            type_rows.append(position)
+            type_index.append(type_columns[asset_type])
+            type_weights.append(percentage)
+
+        remainder = 1 - sum(percentage for _, percentage in split)
+        if remainder > 1e-9:
+            type_rows.append(position)
+            type_index.append(type_columns[UNCLASSIFIED])
+            type_weights.append(remainder)
+
+        country_index.append(country_columns[countries.get((kind, instrument), UNCLASSIFIED)])
+
+    asset_types = _exposures(values, type_rows, type_index, type_labels, type_weights)
+    countries = _exposures(values, list(range(len(positions))), country_index, country_labels, 1.0)
+
+    def rounded(exposures):
+        return {label: Decimal(f'{value:.2f}') for label, value in exposures.items() if round(value, 2) != 0}
+
+    return Allocation(currency, Decimal(f'{values.sum():.2f}'), rounded(asset_types), rounded(countries))
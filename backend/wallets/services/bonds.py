@@ -0,0 +1,193 @@
+from decimal import Decimal
+
+import numpy as np
+
+from django.utils import timezone
+
+
+class BondTerms:
+    """
+    The interest terms of a retail bond series, as used by the accrual engine
+
+    Interest is accrued in periods of one year, or of the whole duration for bonds shorter
+    than a year, counted from the issue date of every lot. Each period has its own annual
+    rate: the initial rate for fixed periods and the announced rate, e.g. inflation plus
+    margin, for indexed ones. Periods without an announced rate yet are projected with the
+    latest known rate.
+
+    Attributes:
+    -----
+    nominal_value: float
+        The nominal value of a single bond
+    period_months: int
+        The length of an interest period in months
+    rates: list
+        The annual interest rate of every period, in percent
+    capitalized: bool
+        Whether the interest of a period is added to the value the next period accrues on,
+        otherwise it is paid out at the end of the period
+    premature_withdrawal_fee: float
+        The fee per bond charged when redeemed before maturity, taken from the accrued interest
+    """
+
+    def __init__(self, nominal_value, period_months, rates, capitalized=True, premature_withdrawal_fee=0):
+
+        self.nominal_value = float(nominal_value)
+        self.period_months = int(period_months)
+        self.rates = [float(rate) for rate in rates]
+        self.capitalized = capitalized
+        self.premature_withdrawal_fee = float(premature_withdrawal_fee)
+
+    @property
+    def periods(self):
+        return len(self.rates)
+
+    @classmethod
+    def from_bond(cls, bond):
+        """
+        Build the terms of a RetailBonds series from its interest rate schedule
+        """
+
+        if bond.duration_unit == 'Y':
+            duration_months = bond.duration * 12
+        elif bond.duration_unit == 'M':
+            duration_months = bond.duration
+        else:
+            duration_months = max(round(bond.duration / 30), 1)
+
+        period_months = min(12, duration_months)
+        periods = max(duration_months // period_months, 1)
+
+        announced = {rate.period: rate.rate for rate in bond.interest_rates.all()}
+
+        rates = []
+        for period in range(1, periods + 1):
+            if bond.is_intrest_rate_fixed or (period == 1 and bond.is_first_year_interest_fixed):
+                rates.append(bond.initial_interest_rate)
+            else:
+                rates.append(announced.get(period, rates[-1] if rates else bond.initial_interest_rate))
+
+        return cls(bond.nominal_value, period_months, rates, bond.is_interest_capitalized, bond.premature_withdrawal_fee)
+
+
+def add_months(dates, months):
+    """
+    Shift datetime64[D] dates by whole months, moving days past the end of the month to its last day
+    """
+
+    month_starts = dates.astype('datetime64[M]')
+    day_offsets = (dates - month_starts.astype('datetime64[D]')).astype(np.int64)
+
+    shifted = month_starts + np.asarray(months, dtype=np.int64)
+    month_days = ((shifted + 1).astype('datetime64[D]') - shifted.astype('datetime64[D]')).astype(np.int64)
+
+    return shifted.astype('datetime64[D]') + np.minimum(day_offsets, month_days - 1)
+
+
+def _round_cents(values):
+    return np.round(values + np.copysign(1e-9, values), 2)
+
+
+def accrue_unit_values(terms, issue_dates, dates, redeemed=False):
+    """
+    Compute the value of a single bond of every lot on every date in one pass.
+
+    The lots are given by the terms of their series and their issue dates, and the result is a
+    (lots, dates) array. Interest of the current period accrues by the actual number of days,
+    values are rounded to cents at the end of every period, as the issuer does. When redeemed,
+    the premature withdrawal fee is deducted from the accrued interest on dates before maturity.
+    """
+
+    lots = len(terms)
+    if lots == 0:
+        return np.zeros((0, len(dates)))
+
+    issue_dates = np.asarray(issue_dates, dtype='datetime64[D]')
+    dates = np.asarray(dates, dtype='datetime64[D]')
+
+    max_periods = max(term.periods for term in terms)
+
+    nominal = np.array([term.nominal_value for term in terms])
+    period_months = np.array([term.period_months for term in terms])
+    periods = np.array([term.periods for term in terms])
+    capitalized = np.array([term.capitalized for term in terms])
+    fees = np.array([term.premature_withdrawal_fee for term in terms])
+
+    # Rates of the periods past the last one repeat it, they only pad the schedule
+    rates = np.array([term.rates + [term.rates[-1]] * (max_periods - term.periods) for term in terms]) / 100
+
+    # Start of every period and the maturity, shape (lots, periods + 1)
+    boundaries = add_months(issue_dates[:, None], period_months[:, None] * np.arange(max_periods + 1))
+    boundaries = np.where(np.arange(max_periods + 1) <= periods[:, None], boundaries, boundaries[np.arange(lots), periods][:, None])
+
+    # Value each period starts from, shape (lots, periods + 1)
+    period_values = np.empty((lots, max_periods + 1))
+    period_values[:, 0] = nominal
+    for period in range(max_periods):
+        grown = _round_cents(period_values[:, period] * (1 + rates[:, period]))
+        period_values[:, period + 1] = np.where(capitalized & (period < periods), grown, period_values[:, period])
+
+    # Index of the period every date falls in, shape (lots, dates)
+    current = (boundaries[:, None, 1:] <= dates[None, :, None]).sum(axis=-1)
+    current = np.minimum(current, periods[:, None])
+
+    rows = np.arange(lots)[:, None]
+    period_index = np.minimum(current, max_periods - 1)
+
+    start = boundaries[rows, current]
+    end = boundaries[rows, np.minimum(current + 1, periods[:, None])]
+    period_days = np.maximum((end - start).astype(np.int64), 1)
+    elapsed_days = np.clip((dates[None, :] - start).astype(np.int64), 0, None)
+
+    base = period_values[rows, current]
+    matured = current >= periods[:, None]
+
+    interest = _round_cents(base * rates[rows, period_index] * elapsed_days / period_days)
+    interest = np.where(matured, 0, interest)
+
+    # The last interest of bonds paying out their interest is paid together with the nominal value
+    last_rates = rates[np.arange(lots), periods - 1]
+    final_interest = np.where(capitalized, 0, _round_cents(nominal * last_rates))[:, None]
+    values = base + interest + np.where(matured, final_interest, 0)
+
+    not_issued = dates[None, :] < issue_dates[:, None]
+    values = np.where(not_issued, nominal[:, None], values)
+
+    if redeemed:
+        accrued = np.maximum(values - nominal[:, None], 0)
+        values = np.where(matured | not_issued, values, values - np.minimum(fees[:, None], accrued))
+
+    return values
+
+
+def _to_decimal(value):
+    return Decimal(f'{value:.2f}')
+
+
+def bond_unit_value(bond, issue_date, date, redeemed=False):
+    """
+    Get the value of a single bond of the series bought on issue_date on the given date
+    """
+
+    return _to_decimal(accrue_unit_values([BondTerms.from_bond(bond)], [issue_date], [date], redeemed)[0, 0])
+
+
+def value_bond_lots(lots, date=None, redeemed=False):
+    """
+    Value the given UserTreasuryBonds lots on the given date, today by default, in one pass.
+
+    Returns the value of every lot keyed by the lot id. The terms of every series are built
+    once, prefetch bond__interest_rates to load the rate schedules with a single query.
+    """
+
+    lots = list(lots)
+    date = date or timezone.localdate()
+
+    terms_by_bond = {}
+    for lot in lots:
+        if lot.bond_id not in terms_by_bond:
+            terms_by_bond[lot.bond_id] = BondTerms.from_bond(lot.bond)
+
+    unit_values = accrue_unit_values([terms_by_bond[lot.bond_id] for lot in lots], [lot.issue_date for lot in lots], [date], redeemed)
+
+    return {lot.id: _to_decimal(unit_values[index, 0]) * lot.amount for index, lot in enumerate(lots)}
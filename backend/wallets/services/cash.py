@@ -0,0 +1,47 @@
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from wallets.models import AccountCurrencyBalance, AccountBalanceEntry
+
+
+def move_cash(account, currency, amount, kind, effective_at=None, reference_id=None, create=False, allow_negative=True):
+    """
+    Change the balance of the account in the given currency and record the movement in the ledger.
+
+    The balance row is locked for the rest of the database transaction and changed with a
+    single F('balance') + amount update, so concurrent movements of the same balance are
+    serialized and never overwrite each other. When allow_negative is False the update only
+    applies if the balance covers the movement.
+
+    Raises AccountCurrencyBalance.DoesNotExist when the account has no balance in the currency
+    and create is False.
+    """
+
+    with transaction.atomic():
+
+        balances = AccountCurrencyBalance.objects.select_for_update()
+
+        if create:
+            balance, _ = balances.get_or_create(account=account, currency=currency)
+        else:
+            balance = balances.get(account=account, currency=currency)
+
+        to_update = AccountCurrencyBalance.objects.filter(pk=balance.pk)
+        if not allow_negative:
+            to_update = to_update.filter(balance__gte=-amount)
+
+        if not to_update.update(balance=F('balance') + amount):
+            raise ValidationError({'not_enough_funds': 'The account does not have enough balance to make this transaction.'})
+
+        balance.refresh_from_db(fields=['balance'])
+
+        return AccountBalanceEntry.objects.create(
+            balance=balance,
+            kind=kind,
+            amount=amount,
+            balance_after=balance.balance,
+            effective_at=effective_at or timezone.now(),
+            reference_id=reference_id
+        )
@@ -0,0 +1,211 @@
+from decimal import Decimal
+
+import numpy as np
+
+from django.conf import settings
+
+from wallets.models import Currency
+
+from .history import PriceHistory
+
+
+class MissingExchangeRate(ValueError):
+    pass
+
+
+class FXMatrix:
+    """
+    Cross rates between every pair of currencies, built from their latest prices.
+
+    A currency price is the value of one unit of the currency in the base currency, so the rate
+    from one currency to another is triangulated through the base currency. The rates of all
+    pairs are kept in a matrix, rates[i, j] being the value of one unit of the i-th currency in
+    the j-th one, so whole arrays of amounts are converted with a single lookup. Currencies
+    without any price have no rates, except the base currency itself and the rate of every
+    currency to itself. Single rates and totals of
+    money amounts are computed in Decimal from the prices, the float matrix serves bulk arrays.
+
+    Attributes:
+    -----
+    base: str
+        The code of the currency the prices are recorded in
+    codes: list
+        The code of every currency, in the order of the rows of the matrix
+    prices: dict
+        The positive price of every currency having one, in the base currency
+    rates: numpy.ndarray
+        The cross rate of every pair of currencies, NaN when unknown
+    """
+
+    def __init__(self, prices, base=None):
+
+        self.base = base or settings.BASE_CURRENCY
+
+        prices = dict(prices)
+        prices[self.base] = 1
+
+        self.prices = {code: Decimal(str(price)) for code, price in prices.items() if price is not None and price > 0}
+
+        self.codes = list(prices)
+        self.index = {code: index for index, code in enumerate(self.codes)}
+
+        base_rates = np.array([np.nan if price is None else float(price) for price in prices.values()])
+        base_rates[base_rates <= 0] = np.nan
+
+        self.rates = base_rates[:, None] / base_rates[None, :]
+        # A currency converts to itself without any price
+        np.fill_diagonal(self.rates, 1)
+
+    @classmethod
+    def load(cls, base=None):
+        """
+        Build the matrix from the latest price of every currency, loaded with a single query
+        """
+
+        return cls(Currency.objects.values_list('code', 'last_price'), base)
+
+    def __contains__(self, code):
+        return code in self.index
+
+    def _row(self, code):
+
+        try:
+            return self.index[code]
+        except KeyError:
+            raise MissingExchangeRate(f'{code} is not a known currency.')
+
+    def rate(self, from_currency, to_currency):
+        """
+        Get the value of one unit of from_currency in to_currency
+        """
+
+        self._row(from_currency), self._row(to_currency)
+
+        if from_currency == to_currency:
+            return Decimal(1)
+
+        if from_currency not in self.prices or to_currency not in self.prices:
+            raise MissingExchangeRate(f'There is no exchange rate from {from_currency} to {to_currency}.')
+
+        return self.prices[from_currency] / self.prices[to_currency]
+
+    def convert(self, amounts, currencies, to_currency):
+        """
+        Convert the amounts, each in the currency at the same position, to to_currency.
+
+        Returns a float array of the converted amounts. Amounts of zero need no rate.
+        """
+
+        amounts = np.asarray([float(amount) for amount in amounts], dtype=float)
+        rows = np.fromiter((self._row(currency) for currency in currencies), dtype=np.int64, count=len(amounts))
+
+        converted = amounts * self.rates[rows, self._row(to_currency)]
+
+        missing = np.isnan(converted) & (amounts != 0)
+        if missing.any():
+            currency = list(currencies)[int(np.argmax(missing))]
+            raise MissingExchangeRate(f'There is no exchange rate from {currency} to {to_currency}.')
+
+        return np.nan_to_num(converted)
+
+    def total(self, amounts_by_currency, to_currency):
+        """
+        Sum amounts keyed by their currency code in to_currency, computed in Decimal and rounded to
+        cents. Amounts of zero need no rate.
+        """
+
+        total = Decimal(0)
+
+        for currency, amount in amounts_by_currency.items():
+            self._row(currency)
+            if amount:
+                total += Decimal(str(amount)) * self.rate(currency, to_currency)
+
+        return total.quantize(Decimal('0.01'))
+
+
+class FXHistory:
+    """
+    Point-in-time cross rates between currencies, built from their price history.
+
+    The rate from one currency to another on a date is triangulated through the base currency
+    from the last prices of both currencies known on that date, as searched in a PriceHistory
+    keyed by currency code.
+
+    Attributes:
+    -----
+    base: str
+        The code of the currency the prices are recorded in
+    history: PriceHistory
+        The price history of the currencies in the base currency
+    """
+
+    def __init__(self, history, base=None):
+
+        self.base = base or settings.BASE_CURRENCY
+        self.history = history
+
+    @classmethod
+    def load(cls, currencies=None, until=None, base=None):
+        """
+        Load the price history of the given currency codes, or of all currencies, with a single query
+        """
+
+        return cls(PriceHistory.for_currencies(currencies, until), base)
+
+    def _base_rates(self, currencies, dates):
+
+        currencies = list(currencies)
+        prices = self.history.prices_on(currencies, dates)
+
+        return np.array([
+            1.0 if currency == self.base else (np.nan if price is None or price <= 0 else float(price))
+            for currency, price in zip(currencies, prices)
+        ])
+
+    def rate_on(self, from_currency, to_currency, date):
+        """
+        Get the value of one unit of from_currency in to_currency on the given date, None when unknown
+        """
+
+        if from_currency == to_currency:
+            return Decimal(1)
+
+        rates = []
+        for currency in [from_currency, to_currency]:
+            rates.append(Decimal(1) if currency == self.base else self.history.price_on(currency, date))
+
+        if not all(rates):
+            return None
+
+        return rates[0] / rates[1]
+
+    def rates_on(self, from_currencies, to_currencies, dates):
+        """
+        Get the rate of every (from currency, to currency, date) triple given by the three sequences
+        at once, as a float array with NaN for unknown rates
+        """
+
+        from_currencies, to_currencies, dates = list(from_currencies), list(to_currencies), list(dates)
+
+        rates = self._base_rates(from_currencies, dates) / self._base_rates(to_currencies, dates)
+        same = np.array([a == b for a, b in zip(from_currencies, to_currencies)], dtype=bool)
+
+        return np.where(same, 1.0, rates)
+
+    def convert(self, amounts, currencies, to_currency, dates):
+        """
+        Convert the amounts, each in the currency and on the date at the same position, to to_currency
+        """
+
+        currencies = list(currencies)
+        amounts = np.asarray([float(amount) for amount in amounts], dtype=float)
+
+        converted = amounts * self.rates_on(currencies, [to_currency] * len(currencies), dates)
+
+        missing = np.isnan(converted) & (amounts != 0)
+        if missing.any():
+            index = int(np.argmax(missing))
+            raise MissingExchangeRate(f'There is no exchange rate from {currencies[index]} to {to_currency} on {list(dates)[index]}.')
+
+        return np.nan_to_num(converted)
@@ -0,0 +1,113 @@
+import datetime as dt
+
+from bisect import bisect_right
+from collections import defaultdict
+
+import numpy as np
+
+from django.utils import timezone
+
+from wallets.models import AssetPrice, CurrencyPrice
+
+
+def _local_date(value):
+
+    if isinstance(value, dt.datetime):
+        return timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+    return value
+
+
+class PriceHistory:
+    """
+    In-memory as-of lookups over the price history of a set of instruments.
+
+    The price dates of every instrument are kept sorted, so the last price known on a date is
+    found by a binary search instead of a "latest before date" subquery per row. prices_on
+    answers many (instrument, date) pairs at once with one vectorized search per instrument.
+
+    Attributes:
+    -----
+    dates: dict
+        The sorted price dates of every instrument
+    prices: dict
+        The prices matching the dates of every instrument
+    """
+
+    def __init__(self, rows):
+        """
+        Build the index from (instrument, date, price) rows ordered by date
+        """
+
+        self.dates = defaultdict(list)
+        self.prices = defaultdict(list)
+
+        for key, date, price in rows:
+            self.dates[key].append(_local_date(date))
+            self.prices[key].append(price)
+
+        self.date_arrays = {key: np.array(dates, dtype='datetime64[D]') for key, dates in self.dates.items()}
+
+    @classmethod
+    def for_assets(cls, asset_ids, until=None):
+        """
+        Load the price history of the market assets with a single query
+        """
+
+        prices = AssetPrice.objects.filter(asset_id__in=asset_ids)
+        if until is not None:
+            prices = prices.filter(date__lte=until)
+
+        return cls(prices.order_by('date').values_list('asset_id', 'date', 'price'))
+
+    @classmethod
+    def for_currencies(cls, currencies=None, until=None, key='currency__code'):
+        """
+        Load the price history of the currencies with a single query, keyed by their code by default
+        """
+
+        prices = CurrencyPrice.objects.all()
+        if currencies is not None:
+            prices = prices.filter(**{f'{key}__in': currencies})
+        if until is not None:
+            prices = prices.filter(date__lt=dt.datetime.combine(until + dt.timedelta(days=1), dt.time.min, timezone.get_current_timezone()))
+
+        return cls(prices.order_by('date').values_list(key, 'date', 'price'))
+
+    def __contains__(self, key):
+        return key in self.dates
+
+    def price_on(self, key, date, default=None):
+        """
+        Get the last known price of the instrument on the given date
+        """
+
+        index = bisect_right(self.dates.get(key, []), _local_date(date))
+
+        return self.prices[key][index - 1] if index else default
+
+    def prices_on(self, keys, dates, default=None):
+        """
+        Get the last known price of every (instrument, date) pair given by the two sequences
+        """
+
+        keys = list(keys)
+        dates = np.array([_local_date(date) for date in dates], dtype='datetime64[D]')
+
+        positions = defaultdict(list)
+        for position, key in enumerate(keys):
+            positions[key].append(position)
+
+        result = [default] * len(keys)
+
+        for key, key_positions in positions.items():
+            if key not in self.date_arrays:
+                continue
+
+            prices = self.prices[key]
+            indexes = np.searchsorted(self.date_arrays[key], dates[key_positions], side='right')
+
+            for position, index in zip(key_positions, indexes.tolist()):
+                if index:
+                    result[position] = prices[index - 1]
+
+        return result
@@ -0,0 +1,70 @@
+from django.db import transaction
+from django.utils import timezone
+
+from wallets.models import AccountBalanceEntry
+
+
+def _balance_movements(balance):
+    """
+    Load every past movement of an account currency balance as (date, kind, amount, reference id), ordered by date
+    """
+
+    account = balance.account
+    movements = []
+
+    for deposit in account.deposits.filter(currency=balance.currency_id):
+        movements.append((deposit.deposited_at, 'D', deposit.amount, deposit.id))
+
+    for withdrawal in account.withdrawals.filter(currency=balance.currency_id):
+        movements.append((withdrawal.withdrawn_at, 'W', -withdrawal.amount, withdrawal.id))
+
+    market_transactions = account.marketassettransaction.filter(account_currency=balance.currency_id)
+    bond_transactions = account.treasurybondstransaction.filter(account_currency=balance.currency_id)
+
+    for transactions in [market_transactions, bond_transactions]:
+        for market_transaction in transactions.with_total_price():
+            sign = -1 if market_transaction.transaction_type == 'B' else 1
+            movements.append((market_transaction.transaction_date, market_transaction.transaction_type, sign * market_transaction.total_price, market_transaction.id))
+
+    movements.sort(key=lambda movement: movement[0])
+
+    return movements
+
+
+def rebuild_balance_ledger(balance):
+    """
+    Replace the ledger of an account currency balance with one replayed from its deposits, withdrawals and transactions.
+
+    When the replayed running balance does not match the stored balance an adjustment entry
+    is appended so that the ledger ends on the stored balance. Returns the adjustment amount.
+    """
+
+    entries = []
+    running_balance = 0
+
+    for effective_at, kind, amount, reference_id in _balance_movements(balance):
+        running_balance += amount
+        entries.append(AccountBalanceEntry(
+            balance=balance,
+            kind=kind,
+            amount=amount,
+            balance_after=running_balance,
+            effective_at=effective_at,
+            reference_id=reference_id
+        ))
+
+    adjustment = balance.balance - running_balance
+    if adjustment:
+        entries.append(AccountBalanceEntry(
+            balance=balance,
+            kind='A',
+            amount=adjustment,
+            balance_after=balance.balance,
+            effective_at=timezone.now()
+        ))
+
+    with transaction.atomic():
+        balance.entries.all().delete()
+        AccountBalanceEntry.objects.bulk_create(entries, batch_size=1000)
+
+    return adjustment
@@ -0,0 +1,116 @@
+from decimal import Decimal, ROUND_DOWN
+
+from django.core.exceptions import ValidationError
+from django.db import transaction as db_transaction
+from django.utils import timezone
+
+from .valuation import invalidate_valuations
+
+
+LOT_MATCHING_METHODS = ['FIFO', 'LIFO', 'HIFO', 'AVERAGE']
+
+AMOUNT_STEP = Decimal('0.01')
+
+
+def _average_cost_matches(lots, amount):
+    """
+    Consume every lot in proportion to its size, spreading the rounding remainder in lot order
+    """
+
+    total = sum(lot.amount for lot in lots)
+    if total == 0:
+        return []
+
+    consumed = [(lot.amount * amount / total).quantize(AMOUNT_STEP, rounding=ROUND_DOWN) for lot in lots]
+
+    remainder = amount - sum(consumed)
+    for index, lot in enumerate(lots):
+        if remainder <= 0:
+            break
+        extra = min(lot.amount - consumed[index], remainder)
+        consumed[index] += extra
+        remainder -= extra
+
+    return [(lot, amount_consumed) for lot, amount_consumed in zip(lots, consumed) if amount_consumed > 0]
+
+
+def match_lots(lots, amount, method='FIFO', cost=lambda lot: lot.price):
+    """
+    Decide how much of every open lot a sale of the given amount consumes.
+
+    The lots are expected in the order they were bought. Returns (lot, consumed amount)
+    pairs; the consumed amounts add up to less than the sold amount when the lots do not
+    hold enough.
+    """
+
+    if method not in LOT_MATCHING_METHODS:
+        raise ValueError(f'Lot matching method must be one of: {", ".join(LOT_MATCHING_METHODS)}.')
+
+    amount = Decimal(str(amount))
+    lots = [lot for lot in lots if lot.amount > 0]
+
+    if method == 'AVERAGE':
+        return _average_cost_matches(lots, min(amount, sum(lot.amount for lot in lots)))
+
+    if method == 'LIFO':
+        lots = lots[::-1]
+    elif method == 'HIFO':
+        lots = sorted(lots, key=cost, reverse=True)
+
+    matches = []
+    for lot in lots:
+        if amount <= 0:
+            break
+
+        consumed = min(lot.amount, amount)
+        matches.append((lot, consumed))
+        amount -= consumed
+
+    return matches
+
+
+def sell_lots(lots, transaction, sale_model, method='FIFO', cost=lambda lot: lot.price):
+    """
+    Consume the open lots of the given queryset for a sell transaction.
+
+    The lots are locked and loaded once, the consumption is computed in memory and the
+    result is written with one bulk update of the lots, one bulk insert into the
+    sell_transactions through table and one bulk insert of the per-lot sale records.
+    """
+
+    lot_model = lots.model
+    sell_transactions = lot_model._meta.get_field('sell_transactions')
+    through_model = sell_transactions.remote_field.through
+
+    with db_transaction.atomic():
+
+        open_lots = list(lots.filter(active=True).select_for_update(of=('self',)).order_by('created_at', 'id'))
+        matches = match_lots(open_lots, transaction.amount, method, cost)
+
+        if sum(consumed for _, consumed in matches) < Decimal(str(transaction.amount)):
+            raise ValidationError({'amount': 'You do not have enough assets to sell.'})
+
+        now = timezone.now()
+        for lot, consumed in matches:
+            lot.amount -= consumed
+            lot.updated_at = now
+            if lot.amount == 0:
+                lot.active = False
+
+        lot_model.objects.bulk_update([lot for lot, _ in matches], ['amount', 'active', 'updated_at'])
+
+        through_model.objects.bulk_create([
+            through_model(**{
+                sell_transactions.m2m_column_name(): lot.id,
+                sell_transactions.m2m_reverse_name(): transaction.id
+            })
+            for lot, _ in matches
+        ], ignore_conflicts=True)
+
+        sale_model.objects.bulk_create([
+            sale_model(lot=lot, transaction=transaction, amount=consumed) for lot, consumed in matches
+        ])
+
+        invalidate_valuations({lot.wallet_id for lot, _ in matches}, {lot.account_id for lot, _ in matches})
+
+    return matches
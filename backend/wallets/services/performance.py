@@ -0,0 +1,118 @@
+from decimal import Decimal
+
+from django.db.models import Case, DecimalField, F, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from wallets.models import Deposit, Withdrawal, MarketAssetTransaction, TreasuryBondsTransaction, UserAssetSale, UserTreasuryBondsSale
+
+from .valuation import cached_for, invalidate_valuations, wallet_valuation
+
+
+PERFORMANCE_CACHE_TIMEOUT = 60 * 5
+
+PERFORMANCE_FIELDS = ['net_deposits', 'fees', 'realized', 'unrealized', 'holdings_value']
+
+
+def invalidate_wallet_performance(wallet_id):
+    """
+    Drop the cached performance report of the wallet, now and once the current transaction commits
+    """
+
+    invalidate_valuations([wallet_id])
+
+
+def _decimal_sum(expression):
+    return Sum(expression, output_field=DecimalField(max_digits=30, decimal_places=10))
+
+
+def _rate(lot_field):
+    """
+    The currency rate of a lot, or one when the asset is priced in the account currency
+    """
+
+    return Case(
+        When(lot__asset__price_currency=F('lot__account_currency'), then=Value(Decimal(1))),
+        default=F(lot_field),
+        output_field=DecimalField(max_digits=20, decimal_places=10)
+    )
+
+
+def _realized_by_currency(wallet):
+    """
+    Sum the proceeds and the cost basis of every lot sale of the wallet, per account currency.
+
+    Bond lots cost the price they were bought at, or their nominal value when they have no buy transaction.
+    """
+
+    asset_sales = UserAssetSale.objects.filter(lot__wallet=wallet).values(currency_code=F('transaction__account_currency__code')).annotate(
+        proceeds=_decimal_sum(F('amount') * F('transaction__price') * _rate('transaction__currency_price')),
+        cost=_decimal_sum(F('amount') * F('lot__price') * _rate('lot__currency_price'))
+    )
+
+    bond_sales = UserTreasuryBondsSale.objects.filter(lot__wallet=wallet).values(currency_code=F('transaction__account_currency__code')).annotate(
+        proceeds=_decimal_sum(F('amount') * F('transaction__price')),
+        cost=_decimal_sum(F('amount') * Coalesce(F('lot__buy_transaction__price'), F('lot__bond__nominal_value')))
+    )
+
+    realized = {}
+    for row in [*asset_sales, *bond_sales]:
+        realized[row['currency_code']] = realized.get(row['currency_code'], 0) + row['proceeds'] - row['cost']
+
+    return realized
+
+
+def _sum_by_currency(queryset, currency_field, amount_field):
+
+    return {
+        row['currency_code']: row['total']
+        for row in queryset.values(currency_code=F(currency_field)).annotate(total=Sum(amount_field))
+    }
+
+
+def _wallet_performance(wallet):
+
+    deposits = _sum_by_currency(Deposit.objects.filter(wallet=wallet), 'currency__code', 'amount')
+    withdrawals = _sum_by_currency(Withdrawal.objects.filter(wallet=wallet), 'currency__code', 'amount')
+
+    fees = {}
+    for model in [MarketAssetTransaction, TreasuryBondsTransaction]:
+        for currency, total in _sum_by_currency(model.objects.filter(wallet=wallet), 'account_currency__code', 'commission').items():
+            fees[currency] = fees.get(currency, 0) + total
+
+    realized = _realized_by_currency(wallet)
+
+    valuation = wallet_valuation(wallet.id)
+    unrealized = valuation.unrealized
+
+    currencies = sorted({*deposits, *withdrawals, *fees, *realized, *valuation.values_by_currency})
+
+    return [
+        {
+            'currency': currency,
+            'net_deposits': deposits.get(currency, 0) - withdrawals.get(currency, 0),
+            'fees': fees.get(currency, 0),
+            'realized': realized.get(currency, 0),
+            'unrealized': unrealized.get(currency, 0),
+            'holdings_value': valuation.values_by_currency.get(currency, 0)
+        }
+        for currency in currencies
+    ]
+
+
+def wallet_performance(wallet):
+    """
+    Report the net deposits, fees, realized and unrealized profit and the holdings value of the wallet per currency.
+
+    Realized profit comes from the lot sales recorded when selling, unrealized profit and the
+    holdings value from a single valuation pass; all other figures are aggregate queries.
+    Reports are cached together with the valuation of the wallet, until a transaction, deposit,
+    withdrawal or lot of the wallet or any price changes.
+    """
+
+    return cached_for(
+        [f'wallet:{wallet.id}'],
+        f'wallet-performance:{wallet.id}:{timezone.localdate()}',
+        lambda: _wallet_performance(wallet),
+        PERFORMANCE_CACHE_TIMEOUT
+    )
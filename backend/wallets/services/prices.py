@@ -0,0 +1,378 @@
+import csv
+import datetime as dt
+import time
+
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from wallets.models import AssetPrice, Currency, CurrencyPrice, MarketAsset, UserAsset
+
+from .snapshots import invalidate_wallet_snapshots
+
+
+MAX_PRICE = Decimal('1e10')
+
+
+class PriceImportResult:
+    """
+    Summary of a bulk price import
+
+    Attributes:
+    -----
+    rows_read: int
+        The number of rows read from the source
+    rows_inserted: int
+        The number of new prices written to the database
+    rows_skipped: int
+        The number of valid rows already present in the database or repeated in the source
+    errors: list
+        The rejected rows as (row number, message) pairs
+    elapsed: float
+        The duration of the import in seconds
+    """
+
+    def __init__(self):
+
+        self.rows_read = 0
+        self.rows_inserted = 0
+        self.rows_skipped = 0
+        self.errors = []
+        self.elapsed = 0.0
+
+    @property
+    def rows_rejected(self):
+        return len(self.errors)
+
+    @property
+    def rows_per_second(self):
+        return self.rows_read / self.elapsed if self.elapsed else 0.0
+
+
+def read_price_file(path, file_format=None):
+    """
+    Stream the rows of a CSV or Parquet price file as dictionaries
+    """
+
+    file_format = file_format or ('parquet' if str(path).endswith('.parquet') else 'csv')
+
+    if file_format == 'parquet':
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError('Reading Parquet files requires the pyarrow package.')
+
+        for batch in pq.ParquetFile(path).iter_batches():
+            yield from batch.to_pylist()
+
+    elif file_format == 'csv':
+        with open(path, newline='') as price_file:
+            yield from csv.DictReader(price_file)
+
+    else:
+        raise ValueError(f'Unsupported price file format: {file_format}.')
+
+
+def _asset_lookup():
+    """
+    Map every (exchange market code, asset code) pair to the asset id
+    """
+
+    return {
+        (exchange_code, code): asset_id
+        for asset_id, exchange_code, code in MarketAsset.objects.values_list('id', 'exchange_market__code', 'code')
+    }
+
+
+def _parse_row(row, assets, today):
+    """
+    Validate a single price row, returning (asset id, date, price, source) or raising ValueError
+    """
+
+    if row.get('asset'):
+        exchange_code, _, code = str(row['asset']).partition(':')
+    else:
+        exchange_code, code = row.get('exchange'), row.get('code')
+
+    asset_id = assets.get((exchange_code, code))
+    if asset_id is None:
+        raise ValueError(f'Asset {exchange_code}:{code} does not exist.')
+
+    date = row.get('date')
+    if not isinstance(date, dt.date):
+        try:
+            date = dt.date.fromisoformat(str(date))
+        except ValueError:
+            raise ValueError(f'Invalid date {date}.')
+    if isinstance(date, dt.datetime):
+        date = date.date()
+    if date > today:
+        raise ValueError('Date cannot be in the future.')
+
+    try:
+        price = Decimal(str(row.get('price')))
+    except InvalidOperation:
+        raise ValueError(f'Invalid price {row.get("price")}.')
+    if not price.is_finite() or price < 0 or price >= MAX_PRICE:
+        raise ValueError(f'Invalid price {price}.')
+
+    return asset_id, date, price, row.get('source') or None
+
+
+def _existing_prices(rows):
+    """
+    Get the (asset id, date) pairs of the chunk that are already stored, in a single query
+    """
+
+    asset_ids = {row[0] for row in rows}
+    dates = [row[1] for row in rows]
+
+    return set(
+        AssetPrice.objects.filter(asset_id__in=asset_ids, date__range=(min(dates), max(dates))).values_list('asset_id', 'date')
+    )
+
+
+def _copy_prices(rows):
+    """
+    Load the prices with COPY into a temporary table and merge them, skipping conflicts
+    """
+
+    table = AssetPrice._meta.db_table
+    now = timezone.now()
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE TEMPORARY TABLE IF NOT EXISTS asset_price_import '
+            '(asset_id bigint, price numeric(20, 10), date date, source varchar(100)) ON COMMIT DELETE ROWS'
+        )
+        cursor.execute('TRUNCATE asset_price_import')
+        with cursor.copy('COPY asset_price_import (asset_id, price, date, source) FROM STDIN') as copy:
+            for row in rows:
+                copy.write_row(row)
+        cursor.execute(
+            f'INSERT INTO {table} (asset_id, price, date, source, created_at, updated_at) '
+            'SELECT asset_id, price, date, source, %s, %s FROM asset_price_import '
+            'ON CONFLICT (asset_id, date) DO NOTHING',
+            [now, now]
+        )
+        return cursor.rowcount
+
+
+def _bulk_create_prices(rows):
+    """
+    Insert the prices with a batched INSERT, skipping conflicts
+    """
+
+    AssetPrice.objects.bulk_create(
+        [AssetPrice(asset_id=asset_id, date=date, price=price, source=source) for asset_id, date, price, source in rows],
+        ignore_conflicts=True,
+        batch_size=1000
+    )
+    return len(rows)
+
+
+def _import_prices(rows, parse_row, existing_prices, write_prices, chunk_size, source, progress):
+    """
+    Validate and write price rows in chunks, returning the result and the keys of the instruments that got new prices.
+
+    parse_row turns a row into (key, date, price, source) or raises ValueError, existing_prices
+    returns the (key, date) pairs of a chunk already stored and write_prices stores the new rows,
+    returning the number of rows written.
+    """
+
+    result = PriceImportResult()
+    started = time.monotonic()
+
+    seen = set()
+    touched = set()
+
+    rows = iter(rows)
+    while chunk := list(islice(rows, chunk_size)):
+
+        valid_rows = []
+
+        for row in chunk:
+            result.rows_read += 1
+
+            try:
+                key, date, price, row_source = parse_row(row)
+            except ValueError as error:
+                result.errors.append((result.rows_read, str(error)))
+                continue
+
+            if (key, date) in seen:
+                result.rows_skipped += 1
+                continue
+
+            seen.add((key, date))
+            valid_rows.append((key, date, price, row_source or source))
+
+        if valid_rows:
+            existing = existing_prices(valid_rows)
+            new_rows = [row for row in valid_rows if (row[0], row[1]) not in existing]
+            result.rows_skipped += len(valid_rows) - len(new_rows)
+
+            if new_rows:
+                with transaction.atomic():
+                    inserted = write_prices(new_rows)
+
+                result.rows_inserted += inserted
+                result.rows_skipped += len(new_rows) - inserted
+                touched.update(row[0] for row in new_rows)
+
+        result.elapsed = time.monotonic() - started
+
+        if progress:
+            progress(result)
+
+    result.elapsed = time.monotonic() - started
+
+    return result, touched
+
+
+def _write_asset_prices(rows):
+
+    if connection.vendor == 'postgresql':
+        return _copy_prices([(asset_id, price, date, row_source) for asset_id, date, price, row_source in rows])
+
+    return _bulk_create_prices(rows)
+
+
+def import_asset_prices(rows, chunk_size=10000, source=None, progress=None):
+    """
+    Import AssetPrice rows in chunks.
+
+    Every chunk is validated in memory against an asset lookup loaded once, rows that are
+    already stored are skipped so that partially loaded files can be imported again, and the
+    remaining rows are written with COPY on PostgreSQL or a bulk INSERT on other databases.
+    The denormalized latest prices of the touched assets are refreshed at the end, and the
+    wallet snapshots holding them from the earliest imported date are dropped to be rebuilt.
+
+    Rows are dictionaries with 'date', 'price', an optional 'source' and either an 'asset'
+    in the EXCHANGE:CODE form or separate 'exchange' and 'code' values.
+    """
+
+    assets = _asset_lookup()
+    today = timezone.now().date()
+    earliest = {}
+
+    def parse_row(row):
+
+        asset_id, date, price, row_source = _parse_row(row, assets, today)
+        earliest[asset_id] = min(earliest.get(asset_id, date), date)
+
+        return asset_id, date, price, row_source
+
+    result, touched_assets = _import_prices(
+        rows, parse_row, _existing_prices, _write_asset_prices, chunk_size, source, progress
+    )
+
+    if touched_assets:
+        started = time.monotonic() - result.elapsed
+        MarketAsset.objects.filter(pk__in=touched_assets).refresh_latest_prices()
+
+        for asset_id in touched_assets:
+            invalidate_wallet_snapshots(UserAsset.objects.filter(asset=asset_id).values('wallet'), earliest[asset_id])
+        result.elapsed = time.monotonic() - started
+
+    return result
+
+
+def _parse_currency_row(row, currencies, now):
+    """
+    Validate a single currency price row, returning (currency id, moment, price, source) or raising ValueError.
+
+    A row dated by a day holds the rate of the start of that day.
+    """
+
+    currency_id = currencies.get(row.get('currency'))
+    if currency_id is None:
+        raise ValueError(f'Currency {row.get("currency")} does not exist.')
+
+    date = row.get('date')
+    if not isinstance(date, dt.date):
+        try:
+            date = dt.datetime.fromisoformat(str(date))
+        except ValueError:
+            raise ValueError(f'Invalid date {date}.')
+    if not isinstance(date, dt.datetime):
+        date = dt.datetime.combine(date, dt.time.min)
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    if date > now:
+        raise ValueError('Date cannot be in the future.')
+
+    try:
+        price = Decimal(str(row.get('price')))
+    except InvalidOperation:
+        raise ValueError(f'Invalid price {row.get("price")}.')
+    if not price.is_finite() or price <= 0 or price >= MAX_PRICE:
+        raise ValueError(f'Invalid price {price}.')
+
+    return currency_id, date, price, row.get('source') or None
+
+
+def _existing_currency_prices(rows):
+    """
+    Get the (currency id, moment) pairs of the chunk that are already stored, in a single query
+    """
+
+    currency_ids = {row[0] for row in rows}
+    dates = [row[1] for row in rows]
+
+    return set(
+        CurrencyPrice.objects.filter(currency_id__in=currency_ids, date__range=(min(dates), max(dates))).values_list('currency_id', 'date')
+    )
+
+
+def _write_currency_prices(rows):
+
+    CurrencyPrice.objects.bulk_create(
+        [CurrencyPrice(currency_id=currency_id, date=date, price=price, source=source) for currency_id, date, price, source in rows],
+        ignore_conflicts=True,
+        batch_size=1000
+    )
+    return len(rows)
+
+
+def import_currency_prices(rows, chunk_size=10000, source=None, progress=None):
+    """
+    Backfill the history of CurrencyPrice rows in chunks, in the same way as import_asset_prices.
+
+    The denormalized latest prices of the touched currencies are refreshed at the end, and the
+    wallet snapshots holding them from the earliest imported date are dropped to be rebuilt.
+
+    Rows are dictionaries with 'currency' (its code), 'date' (a day or a moment), 'price' in
+    the base currency and an optional 'source'.
+    """
+
+    currencies = dict(Currency.objects.values_list('code', 'id'))
+    now = timezone.now()
+    earliest = {}
+
+    def parse_row(row):
+
+        currency_id, date, price, row_source = _parse_currency_row(row, currencies, now)
+        earliest[currency_id] = min(earliest.get(currency_id, date), date)
+
+        return currency_id, date, price, row_source
+
+    result, touched_currencies = _import_prices(
+        rows, parse_row, _existing_currency_prices, _write_currency_prices, chunk_size, source, progress
+    )
+
+    if touched_currencies:
+        started = time.monotonic() - result.elapsed
+        Currency.objects.filter(pk__in=touched_currencies).refresh_latest_prices()
+
+        for currency_id in touched_currencies:
+            invalidate_wallet_snapshots(
+                UserAsset.objects.filter(Q(asset__price_currency=currency_id) | Q(account_currency=currency_id)).values('wallet'),
+                earliest[currency_id]
+            )
+        result.elapsed = time.monotonic() - started
+
+    return result
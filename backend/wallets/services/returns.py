@@ -0,0 +1,377 @@
+from decimal import Decimal
+
+import numpy as np
+
+from django.conf import settings
+from django.db.models import Case, DecimalField, F, Sum, When
+from django.utils import timezone
+
+from wallets.models import Deposit, Withdrawal, MarketAssetTransaction, TreasuryBondsTransaction, UserAsset, UserTreasuryBonds, WalletDailySnapshot
+
+from .fx import FXHistory
+from .history import _local_date
+from .valuation import value_holdings_by
+
+
+RETURN_SCOPES = ['wallet', 'account']
+
+DAYS_IN_YEAR = 365.0
+
+
+class Returns:
+    """
+    The money-weighted and time-weighted return of a wallet or an account, in a single currency
+
+    Attributes:
+    -----
+    currency: str
+        The code of the currency of the cash flows and of the value
+    net_deposits: Decimal
+        The deposits less the withdrawals, each converted on the day it was made
+    value: Decimal
+        The current value of the held lots and of the cash
+    xirr: Decimal
+        The annual internal rate of return of the cash flows and the current value, None when it has no solution
+    twr: Decimal
+        The time-weighted return over the stored daily snapshots, None when there are none
+    """
+
+    def __init__(self, currency, net_deposits=None, value=None, xirr=None, twr=None):
+
+        self.currency = currency
+        self.net_deposits = net_deposits
+        self.value = value
+        self.xirr = xirr
+        self.twr = twr
+
+
+def _npv(amounts, years, rates):
+    """
+    The net present value of every series of cash flows at its rate and its derivative by the rate
+    """
+
+    discounts = np.exp(-years * np.log1p(rates)[:, None])
+    values = (amounts * discounts).sum(axis=1)
+    derivatives = -(years * amounts * discounts).sum(axis=1) / (1 + rates)
+
+    return values, derivatives
+
+
+def xirr(amounts, years, guess=0.1, tolerance=1e-10, max_iterations=50):
+    """
+    Solve the internal rate of return of many series of cash flows at once.
+
+    The flows are given as (series, flows) arrays of the amounts and of their times in years
+    from the first flow, shorter series padded with zero amounts. Newton steps are taken for
+    every unsolved series in a single array operation; series where they do not converge are
+    bisected between a rate just above -100% and a rate where the value changes sign. Returns
+    the annual rates, NaN for series without both a positive and a negative flow or without a root.
+    """
+
+    amounts = np.atleast_2d(np.asarray(amounts, dtype=float))
+    years = np.atleast_2d(np.asarray(years, dtype=float))
+
+    series = amounts.shape[0]
+    rates = np.full(series, float(guess))
+    scale = np.abs(amounts).sum(axis=1)
+
+    solvable = (amounts > 0).any(axis=1) & (amounts < 0).any(axis=1) & (years.max(axis=1, initial=0) > 0)
+    converged = np.zeros(series, dtype=bool)
+    failed = np.zeros(series, dtype=bool)
+
+    for _ in range(max_iterations):
+        active = np.flatnonzero(solvable & ~converged & ~failed)
+        if not len(active):
+            break
+
+        values, derivatives = _npv(amounts[active], years[active], rates[active])
+
+        with np.errstate(over='ignore', divide='ignore', invalid='ignore'):
+            stepped = rates[active] - values / derivatives
+
+        # A step at or below -100% goes half way to it instead
+        stepped = np.where(stepped <= -1, (rates[active] - 1) / 2, stepped)
+
+        failed[active] = ~np.isfinite(stepped)
+        rates[active] = np.where(failed[active], rates[active], stepped)
+
+        values, _ = _npv(amounts[active], years[active], rates[active])
+        converged[active] = ~failed[active] & (np.abs(values) <= tolerance * scale[active])
+
+    pending = np.flatnonzero(solvable & ~converged)
+    if len(pending):
+        rates[pending] = _bisect(amounts[pending], years[pending], tolerance)
+        converged[pending] = np.isfinite(rates[pending])
+
+    return np.where(solvable & converged, rates, np.nan)
+
+
+def _bisect(amounts, years, tolerance, iterations=200):
+    """
+    Find the rate where the value of every series changes sign, NaN where it does not
+    """
+
+    series = amounts.shape[0]
+
+    low = np.full(series, -1 + 1e-6)
+    high = np.ones(series)
+    low_values, _ = _npv(amounts, years, low)
+
+    with np.errstate(over='ignore', invalid='ignore'):
+        for _ in range(60):
+            high_values, _ = _npv(amounts, years, high)
+            same_sign = np.sign(high_values) == np.sign(low_values)
+            if not same_sign.any():
+                break
+            high = np.where(same_sign, high * 2, high)
+
+        bracketed = np.sign(high_values) != np.sign(low_values)
+
+        for _ in range(iterations):
+            middle = (low + high) / 2
+            middle_values, _ = _npv(amounts, years, middle)
+
+            lower_half = np.sign(middle_values) != np.sign(low_values)
+            high = np.where(lower_half, middle, high)
+            low = np.where(lower_half, low, middle)
+            low_values = np.where(lower_half, low_values, middle_values)
+
+            if np.all(high - low <= tolerance * (1 + np.abs(low))):
+                break
+
+    return np.where(bracketed, (low + high) / 2, np.nan)
+
+
+def time_weighted_returns(values, flows):
+    """
+    Chain the daily returns of many value series at once.
+
+    The values and the external flows are given as (series, days) arrays, shorter series
+    padded with NaN values. A flow is taken as made at the start of its day, so the return of
+    a day is its closing value over the previous closing value plus the flow. Days starting
+    without any value do not count. Returns the cumulative returns, NaN for series without any
+    counted day.
+    """
+
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    flows = np.atleast_2d(np.asarray(flows, dtype=float))
+
+    previous = np.concatenate([np.zeros((values.shape[0], 1)), values[:, :-1]], axis=1)
+    invested = np.nan_to_num(previous) + flows
+
+    counted = ~np.isnan(values) & (invested > 0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth = np.where(counted, values / invested, 1.0)
+
+    return np.where(counted.any(axis=1), growth.prod(axis=1) - 1, np.nan)
+
+
+def _external_flows(scope, ids, until):
+    """
+    Load the deposits and withdrawals of the wallets or accounts as (id, date, currency code, signed amount) rows
+    """
+
+    flows = []
+
+    for model, date_field, sign in [(Deposit, 'deposited_at', 1), (Withdrawal, 'withdrawn_at', -1)]:
+        rows = model.objects.filter(**{f'{scope}__in': ids}).values_list(f'{scope}_id', date_field, 'currency__code', 'amount')
+        for scope_id, date, code, amount in rows:
+            date = _local_date(date)
+            if date <= until:
+                flows.append((scope_id, date, code, sign * amount))
+
+    return flows
+
+
+def _transaction_cash(scope, ids):
+    """
+    Sum the cash paid for buys and received for sales by every wallet or account, per account currency
+    """
+
+    cash = {}
+
+    signed_total = Case(
+        When(transaction_type='B', then=-F('total_price')),
+        default=F('total_price'),
+        output_field=DecimalField(max_digits=30, decimal_places=10)
+    )
+
+    for model in [MarketAssetTransaction, TreasuryBondsTransaction]:
+        rows = model.objects.filter(**{f'{scope}__in': ids}).with_total_price().values(
+            scope_id=F(scope), currency_code=F('account_currency__code')
+        ).annotate(total=Sum(signed_total)).order_by()
+
+        for row in rows:
+            key = (row['scope_id'], row['currency_code'])
+            cash[key] = cash.get(key, 0) + row['total']
+
+    return cash
+
+
+def _snapshot_returns(ids, flows, flow_values, currency, fx_history, until):
+    """
+    Compute the time-weighted return of every wallet from its daily snapshots, in the currency.
+
+    The snapshots store the value of the wallet in the base currency, every day is converted to
+    the currency with the rate of that day, like the flows, which are given already converted.
+    """
+
+    rows = list(
+        WalletDailySnapshot.objects.filter(wallet__in=ids, date__lte=until).order_by('wallet', 'date').values_list('wallet_id', 'date', 'value')
+    )
+    if not rows:
+        return {}
+
+    converted = fx_history.rates_on([fx_history.base] * len(rows), [currency] * len(rows), [date for _, date, _ in rows])
+    converted *= np.array([float(value) for _, _, value in rows])
+
+    snapshots = {}
+    for (wallet_id, date, _), value in zip(rows, converted):
+        snapshots.setdefault(wallet_id, ([], []))
+        snapshots[wallet_id][0].append(date)
+        snapshots[wallet_id][1].append(value)
+
+    wallet_ids = list(snapshots)
+    rows_by_wallet = {wallet_id: row for row, wallet_id in enumerate(wallet_ids)}
+    days = max(len(dates) for dates, _ in snapshots.values())
+
+    values = np.full((len(wallet_ids), days), np.nan)
+    daily_flows = np.zeros((len(wallet_ids), days))
+    # A day without a rate leaves the return of the whole wallet unknown
+    unknown = np.zeros(len(wallet_ids), dtype=bool)
+
+    for row, wallet_id in enumerate(wallet_ids):
+        wallet_values = np.array(snapshots[wallet_id][1])
+        values[row, :len(wallet_values)] = wallet_values
+        unknown[row] = np.isnan(wallet_values).any()
+
+    # Every flow belongs to the first snapshot on or after its day, which also covers gaps
+    flow_rows, flow_columns, flow_amounts = [], [], []
+    for (wallet_id, date, _, _), amount in zip(flows, flow_values):
+        if wallet_id not in rows_by_wallet:
+            continue
+        dates = snapshots[wallet_id][0]
+        column = int(np.searchsorted(np.array(dates, dtype='datetime64[D]'), np.datetime64(date, 'D')))
+        if column < len(dates):
+            flow_rows.append(rows_by_wallet[wallet_id])
+            flow_columns.append(column)
+            flow_amounts.append(amount)
+
+    np.add.at(daily_flows, (flow_rows, flow_columns), flow_amounts)
+    unknown |= np.isnan(daily_flows).any(axis=1)
+
+    returns = time_weighted_returns(values, np.nan_to_num(daily_flows))
+
+    return dict(zip(wallet_ids, np.where(unknown, np.nan, returns)))
+
+
+def _to_decimal(value, places):
+    return None if value is None or np.isnan(value) else Decimal(f'{value:.{places}f}')
+
+
+def compute_returns(scope, ids, currency=None, until=None):
+    """
+    Compute the returns of many wallets or accounts, scope being 'wallet' or 'account', at once.
+
+    The deposits and withdrawals are the cash flows, each converted to the currency, the base
+    currency by default, with the rates of its own day; the current value of the held lots and
+    of the cash left from the transactions closes every series. The flows, the cash, the lots of
+    all series and the rates are each loaded with a fixed number of queries whatever the number
+    of series, and the series are solved together by the vectorized xirr. Time-weighted returns
+    come from the daily snapshots, which only wallets have, converted with the rates of their
+    days. Series with an amount in a currency without a known rate are reported with unknown values.
+    """
+
+    if scope not in RETURN_SCOPES:
+        raise ValueError(f'Unknown return scope: {scope}')
+
+    ids = list(ids)
+    currency = currency or settings.BASE_CURRENCY
+    until = until or timezone.localdate()
+
+    flows = _external_flows(scope, ids, until)
+
+    closing = {}
+    for (scope_id, code), amount in _transaction_cash(scope, ids).items():
+        closing[(scope_id, code)] = closing.get((scope_id, code), 0) + amount
+    for scope_id, _, code, amount in flows:
+        closing[(scope_id, code)] = closing.get((scope_id, code), 0) + amount
+    lots = {f'{scope}__in': ids}
+    for scope_id, valuation in value_holdings_by(f'{scope}_id', UserAsset.objects.filter(**lots), UserTreasuryBonds.objects.filter(**lots)).items():
+        for code, value in valuation.values_by_currency.items():
+            closing[(scope_id, code)] = closing.get((scope_id, code), 0) + value
+
+    currencies = {code for _, _, code, _ in flows} | {code for _, code in closing} | {currency}
+    fx_history = FXHistory.load(currencies, until)
+
+    flow_values = fx_history.rates_on([code for _, _, code, _ in flows], [currency] * len(flows), [date for _, date, _, _ in flows])
+    flow_values *= np.array([float(amount) for _, _, _, amount in flows])
+
+    closing_keys = [key for key, amount in closing.items() if amount != 0]
+    closing_values = fx_history.rates_on([code for _, code in closing_keys], [currency] * len(closing_keys), [until] * len(closing_keys))
+    closing_values *= np.array([float(closing[key]) for key in closing_keys])
+
+    rows = {scope_id: row for row, scope_id in enumerate(ids)}
+    series = [[] for _ in ids]
+
+    net_deposits = np.zeros(len(ids))
+    for (scope_id, date, _, _), value in zip(flows, flow_values):
+        series[rows[scope_id]].append((date, -value))
+        net_deposits[rows[scope_id]] += value
+
+    values = np.zeros(len(ids))
+    for (scope_id, _), value in zip(closing_keys, closing_values):
+        values[rows[scope_id]] += value
+
+    width = max([len(flows_of_series) for flows_of_series in series], default=0) + 1
+    amounts = np.zeros((len(ids), width))
+    years = np.zeros((len(ids), width))
+
+    for row, flows_of_series in enumerate(series):
+        if not flows_of_series:
+            continue
+        start = min(date for date, _ in flows_of_series)
+        for column, (date, amount) in enumerate(flows_of_series):
+            amounts[row, column] = amount
+            years[row, column] = (date - start).days / DAYS_IN_YEAR
+        amounts[row, -1] = values[row]
+        years[row, -1] = (until - start).days / DAYS_IN_YEAR
+
+    # A NaN amount means a missing rate, which leaves the whole series unknown
+    known = ~np.isnan(amounts).any(axis=1) & ~np.isnan(values)
+    rates = xirr(np.nan_to_num(amounts), years)
+
+    twr = _snapshot_returns(ids, flows, flow_values, currency, fx_history, until) if scope == 'wallet' else {}
+
+    returns = {}
+    for row, scope_id in enumerate(ids):
+        if not known[row]:
+            returns[scope_id] = Returns(currency, twr=_to_decimal(twr.get(scope_id), 6))
+            continue
+
+        returns[scope_id] = Returns(
+            currency,
+            net_deposits=_to_decimal(net_deposits[row], 2),
+            value=_to_decimal(values[row], 2),
+            xirr=_to_decimal(rates[row], 6),
+            twr=_to_decimal(twr.get(scope_id), 6)
+        )
+
+    return returns
+
+
+def wallet_returns(wallet_id, currency=None, until=None):
+    """
+    Compute the returns of a single wallet
+    """
+
+    return compute_returns('wallet', [wallet_id], currency, until)[wallet_id]
+
+
+def account_returns(account_id, currency=None, until=None):
+    """
+    Compute the returns of a single account, which has no time-weighted return
+    """
+
+    return compute_returns('account', [account_id], currency, until)[account_id]
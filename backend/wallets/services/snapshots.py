@@ -0,0 +1,253 @@
+import datetime as dt
+
+from collections import defaultdict, deque
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from wallets.models import Currency, WalletDailySnapshot
+from wallets.reference import get_reference
+
+from .bonds import BondTerms, accrue_unit_values
+from .fx import FXHistory, MissingExchangeRate
+from .history import PriceHistory, _local_date
+
+
+def invalidate_wallet_snapshots(wallet_ids, date):
+    """
+    Remove the snapshots that are outdated by a change effective on the given date
+    """
+
+    if isinstance(date, dt.datetime):
+        date = timezone.localtime(date).date() if timezone.is_aware(date) else date.date()
+
+    WalletDailySnapshot.objects.filter(wallet__in=wallet_ids, date__gte=date).delete()
+
+
+def _wallet_events(wallet):
+    """
+    Load every event changing the holdings or the cash of the wallet, ordered by date
+    """
+
+    events = []
+
+    for deposit in wallet.deposits.select_related('currency'):
+        events.append((_local_date(deposit.deposited_at), 'deposit', deposit))
+
+    for withdrawal in wallet.withdrawals.select_related('currency'):
+        events.append((_local_date(withdrawal.withdrawn_at), 'withdrawal', withdrawal))
+
+    market_transactions = wallet.marketassettransaction.select_related('asset', 'account_currency').with_total_price()
+    for market_transaction in market_transactions.order_by('transaction_date', 'id'):
+        events.append((_local_date(market_transaction.transaction_date), 'asset', market_transaction))
+
+    bond_transactions = wallet.treasurybondstransaction.select_related('bond', 'account_currency').prefetch_related('bond__interest_rates').with_total_price()
+    for bond_transaction in bond_transactions.order_by('transaction_date', 'id'):
+        events.append((_local_date(bond_transaction.transaction_date), 'bond', bond_transaction))
+
+    events.sort(key=lambda event: event[0])
+
+    return events
+
+
+class WalletReplay:
+    """
+    Holdings and cash of a wallet rebuilt by replaying its events
+
+    Attributes:
+    -----
+    assets: dict
+        The held amount, the last traded price and currency price and the price currency code,
+        keyed by (asset id, account currency code)
+    bonds: dict
+        The open bond lots as [bond, issue date, amount], keyed by bond id
+    bond_terms: dict
+        The accrual terms of every bond series, keyed by bond id
+    cash: dict
+        The cash held, keyed by currency code
+    """
+
+    def __init__(self):
+
+        self.assets = {}
+        self.bonds = defaultdict(deque)
+        self.bond_terms = {}
+        self.cash = defaultdict(Decimal)
+
+    def apply(self, kind, event):
+
+        if kind == 'deposit':
+            self.cash[event.currency.code] += event.amount
+
+        elif kind == 'withdrawal':
+            self.cash[event.currency.code] -= event.amount
+
+        elif kind == 'asset':
+            key = (event.asset_id, event.account_currency.code)
+            price_currency = get_reference(Currency, pk=event.asset.price_currency_id).code
+            position = self.assets.setdefault(key, [Decimal(0), event.price, event.currency_price, price_currency])
+
+            if event.transaction_type == 'B':
+                position[0] += event.amount
+                position[1] = event.price
+                position[2] = event.currency_price
+                self.cash[event.account_currency.code] -= event.total_price
+            else:
+                position[0] -= event.amount
+                self.cash[event.account_currency.code] += event.total_price
+
+        elif kind == 'bond':
+            lots = self.bonds[event.bond_id]
+
+            if event.bond_id not in self.bond_terms:
+                self.bond_terms[event.bond_id] = BondTerms.from_bond(event.bond)
+
+            if event.transaction_type == 'B':
+                lots.append([event.bond, _local_date(event.transaction_date), event.amount])
+                self.cash[event.account_currency.code] -= event.total_price
+            else:
+                to_sell = event.amount
+                while to_sell > 0 and lots:
+                    sold = min(lots[0][2], to_sell)
+                    lots[0][2] -= sold
+                    to_sell -= sold
+                    if lots[0][2] == 0:
+                        lots.popleft()
+                self.cash[event.account_currency.code] += event.total_price
+
+    def snapshot(self, wallet, date, asset_prices, fx_history):
+        """
+        Value the holdings and the cash on the date, converting every amount to the base
+        currency with the rates known on that day
+        """
+
+        def to_base(amount, currency):
+
+            rate = fx_history.rate_on(currency, fx_history.base, date)
+            if rate is None:
+                raise MissingExchangeRate(f'No rate of {currency} to {fx_history.base} is known on {date}.')
+            return amount * rate
+
+        assets_value = Decimal(0)
+        for (asset_id, account_currency), (amount, last_price, last_currency_price, price_currency) in self.assets.items():
+            if amount == 0:
+                continue
+
+            value = amount * asset_prices.price_on(asset_id, date, last_price)
+            if price_currency != account_currency and fx_history.rate_on(price_currency, account_currency, date) is None:
+                # Without dated rates the value is taken at the rate of the last trade
+                value *= last_currency_price
+                price_currency = account_currency
+            assets_value += to_base(value, price_currency)
+
+        bond_lots = [(bond, issue_date, amount) for lots in self.bonds.values() for bond, issue_date, amount in lots]
+        unit_values = accrue_unit_values(
+            [self.bond_terms[bond.id] for bond, _, _ in bond_lots], [issue_date for _, issue_date, _ in bond_lots], [date]
+        )
+        bonds_value = sum(
+            (
+                to_base(Decimal(f'{unit_values[index, 0]:.2f}') * amount, get_reference(Currency, pk=bond.price_currency_id).code)
+                for index, (bond, _, amount) in enumerate(bond_lots)
+            ),
+            Decimal(0)
+        )
+
+        cash = {code: amount for code, amount in self.cash.items() if amount != 0}
+        cash_value = sum((to_base(amount, code) for code, amount in cash.items()), Decimal(0))
+
+        return WalletDailySnapshot(
+            wallet=wallet,
+            date=date,
+            value=round(assets_value + bonds_value + cash_value, 2),
+            assets_value=round(assets_value, 2),
+            bonds_value=round(bonds_value, 2),
+            cash={code: str(round(amount, 2)) for code, amount in cash.items()}
+        )
+
+
+def build_wallet_snapshots(wallet, until=None):
+    """
+    Extend the daily snapshots of the wallet up to the given date.
+
+    Only the days after the last stored snapshot are priced and written. The events of the
+    wallet and the price history of its instruments and currencies are each loaded once, and
+    prices are looked up in memory for every day. Values are stored in the base currency and
+    MissingExchangeRate is raised when a held currency has no rate known on a day.
+    """
+
+    until = until or timezone.localdate()
+
+    events = _wallet_events(wallet)
+    if not events:
+        return 0
+
+    last_snapshot = wallet.snapshots.order_by('-date').first()
+    start = last_snapshot.date + dt.timedelta(days=1) if last_snapshot else events[0][0]
+
+    if start > until:
+        return 0
+
+    asset_events = [event for _, kind, event in events if kind == 'asset']
+
+    currencies = set()
+    for _, kind, event in events:
+        if kind in ('deposit', 'withdrawal'):
+            currencies.add(event.currency.code)
+        else:
+            instrument = event.asset if kind == 'asset' else event.bond
+            currencies.update([event.account_currency.code, get_reference(Currency, pk=instrument.price_currency_id).code])
+
+    asset_prices = PriceHistory.for_assets({event.asset_id for event in asset_events}, until)
+    fx_history = FXHistory.load(currencies, until)
+
+    replay = WalletReplay()
+    snapshots = []
+    pending = deque(events)
+
+    day = min(start, events[0][0])
+    while day <= until:
+
+        while pending and pending[0][0] <= day:
+            _, kind, event = pending.popleft()
+            replay.apply(kind, event)
+
+        if day >= start:
+            snapshots.append(replay.snapshot(wallet, day, asset_prices, fx_history))
+
+        day += dt.timedelta(days=1)
+
+    with transaction.atomic():
+        WalletDailySnapshot.objects.bulk_create(snapshots, batch_size=500)
+
+    return len(snapshots)
+
+
+def rebuild_wallet_snapshots(wallet, since, until=None):
+    """
+    Drop the snapshots of the wallet from the given date and build them again
+    """
+
+    with transaction.atomic():
+        wallet.snapshots.filter(date__gte=since).delete()
+
+        return build_wallet_snapshots(wallet, until)
+
+
+def downsample_snapshots(snapshots, interval):
+    """
+    Keep the last snapshot of every week or month of an ordered snapshot sequence
+    """
+
+    if interval == 'week':
+        bucket = lambda snapshot: snapshot.date.isocalendar()[:2]
+    elif interval == 'month':
+        bucket = lambda snapshot: (snapshot.date.year, snapshot.date.month)
+    else:
+        return list(snapshots)
+
+    sampled = {}
+    for snapshot in snapshots:
+        sampled[bucket(snapshot)] = snapshot
+
+    return list(sampled.values())
@@ -0,0 +1,309 @@
+import csv
+import datetime as dt
+
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from wallets.access import account_has_currency, can_access_account, can_access_wallet, wallet_has_account
+from wallets.models import Account, AccountBalanceEntry, AccountCurrencyBalance, Currency, MarketAsset, MarketAssetTransaction, UserAsset, UserAssetSale, Wallet
+from wallets.reference import reference_objects
+
+from .lots import match_lots
+from .snapshots import invalidate_wallet_snapshots
+from .valuation import invalidate_valuations
+
+
+MAX_IMPORT_ROWS = 10000
+
+DECIMAL_FIELDS = ['amount', 'price', 'currency_price', 'commission']
+
+
+class TransactionImportResult:
+    """
+    Summary of a batch transaction import
+
+    Attributes:
+    -----
+    transactions: list
+        The created transactions, in the order of the imported rows
+    errors: list
+        The rejected rows as (row number, errors) pairs, errors being keyed by field
+    """
+
+    def __init__(self):
+
+        self.transactions = []
+        self.errors = []
+
+    @property
+    def is_valid(self):
+        return not self.errors
+
+
+def read_transaction_file(path):
+    """
+    Read the rows of a CSV transaction file as dictionaries
+    """
+
+    with open(path, newline='') as transaction_file:
+        return list(csv.DictReader(transaction_file))
+
+
+def _reference_data(user, rows):
+    """
+    Load every account, wallet and asset referenced by the rows, each with a single query, and the currencies from the reference data cache
+    """
+
+    def ids(field):
+        return {int(row[field]) for row in rows if str(row.get(field) or '').isdigit()}
+
+    accounts = Account.objects.filter(id__in=ids('account')).prefetch_related('currencies', 'co_owners').in_bulk()
+    wallets = Wallet.objects.filter(id__in=ids('wallet')).prefetch_related('co_owners', 'accounts').in_bulk()
+    currencies = {currency.code: currency for currency in reference_objects(Currency)}
+
+    assets = {}
+    for asset in MarketAsset.objects.filter(code__in={row.get('code') for row in rows}).select_related('exchange_market', 'price_currency'):
+        assets[(str(asset.exchange_market_id), asset.code)] = asset
+        assets[(asset.exchange_market.code, asset.code)] = asset
+
+    return accounts, wallets, currencies, assets
+
+
+def _parse_row(row, user, accounts, wallets, currencies, assets, now):
+    """
+    Build an unsaved transaction from a row, returning it with the errors found, keyed by field
+    """
+
+    errors = {}
+    values = {}
+
+    for field in DECIMAL_FIELDS:
+        raw = row.get(field)
+        if raw in [None, ''] and field in ['currency_price', 'commission']:
+            raw = 0
+        try:
+            values[field] = MarketAssetTransaction._meta.get_field(field).clean(raw, None)
+        except ValidationError as error:
+            errors[field] = ' '.join(error.messages)
+
+    transaction_type = row.get('transaction_type')
+    if transaction_type not in ['B', 'S']:
+        errors['transaction_type'] = 'Transaction type must be B or S.'
+
+    transaction_date = row.get('transaction_date')
+    if not isinstance(transaction_date, dt.datetime):
+        transaction_date = parse_datetime(str(transaction_date or ''))
+    if transaction_date is None:
+        errors['transaction_date'] = 'Date has wrong format. Use YYYY-MM-DDThh:mm[:ss[.uuuuuu]][+HH:MM|-HH:MM|Z].'
+    else:
+        if timezone.is_naive(transaction_date):
+            transaction_date = timezone.make_aware(transaction_date)
+        if transaction_date > now:
+            errors['transaction_date'] = 'Date cannot be in the future.'
+
+    account = accounts.get(int(row['account'])) if str(row.get('account') or '').isdigit() else None
+    if account is None:
+        errors['account'] = 'Account does not exist.'
+    elif not can_access_account(user, account):
+        errors['account'] = 'You do not own this account.'
+
+    wallet = wallets.get(int(row['wallet'])) if str(row.get('wallet') or '').isdigit() else None
+    if wallet is None:
+        errors['wallet'] = 'Wallet does not exist.'
+    elif not can_access_wallet(user, wallet):
+        errors['wallet'] = 'You do not own this wallet.'
+    elif account is not None and not wallet_has_account(user, wallet, account):
+        errors['account_wallet_mismatch'] = 'The account must belong to the wallet to make a transaction.'
+
+    account_currency = currencies.get(row.get('account_currency'))
+    if account_currency is None:
+        errors['account_currency'] = f'{row.get("account_currency")} is a wrong currency. Please provide a valid currency.'
+    elif account is not None and not account_has_currency(user, account, account_currency):
+        errors['account_currency'] = 'This currency is not supported by this account.'
+
+    asset = assets.get((str(row.get('exchange_market')), row.get('code')))
+    if asset is None:
+        errors['asset'] = 'Asset does not exist.'
+
+    if errors:
+        return None, errors
+
+    return MarketAssetTransaction(
+        user=user,
+        transaction_type=transaction_type,
+        account=account,
+        wallet=wallet,
+        asset=asset,
+        account_currency=account_currency,
+        transaction_date=transaction_date,
+        **values
+    ), errors
+
+
+def import_market_transactions(user, rows, dry_run=False):
+    """
+    Validate and create a batch of market asset transactions for the user.
+
+    The referenced accounts, wallets, currencies and assets are loaded once. The rows are then
+    validated in memory in date order, simulating the running cash balance and the held lots,
+    and all of them are written in one database transaction with bulk inserts and updates.
+    Nothing is written when any row is rejected.
+
+    Rows use the fields of the market transaction API: account, wallet, transaction_type,
+    amount, price, account_currency, currency_price, commission, transaction_date, code and
+    exchange_market, which may be the id or the code of the exchange market.
+    """
+
+    result = TransactionImportResult()
+
+    if len(rows) > MAX_IMPORT_ROWS:
+        result.errors.append((0, {'rows': f'A batch can contain at most {MAX_IMPORT_ROWS} transactions.'}))
+        return result
+
+    accounts, wallets, currencies, assets = _reference_data(user, rows)
+    now = timezone.now()
+
+    parsed = []
+    for row_number, row in enumerate(rows, start=1):
+        market_transaction, errors = _parse_row(row, user, accounts, wallets, currencies, assets, now)
+        if errors:
+            result.errors.append((row_number, errors))
+        else:
+            parsed.append((row_number, market_transaction))
+
+    if result.errors or not parsed:
+        return result
+
+    parsed.sort(key=lambda item: item[1].transaction_date)
+
+    with transaction.atomic():
+
+        balances = {
+            (balance.account_id, balance.currency_id): balance
+            for balance in AccountCurrencyBalance.objects.select_for_update().filter(account__in={t.account_id for _, t in parsed})
+        }
+        running_balances = {key: balance.balance for key, balance in balances.items()}
+
+        held_lots = defaultdict(list)
+        existing_lots = UserAsset.objects.select_for_update().filter(
+            user=user,
+            active=True,
+            account__in={t.account_id for _, t in parsed},
+            asset__in={t.asset_id for _, t in parsed}
+        ).order_by('created_at', 'id')
+        for lot in existing_lots:
+            held_lots[(lot.account_id, lot.asset_id)].append(lot)
+
+        new_lots = []
+        sales = []
+        movements = []
+
+        for row_number, market_transaction in parsed:
+
+            key = (market_transaction.account_id, market_transaction.account_currency_id)
+            total_price = market_transaction.total_price
+            lots = held_lots[(market_transaction.account_id, market_transaction.asset_id)]
+
+            if key not in running_balances:
+                result.errors.append((row_number, {'account_currency': 'The account does not have a balance in this currency.'}))
+                continue
+
+            if market_transaction.transaction_type == 'B':
+
+                if total_price > running_balances[key]:
+                    result.errors.append((row_number, {'not_enough_funds': 'The account does not have enough balance to make this transaction.'}))
+                    continue
+
+                lot = UserAsset(
+                    user=user,
+                    account=market_transaction.account,
+                    wallet=market_transaction.wallet,
+                    asset=market_transaction.asset,
+                    amount=market_transaction.amount,
+                    price=market_transaction.price,
+                    account_currency=market_transaction.account_currency,
+                    currency_price=market_transaction.currency_price,
+                    commission=market_transaction.commission,
+                    buy_transaction=market_transaction,
+                    active=True
+                )
+                lots.append(lot)
+                new_lots.append(lot)
+                amount = -total_price
+
+            else:
+
+                if sum(lot.amount for lot in lots) < market_transaction.amount:
+                    result.errors.append((row_number, {'amount': 'You do not have enough assets to sell.'}))
+                    continue
+
+                for lot, consumed in match_lots(lots, market_transaction.amount):
+                    lot.amount -= consumed
+                    lot.active = lot.amount > 0
+                    sales.append((lot, market_transaction, consumed))
+                amount = total_price
+
+            running_balances[key] += amount
+            movements.append((key, market_transaction, amount, running_balances[key]))
+            result.transactions.append(market_transaction)
+
+        if result.errors or dry_run:
+            transaction.set_rollback(True)
+            if result.errors:
+                result.errors.sort(key=lambda error: error[0])
+                result.transactions = []
+            return result
+
+        MarketAssetTransaction.objects.bulk_create(result.transactions, batch_size=1000)
+
+        for lot in new_lots:
+            lot.buy_transaction_id = lot.buy_transaction.id
+        UserAsset.objects.bulk_create(new_lots, batch_size=1000)
+
+        new_lot_ids = {lot.id for lot in new_lots}
+        changed_lots = {lot.id: lot for lot, _, _ in sales if lot.id not in new_lot_ids}
+        updated_at = timezone.now()
+        for lot in changed_lots.values():
+            lot.updated_at = updated_at
+        UserAsset.objects.bulk_update(changed_lots.values(), ['amount', 'active', 'updated_at'], batch_size=1000)
+
+        through_model = UserAsset.sell_transactions.through
+        through_model.objects.bulk_create(
+            [through_model(userasset_id=lot.id, marketassettransaction_id=market_transaction.id) for lot, market_transaction, _ in sales],
+            ignore_conflicts=True,
+            batch_size=1000
+        )
+        UserAssetSale.objects.bulk_create(
+            [UserAssetSale(lot=lot, transaction=market_transaction, amount=consumed) for lot, market_transaction, consumed in sales],
+            batch_size=1000
+        )
+
+        AccountBalanceEntry.objects.bulk_create([
+            AccountBalanceEntry(
+                balance=balances[key],
+                kind=market_transaction.transaction_type,
+                amount=amount,
+                balance_after=balance_after,
+                effective_at=market_transaction.transaction_date,
+                reference_id=market_transaction.id
+            )
+            for key, market_transaction, amount, balance_after in movements
+        ], batch_size=1000)
+
+        for key, balance in balances.items():
+            delta = running_balances[key] - balance.balance
+            if delta:
+                AccountCurrencyBalance.objects.filter(pk=balance.pk).update(balance=F('balance') + delta)
+
+        wallet_ids = {market_transaction.wallet_id for market_transaction in result.transactions}
+        invalidate_wallet_snapshots(wallet_ids, min(market_transaction.transaction_date for market_transaction in result.transactions))
+
+    # The performance reports are cached with the valuations, so this drops both
+    invalidate_valuations(wallet_ids, {market_transaction.account_id for market_transaction in result.transactions})
+
+    return result
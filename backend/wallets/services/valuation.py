@@ -0,0 +1,349 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+
+from wallets.models import UserAsset, UserTreasuryBonds
+
+from .bonds import value_bond_lots
+from .fx import FXMatrix
+
+
+VALUATION_CACHE_TIMEOUT = 60 * 60
+
+PRICES_WATERMARK = 'prices'
+
+
+class Valuation:
+    """
+    Valuation of a set of market asset and treasury bond lots
+
+    Attributes:
+    -----
+    lots: dict
+        The value of every UserAsset lot, keyed by the lot id
+    bond_lots: dict
+        The value of every UserTreasuryBonds lot, keyed by the lot id
+    assets: dict
+        The value of every held MarketAsset, keyed by the asset id
+    bonds: dict
+        The value of every held bond, keyed by the bond id
+    asset_positions: dict
+        The value of every held MarketAsset, keyed by the asset id and the code of the currency it is valued in
+    bond_positions: dict
+        The value of every held bond, keyed by the bond id and the code of the currency it is valued in
+    values_by_currency: dict
+        The value of all lots, keyed by the code of the currency they are valued in
+    asset_values_by_currency: dict
+        The value of the market asset lots, keyed by the code of the currency they are valued in
+    bond_values_by_currency: dict
+        The value of the bond lots, keyed by the code of the currency they are valued in
+    costs_by_currency: dict
+        The cost basis of all lots, keyed by the code of the currency they are valued in
+
+    Methods:
+    -----
+    total_assets:
+        Returns the value of all market asset lots in the base currency
+    total_bonds:
+        Returns the value of all bond lots in the base currency
+    total:
+        Returns the value of all lots in the base currency
+    proportion:
+        Returns the share and the value in the base currency of assets and bonds in the total
+    unrealized:
+        Returns the unrealized profit of all lots, keyed by currency code
+    """
+
+    def __init__(self):
+
+        self.lots = {}
+        self.bond_lots = {}
+        self.assets = {}
+        self.bonds = {}
+        self.asset_positions = {}
+        self.bond_positions = {}
+        self.values_by_currency = {}
+        self.asset_values_by_currency = {}
+        self.bond_values_by_currency = {}
+        self.costs_by_currency = {}
+
+    def add_lot(self, lot, value, cost=0, currency=None):
+
+        self.lots[lot.id] = value
+        self.assets[lot.asset_id] = self.assets.get(lot.asset_id, 0) + value
+        self.asset_positions[(lot.asset_id, currency)] = self.asset_positions.get((lot.asset_id, currency), 0) + value
+        self.add_currency_value(self.asset_values_by_currency, currency, value, cost)
+
+    def add_bond_lot(self, lot, value, cost=0, currency=None):
+
+        self.bond_lots[lot.id] = value
+        self.bonds[lot.bond_id] = self.bonds.get(lot.bond_id, 0) + value
+        self.bond_positions[(lot.bond_id, currency)] = self.bond_positions.get((lot.bond_id, currency), 0) + value
+        self.add_currency_value(self.bond_values_by_currency, currency, value, cost)
+
+    def add_currency_value(self, values_by_currency, currency, value, cost):
+
+        if currency is None:
+            return
+
+        values_by_currency[currency] = values_by_currency.get(currency, 0) + value
+        self.values_by_currency[currency] = self.values_by_currency.get(currency, 0) + value
+        self.costs_by_currency[currency] = self.costs_by_currency.get(currency, 0) + cost
+
+    # The totals convert the lot values to the base currency, raising MissingExchangeRate when a
+    # currency they are valued in has no price
+
+    @property
+    def total_assets(self):
+        return fx_matrix().total(self.asset_values_by_currency, settings.BASE_CURRENCY)
+
+    @property
+    def total_bonds(self):
+        return fx_matrix().total(self.bond_values_by_currency, settings.BASE_CURRENCY)
+
+    @property
+    def total(self):
+        return fx_matrix().total(self.values_by_currency, settings.BASE_CURRENCY)
+
+    @property
+    def proportion(self):
+
+        total_assets, total_bonds = self.total_assets, self.total_bonds
+        total_value = total_assets + total_bonds
+
+        return {
+            'assets': ((total_assets/total_value) if total_value != 0 else 0, total_assets),
+            'bonds': ((total_bonds/total_value) if total_value != 0 else 0, total_bonds)
+        }
+
+    @property
+    def unrealized(self):
+        return {currency: value - self.costs_by_currency[currency] for currency, value in self.values_by_currency.items()}
+
+
+def value_holdings(user_assets, user_bonds):
+    """
+    Value the active lots of the given UserAsset and UserTreasuryBonds querysets.
+
+    The latest prices are denormalized on MarketAsset and Currency, so the lots
+    and the bonds are each loaded with a single query whatever their number, and
+    the bond lots are accrued in a single pass of the bond accrual engine.
+    """
+
+    return value_holdings_by(None, user_assets, user_bonds).get(None, Valuation())
+
+
+def value_holdings_by(field, user_assets, user_bonds):
+    """
+    Value the active lots of the querysets like value_holdings, in a separate Valuation for every
+    value of the given lot field, e.g. 'wallet_id', with the same number of queries
+    """
+
+    valuations = {}
+
+    def valuation_of(lot):
+
+        key = getattr(lot, field) if field else None
+        if key not in valuations:
+            valuations[key] = Valuation()
+        return valuations[key]
+
+    lots = user_assets.filter(active=True).select_related('asset', 'asset__price_currency', 'account_currency')
+
+    for lot in lots:
+        valuation_of(lot).add_lot(lot, lot.current_value, lot.cost_basis, lot.account_currency.code)
+
+    bond_lots = list(user_bonds.filter(active=True).select_related('bond', 'bond__price_currency').prefetch_related('bond__interest_rates'))
+    bond_values = value_bond_lots(bond_lots)
+
+    for bond_lot in bond_lots:
+        valuation_of(bond_lot).add_bond_lot(bond_lot, bond_values[bond_lot.id], bond_lot.cost_basis, bond_lot.bond.price_currency.code)
+
+    return valuations
+
+
+def value_wallet(wallet):
+    """
+    Value all active lots held in the wallet
+    """
+
+    return value_holdings(wallet.assets.all(), wallet.bonds.all())
+
+
+def value_account(account):
+    """
+    Value all active lots held on the account
+    """
+
+    return value_holdings(account.assets.all(), account.bonds.all())
+
+
+def valuation_cache():
+    """
+    The cache shared by the workers named by the VALUATION_CACHE setting, or None when not configured.
+
+    A cache local to the process would keep serving valuations after another worker or a
+    management command changed their inputs, so without a shared cache nothing is cached.
+    """
+
+    alias = getattr(settings, 'VALUATION_CACHE', None)
+    return caches[alias] if alias else None
+
+
+def _watermark_key(scope):
+    return f'valuation-watermark:{scope}'
+
+
+def _watermarks(shared, *scopes):
+    """
+    Return the current watermark of every scope, starting a new one for scopes without any
+    """
+
+    keys = [_watermark_key(scope) for scope in scopes]
+    watermarks = shared.get_many(keys)
+
+    for key in keys:
+        if key not in watermarks:
+            shared.add(key, uuid.uuid4().hex, None)
+            watermarks[key] = shared.get(key)
+
+    return [watermarks[key] for key in keys]
+
+
+def _bump_watermarks(scopes):
+
+    shared = valuation_cache()
+    if shared is not None:
+        shared.set_many({_watermark_key(scope): uuid.uuid4().hex for scope in scopes}, None)
+
+
+def _invalidate(scopes):
+    """
+    Move the watermarks of the scopes now and again once the current transaction commits, so a
+    valuation computed by another request before the commit is not served afterwards
+    """
+
+    scopes = list(scopes)
+    if not scopes:
+        return
+
+    _bump_watermarks(scopes)
+    transaction.on_commit(lambda: _bump_watermarks(scopes))
+
+
+def invalidate_valuations(wallet_ids=(), account_ids=()):
+    """
+    Drop the cached valuations of the wallets and accounts, e.g. after their lots changed
+    """
+
+    _invalidate([*(f'wallet:{wallet_id}' for wallet_id in wallet_ids), *(f'account:{account_id}' for account_id in account_ids)])
+
+
+def invalidate_price_valuations():
+    """
+    Drop every cached valuation, e.g. after a price changed
+    """
+
+    _invalidate([PRICES_WATERMARK])
+
+
+def cached_for(scopes, key, compute, timeout=VALUATION_CACHE_TIMEOUT):
+    """
+    Return the value computed by compute, cached under the key and the watermarks of the scopes
+    and of the prices, until one of them moves. Computed every time without a shared cache.
+    """
+
+    shared = valuation_cache()
+    if shared is None:
+        return compute()
+
+    watermarks = _watermarks(shared, *scopes, PRICES_WATERMARK)
+    key = ':'.join([key, *watermarks])
+
+    value = shared.get(key)
+    if value is None:
+        value = compute()
+        shared.set(key, value, timeout)
+
+    return value
+
+
+def _cached_valuations(kind, ids):
+    """
+    Return the valuations of the wallets or accounts keyed by their id, computing the ones not
+    cached with a single valuation of all their lots.
+
+    The cache key of every valuation holds the watermark of its scope, moved by changes of its
+    transactions, deposits, withdrawals and lots, the watermark of the prices, moved by any price
+    change, and the current day, on which the value of the bonds depends.
+    """
+
+    ids = list(dict.fromkeys(ids))
+
+    def value(missing):
+        lots = {f'{kind}__in': missing}
+        valuations = value_holdings_by(f'{kind}_id', UserAsset.objects.filter(**lots), UserTreasuryBonds.objects.filter(**lots))
+        return {id: valuations.get(id, Valuation()) for id in missing}
+
+    shared = valuation_cache()
+    if shared is None or not ids:
+        return value(ids)
+
+    scopes = [f'{kind}:{id}' for id in ids]
+    *watermarks, prices = _watermarks(shared, *scopes, PRICES_WATERMARK)
+    today = timezone.localdate()
+    keys = {id: f'valuation:{scope}:{today}:{watermark}:{prices}' for id, scope, watermark in zip(ids, scopes, watermarks)}
+
+    cached = shared.get_many(keys.values())
+    valuations = {id: cached[key] for id, key in keys.items() if key in cached}
+
+    missing = [id for id in ids if id not in valuations]
+    if missing:
+        computed = value(missing)
+        shared.set_many({keys[id]: valuation for id, valuation in computed.items()}, VALUATION_CACHE_TIMEOUT)
+        valuations.update(computed)
+
+    return valuations
+
+
+def wallet_valuations(wallet_ids):
+    """
+    Value all active lots held in each of the wallets, served from the cache while no input changed
+    """
+
+    return _cached_valuations('wallet', wallet_ids)
+
+
+def account_valuations(account_ids):
+    """
+    Value all active lots held on each of the accounts, served from the cache while no input changed
+    """
+
+    return _cached_valuations('account', account_ids)
+
+
+def wallet_valuation(wallet_id):
+    """
+    Value all active lots held in the wallet, served from the cache while no input changed
+    """
+
+    return wallet_valuations([wallet_id])[wallet_id]
+
+
+def account_valuation(account_id):
+    """
+    Value all active lots held on the account, served from the cache while no input changed
+    """
+
+    return account_valuations([account_id])[account_id]
+
+
+def fx_matrix():
+    """
+    Get the cross rates of the latest currency prices, served from the cache while no price changed
+    """
+
+    return cached_for([], 'fx-matrix', FXMatrix.load)
@@ -0,0 +1,71 @@
+from django.db.models import Min, Q
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from wallets.models import AssetPrice, CurrencyPrice, MarketAsset, MarketShare, MarketETF, TreasuryBonds, RetailBondsInterestRate, UserAsset, UserTreasuryBonds, MarketAssetTransaction, TreasuryBondsTransaction, Deposit, Withdrawal
+from wallets.services import invalidate_price_valuations, invalidate_valuations, invalidate_wallet_snapshots
+
+
+# Receivers dropping the wallet snapshots and the cached valuations and performance reports
+# outdated by a change, connected once the app is ready
+
+
+def invalidate_valuation(instance):
+    invalidate_valuations([instance.wallet_id], [instance.account_id])
+
+
+@receiver([post_save, post_delete], sender=MarketAssetTransaction)
+@receiver([post_save, post_delete], sender=TreasuryBondsTransaction)
+def transaction_changed(sender, instance, **kwargs):
+    invalidate_wallet_snapshots([instance.wallet_id], instance.transaction_date)
+    invalidate_valuation(instance)
+
+
+@receiver([post_save, post_delete], sender=Deposit)
+def deposit_changed(sender, instance, **kwargs):
+    invalidate_wallet_snapshots([instance.wallet_id], instance.deposited_at)
+    invalidate_valuation(instance)
+
+
+@receiver([post_save, post_delete], sender=Withdrawal)
+def withdrawal_changed(sender, instance, **kwargs):
+    invalidate_wallet_snapshots([instance.wallet_id], instance.withdrawn_at)
+    invalidate_valuation(instance)
+
+
+@receiver([post_save, post_delete], sender=AssetPrice)
+def asset_price_changed(sender, instance, **kwargs):
+    invalidate_wallet_snapshots(UserAsset.objects.filter(asset=instance.asset_id).values('wallet'), instance.date)
+    invalidate_price_valuations()
+
+
+@receiver([post_save, post_delete], sender=CurrencyPrice)
+def currency_price_changed(sender, instance, **kwargs):
+    invalidate_wallet_snapshots(
+        UserAsset.objects.filter(Q(asset__price_currency=instance.currency_id) | Q(account_currency=instance.currency_id)).values('wallet'),
+        instance.date
+    )
+    invalidate_price_valuations()
+
+
+@receiver([post_save, post_delete], sender=UserAsset)
+@receiver([post_save, post_delete], sender=UserTreasuryBonds)
+def lot_changed(sender, instance, **kwargs):
+    invalidate_valuation(instance)
+
+
+@receiver([post_save, post_delete], sender=MarketAsset)
+@receiver([post_save, post_delete], sender=MarketShare)
+@receiver([post_save, post_delete], sender=MarketETF)
+@receiver([post_save, post_delete], sender=TreasuryBonds)
+def instrument_changed(sender, instance, **kwargs):
+    invalidate_price_valuations()
+
+
+@receiver([post_save, post_delete], sender=RetailBondsInterestRate)
+def bond_interest_rate_changed(sender, instance, **kwargs):
+    lots = UserTreasuryBonds.objects.filter(bond=instance.bond_id)
+    first_issue_date = lots.aggregate(Min('issue_date'))['issue_date__min']
+    if first_issue_date is not None:
+        invalidate_wallet_snapshots(lots.values('wallet'), first_issue_date)
+    invalidate_price_valuations()
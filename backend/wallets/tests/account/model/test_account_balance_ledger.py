@@ -0,0 +1,131 @@
+import pytest
+
+import importlib
+
+from decimal import Decimal
+
+from django.apps import apps
+
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db.models import F
+from django.utils import timezone
+
+from wallets.models import AccountBalanceEntry, AccountCurrencyBalance, Deposit, MarketAssetTransaction, Withdrawal
+
+from wallets.tests.test_fixture import test_user, test_countries, test_currencies
+from wallets.tests.wallet.test_fixture import test_wallets
+from wallets.tests.account.test_fixture import test_accounts, test_account_types, test_account_institution_types, test_institution
+from wallets.tests.asset.test_fixture import test_asset_types, test_exchange_marketes, test_market_shares
+
+
+def days_ago(days):
+    return timezone.now() - timezone.timedelta(days=days)
+
+
+@pytest.fixture
+def account_with_history(test_user, test_wallets, test_accounts, test_currencies, test_market_shares):
+
+    Deposit.objects.create(wallet=test_wallets[0], account=test_accounts[0], user=test_user[0], amount=1000, currency=test_currencies[0], deposited_at=days_ago(10))
+    Withdrawal.objects.create(wallet=test_wallets[0], account=test_accounts[0], user=test_user[0], amount=100, currency=test_currencies[0], withdrawn_at=days_ago(5))
+
+    MarketAssetTransaction.objects.create(
+        user=test_user[0],
+        transaction_type='B',
+        account=test_accounts[0],
+        wallet=test_wallets[0],
+        asset=test_market_shares[0],
+        amount=5,
+        price=100,
+        account_currency=test_currencies[0],
+        currency_price=1,
+        commission=1,
+        transaction_date=days_ago(3)
+    )
+
+    return test_accounts[0]
+
+
+@pytest.mark.django_db
+def test_balance_movements_are_recorded_in_the_ledger(account_with_history, test_currencies):
+
+    entries = list(AccountBalanceEntry.objects.filter(balance__account=account_with_history))
+
+    assert [entry.kind for entry in entries] == ['D', 'W', 'B']
+    assert [entry.amount for entry in entries] == [Decimal('1000'), Decimal('-100'), Decimal('-501')]
+    assert [entry.balance_after for entry in entries] == [Decimal('1000'), Decimal('900'), Decimal('399')]
+    assert account_with_history.get_balance(test_currencies[0]) == Decimal('399')
+
+
+@pytest.mark.django_db
+def test_verify_balance_recomputes_the_ledger(account_with_history, test_currencies, django_assert_num_queries):
+
+    with django_assert_num_queries(1):
+        assert account_with_history.verify_balance(test_currencies[0])
+
+    # The balance and the last running balance drifted together, without a ledger entry
+    balance = account_with_history.balances.get(currency=test_currencies[0])
+    AccountCurrencyBalance.objects.filter(pk=balance.pk).update(balance=F('balance') + 1)
+    balance.entries.filter(pk=balance.entries.last().pk).update(balance_after=F('balance_after') + 1)
+
+    with pytest.raises(ValidationError):
+        account_with_history.verify_balance(test_currencies[0])
+
+    with pytest.raises(ValidationError):
+        AccountCurrencyBalance.objects.get(pk=balance.pk).verify()
+
+
+@pytest.mark.django_db
+def test_migration_replays_the_ledger_of_existing_balances(account_with_history, test_accounts, test_currencies):
+
+    migration = importlib.import_module('wallets.migrations.0050_backfill_account_balance_entries')
+
+    # Balances recorded before the ledger existed, one without any history behind it
+    AccountBalanceEntry.objects.all().delete()
+    balance = test_accounts[1].balances.get(currency=test_currencies[0])
+    balance.balance = 250
+    balance.save()
+
+    migration.replay_balance_ledgers(apps, None)
+
+    entries = AccountBalanceEntry.objects.filter(balance__account=account_with_history)
+    assert list(entries.values_list('kind', 'balance_after')) == [('D', Decimal('1000')), ('W', Decimal('900')), ('B', Decimal('399'))]
+    assert account_with_history.balance_as_of(test_currencies[0], days_ago(7)) == Decimal('1000')
+    assert account_with_history.verify_balance(test_currencies[0])
+
+    assert list(balance.entries.values_list('kind', 'amount', 'balance_after')) == [('A', Decimal('250'), Decimal('250'))]
+    assert test_accounts[1].verify_balance(test_currencies[0])
+    # Zero balances need no entry
+    assert not AccountBalanceEntry.objects.filter(balance__account=test_accounts[2]).exists()
+
+
+@pytest.mark.django_db
+def test_balance_as_of(account_with_history, test_currencies):
+
+    assert account_with_history.balance_as_of(test_currencies[0], days_ago(11)) == 0
+    assert account_with_history.balance_as_of(test_currencies[0], days_ago(7)) == Decimal('1000')
+    assert account_with_history.balance_as_of(test_currencies[0], days_ago(4).date()) == Decimal('900')
+    assert account_with_history.balance_as_of(test_currencies[0], timezone.now()) == Decimal('399')
+
+
+@pytest.mark.django_db
+def test_removed_deposit_is_reversed_at_its_date(account_with_history, test_user, test_wallets, test_currencies):
+
+    deposit = Deposit.objects.create(wallet=test_wallets[0], account=account_with_history, user=test_user[0], amount=50, currency=test_currencies[0], deposited_at=days_ago(8))
+    deposit.delete()
+
+    assert account_with_history.balance_as_of(test_currencies[0], days_ago(7)) == Decimal('1000')
+    assert account_with_history.verify_balance(test_currencies[0])
+
+
+@pytest.mark.django_db
+def test_rebuild_balance_ledger_command(account_with_history, test_currencies):
+
+    AccountBalanceEntry.objects.all().delete()
+
+    call_command('rebuild_balance_ledger', account=[account_with_history.id])
+
+    entries = list(AccountBalanceEntry.objects.filter(balance__account=account_with_history))
+
+    assert [entry.balance_after for entry in entries] == [Decimal('1000'), Decimal('900'), Decimal('399')]
+    assert account_with_history.verify_balance(test_currencies[0])
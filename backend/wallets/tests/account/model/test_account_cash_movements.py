@@ -0,0 +1,95 @@
+import pytest
+
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import connection, connections
+from django.utils import timezone
+
+from wallets.models import AccountBalanceEntry, AccountCurrencyBalance, Deposit, Withdrawal
+from wallets.services import move_cash
+
+from wallets.tests.test_fixture import test_user, test_countries, test_currencies
+from wallets.tests.wallet.test_fixture import test_wallets
+from wallets.tests.account.test_fixture import test_accounts, test_account_types, test_account_institution_types, test_institution
+
+
+@pytest.mark.django_db
+def test_move_cash_updates_balance_and_ledger(test_accounts, test_currencies):
+
+    move_cash(test_accounts[0], test_currencies[0], Decimal('100'), 'D', create=True)
+    entry = move_cash(test_accounts[0], test_currencies[0], Decimal('-30'), 'W', allow_negative=False)
+
+    assert test_accounts[0].get_balance(test_currencies[0]) == Decimal('70')
+    assert entry.balance_after == Decimal('70')
+    assert test_accounts[0].verify_balance(test_currencies[0])
+
+
+@pytest.mark.django_db
+def test_move_cash_rejects_overdraft(test_accounts, test_currencies):
+
+    move_cash(test_accounts[0], test_currencies[0], Decimal('100'), 'D', create=True)
+
+    with pytest.raises(ValidationError):
+        move_cash(test_accounts[0], test_currencies[0], Decimal('-101'), 'W', allow_negative=False)
+
+    assert test_accounts[0].get_balance(test_currencies[0]) == Decimal('100')
+    assert AccountBalanceEntry.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_move_cash_requires_existing_balance(test_accounts, test_currencies):
+
+    test_accounts[0].balances.filter(currency=test_currencies[0]).delete()
+
+    with pytest.raises(AccountCurrencyBalance.DoesNotExist):
+        move_cash(test_accounts[0], test_currencies[0], Decimal('100'), 'S')
+
+
+@pytest.mark.django_db
+def test_failed_cash_movement_rolls_back_the_withdrawal(test_user, test_wallets, test_accounts, test_currencies):
+
+    Deposit.objects.create(wallet=test_wallets[0], account=test_accounts[0], user=test_user[0], amount=100, currency=test_currencies[0], deposited_at=timezone.now())
+
+    balance = test_accounts[0].balances.get(currency=test_currencies[0])
+    AccountCurrencyBalance.objects.filter(pk=balance.pk).update(balance=10)
+
+    withdrawal = Withdrawal(wallet=test_wallets[0], account=test_accounts[0], user=test_user[0], amount=50, currency=test_currencies[0], withdrawn_at=timezone.now())
+    withdrawal.clean = lambda: None
+
+    with pytest.raises(ValidationError):
+        withdrawal.save()
+
+    assert not Withdrawal.objects.exists()
+    assert test_accounts[0].get_balance(test_currencies[0]) == Decimal('10')
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_cash_movements_are_not_lost(test_user, test_wallets, test_accounts, test_currencies):
+
+    if connection.vendor != 'postgresql':
+        pytest.skip('Row locking is only exercised on PostgreSQL.')
+
+    workers = 16
+    movements_per_worker = 25
+
+    move_cash(test_accounts[0], test_currencies[0], Decimal('1000'), 'D', create=True)
+
+    def hammer(worker):
+        try:
+            for movement in range(movements_per_worker):
+                amount = Decimal('10') if (worker + movement) % 2 else Decimal('-5')
+                move_cash(test_accounts[0], test_currencies[0], amount, 'D' if amount > 0 else 'W', allow_negative=False)
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(hammer, range(workers)))
+
+    credits = sum(1 for worker in range(workers) for movement in range(movements_per_worker) if (worker + movement) % 2)
+    debits = workers * movements_per_worker - credits
+
+    assert test_accounts[0].get_balance(test_currencies[0]) == Decimal('1000') + 10 * credits - 5 * debits
+    assert AccountBalanceEntry.objects.count() == workers * movements_per_worker + 1
+    assert test_accounts[0].verify_balance(test_currencies[0])
@@ -0,0 +1,85 @@
+import pytest
+
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.utils import timezone
+
+from wallets.models import AssetPrice, Currency, CurrencyPrice, MarketAsset
+
+from wallets.tests.test_fixture import test_countries, test_currencies
+from wallets.tests.asset.test_fixture import test_asset_types, test_exchange_marketes, test_market_shares
+
+
+@pytest.mark.django_db
+def test_asset_price_create_updates_latest_price(test_market_shares):
+
+    today = timezone.now().date()
+
+    AssetPrice.objects.create(asset=test_market_shares[0], price=100, date=today - timezone.timedelta(days=2))
+    AssetPrice.objects.create(asset=test_market_shares[0], price=120, date=today)
+
+    asset = MarketAsset.objects.get(id=test_market_shares[0].id)
+
+    assert asset.last_price == Decimal('120')
+    assert asset.last_price_date == today
+
+
+@pytest.mark.django_db
+def test_asset_price_create_older_does_not_override_latest_price(test_market_shares):
+
+    today = timezone.now().date()
+
+    AssetPrice.objects.create(asset=test_market_shares[0], price=120, date=today)
+    AssetPrice.objects.create(asset=test_market_shares[0], price=100, date=today - timezone.timedelta(days=2))
+
+    asset = MarketAsset.objects.get(id=test_market_shares[0].id)
+
+    assert asset.last_price == Decimal('120')
+    assert asset.last_price_date == today
+
+
+@pytest.mark.django_db
+def test_asset_price_delete_restores_previous_latest_price(test_market_shares):
+
+    today = timezone.now().date()
+
+    AssetPrice.objects.create(asset=test_market_shares[0], price=100, date=today - timezone.timedelta(days=2))
+    latest = AssetPrice.objects.create(asset=test_market_shares[0], price=120, date=today)
+
+    latest.delete()
+
+    asset = MarketAsset.objects.get(id=test_market_shares[0].id)
+
+    assert asset.last_price == Decimal('100')
+    assert asset.last_price_date == today - timezone.timedelta(days=2)
+
+
+@pytest.mark.django_db
+def test_currency_price_create_updates_latest_price(test_currencies):
+
+    CurrencyPrice.objects.create(currency=test_currencies[1], price=4)
+    CurrencyPrice.objects.create(currency=test_currencies[1], price=Decimal('4.2'))
+
+    currency = Currency.objects.get(id=test_currencies[1].id)
+
+    assert currency.last_price == Decimal('4.2')
+    assert currency.last_price_date is not None
+
+
+@pytest.mark.django_db
+def test_refresh_latest_prices_command_backfills(test_market_shares, test_currencies):
+
+    today = timezone.now().date()
+
+    AssetPrice.objects.create(asset=test_market_shares[0], price=100, date=today)
+    CurrencyPrice.objects.create(currency=test_currencies[1], price=4)
+
+    MarketAsset.objects.update(last_price=None, last_price_date=None)
+    Currency.objects.update(last_price=None, last_price_date=None)
+
+    call_command('refresh_latest_prices')
+
+    assert MarketAsset.objects.get(id=test_market_shares[0].id).last_price == Decimal('100')
+    assert MarketAsset.objects.get(id=test_market_shares[1].id).last_price is None
+    assert Currency.objects.get(id=test_currencies[1].id).last_price == Decimal('4')
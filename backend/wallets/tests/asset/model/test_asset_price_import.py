@@ -0,0 +1,100 @@
+import pytest
+
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.utils import timezone
+
+from wallets.models import AssetPrice, MarketAsset, UserAsset, WalletDailySnapshot
+from wallets.services import import_asset_prices
+
+from wallets.tests.test_fixture import test_user, test_countries, test_currencies
+from wallets.tests.wallet.test_fixture import test_wallets
+from wallets.tests.account.test_fixture import test_accounts, test_account_types, test_account_institution_types, test_institution
+from wallets.tests.asset.test_fixture import test_asset_types, test_exchange_marketes, test_market_shares
+
+
+def write_price_file(path, rows):
+
+    lines = ['asset,date,price,source'] + [','.join(str(value) for value in row) for row in rows]
+    path.write_text('\n'.join(lines) + '\n')
+
+    return path
+
+
+@pytest.mark.django_db
+def test_import_prices_command(tmp_path, test_market_shares):
+
+    today = timezone.now().date()
+    price_file = write_price_file(tmp_path / 'prices.csv', [
+        ('NYSE:AAPL', today - timezone.timedelta(days=2), '100.5', 'stooq'),
+        ('NYSE:AAPL', today - timezone.timedelta(days=1), '101.5', 'stooq'),
+        ('NYSE:MSFT', today, '200', ''),
+    ])
+
+    call_command('import_prices', str(price_file), '--chunk-size', '2', '--source', 'file')
+
+    assert AssetPrice.objects.count() == 3
+    assert AssetPrice.objects.get(asset=test_market_shares[1]).source == 'file'
+    assert MarketAsset.objects.get(id=test_market_shares[0].id).last_price == Decimal('101.5')
+    assert MarketAsset.objects.get(id=test_market_shares[1].id).last_price == Decimal('200')
+
+
+@pytest.mark.django_db
+def test_import_prices_is_idempotent(test_market_shares):
+
+    today = timezone.now().date()
+    rows = [{'exchange': 'NYSE', 'code': 'AAPL', 'date': today - timezone.timedelta(days=day), 'price': day} for day in range(10)]
+
+    first = import_asset_prices(rows[:4])
+    second = import_asset_prices(rows, chunk_size=3)
+
+    assert first.rows_inserted == 4
+    assert second.rows_read == 10
+    assert second.rows_inserted == 6
+    assert second.rows_skipped == 4
+    assert AssetPrice.objects.count() == 10
+
+
+@pytest.mark.django_db
+def test_import_prices_rejects_invalid_rows(test_market_shares):
+
+    today = timezone.now().date()
+    rows = [
+        {'asset': 'NYSE:AAPL', 'date': today, 'price': '10'},
+        {'asset': 'NYSE:UNKNOWN', 'date': today, 'price': '10'},
+        {'asset': 'NYSE:AAPL', 'date': today + timezone.timedelta(days=1), 'price': '10'},
+        {'asset': 'NYSE:MSFT', 'date': today, 'price': '-1'},
+        {'asset': 'NYSE:MSFT', 'date': 'yesterday', 'price': '1'},
+        {'asset': 'NYSE:MSFT', 'date': today, 'price': 'abc'},
+        {'asset': 'NYSE:AAPL', 'date': today, 'price': '11'},
+    ]
+
+    result = import_asset_prices(rows)
+
+    assert result.rows_inserted == 1
+    assert result.rows_skipped == 1
+    assert [row_number for row_number, _ in result.errors] == [2, 3, 4, 5, 6]
+    assert result.errors[0][1] == 'Asset NYSE:UNKNOWN does not exist.'
+    assert result.errors[1][1] == 'Date cannot be in the future.'
+    assert AssetPrice.objects.get().price == Decimal('10')
+
+
+@pytest.mark.django_db
+def test_import_prices_drops_snapshots_from_the_earliest_imported_date(test_user, test_wallets, test_accounts, test_currencies, test_market_shares):
+
+    today = timezone.localdate()
+    UserAsset.objects.create(
+        user=test_user[0], wallet=test_wallets[0], account=test_accounts[0], asset=test_market_shares[0],
+        amount=1, price=100, account_currency=test_currencies[0], currency_price=1
+    )
+    WalletDailySnapshot.objects.bulk_create([
+        WalletDailySnapshot(wallet=test_wallets[0], date=today - timezone.timedelta(days=day), value=100) for day in range(10)
+    ])
+
+    import_asset_prices([
+        {'asset': 'NYSE:AAPL', 'date': today - timezone.timedelta(days=3), 'price': 110},
+        {'asset': 'NYSE:AAPL', 'date': today - timezone.timedelta(days=1), 'price': 120},
+    ])
+
+    assert max(test_wallets[0].snapshots.values_list('date', flat=True)) == today - timezone.timedelta(days=4)
@@ -0,0 +1,119 @@
+import pytest
+
+import datetime as dt
+import numpy as np
+
+from decimal import Decimal
+
+from wallets.models import RetailBondsInterestRate, UserTreasuryBonds
+from wallets.services import BondTerms, accrue_unit_values, value_bond_lots
+from wallets.services.bonds import add_months
+
+from wallets.tests.test_fixture import test_user, test_countries, test_currencies
+from wallets.tests.wallet.test_fixture import test_wallets
+from wallets.tests.account.test_fixture import test_accounts, test_account_types, test_account_institution_types, test_institution
+from wallets.tests.asset.test_fixture import test_asset_types, test_treasury_bonds
+
+
+ISSUE_DATE = dt.date(2023, 3, 15)
+
+
+def unit_value(terms, date, redeemed=False, issue_date=ISSUE_DATE):
+    return round(float(accrue_unit_values([terms], [issue_date], [date], redeemed)[0, 0]), 2)
+
+
+def test_add_months_clips_to_the_end_of_the_month():
+
+    dates = np.array(['2024-01-31', '2023-03-15'], dtype='datetime64[D]')
+
+    assert add_months(dates, 1).tolist() == [dt.date(2024, 2, 29), dt.date(2023, 4, 15)]
+    assert add_months(dates, 12).tolist() == [dt.date(2025, 1, 31), dt.date(2024, 3, 15)]
+
+
+def test_capitalized_bond_accrues_over_every_period():
+
+    terms = BondTerms(100, 12, [6.8, 5, 5, 5], capitalized=True)
+
+    assert unit_value(terms, ISSUE_DATE) == 100
+    assert unit_value(terms, dt.date(2023, 9, 14)) == 103.4
+    assert unit_value(terms, dt.date(2024, 3, 15)) == 106.8
+    # 184 of 365 days of the second period, on the capitalized value
+    assert unit_value(terms, dt.date(2024, 9, 15)) == 106.8 + 2.69
+    assert unit_value(terms, dt.date(2027, 3, 15)) == 123.64
+    assert unit_value(terms, dt.date(2030, 1, 1)) == 123.64
+
+
+def test_paid_out_interest_accrues_on_the_nominal_value():
+
+    terms = BondTerms(100, 12, [7, 6, 6, 6], capitalized=False)
+
+    assert unit_value(terms, dt.date(2024, 3, 15)) == 100
+    assert unit_value(terms, dt.date(2024, 9, 15)) == 103.02
+    assert unit_value(terms, dt.date(2027, 3, 15)) == 106
+
+
+def test_premature_withdrawal_fee_is_taken_from_accrued_interest():
+
+    terms = BondTerms(100, 12, [6.8, 5], capitalized=True, premature_withdrawal_fee=2)
+
+    assert unit_value(terms, dt.date(2023, 3, 25), redeemed=True) == 100
+    assert unit_value(terms, dt.date(2024, 3, 15), redeemed=True) == 104.8
+    assert unit_value(terms, dt.date(2025, 3, 15), redeemed=True) == unit_value(terms, dt.date(2025, 3, 15))
+
+
+def test_lots_and_dates_are_valued_in_one_pass():
+
+    capitalized = BondTerms(100, 12, [6.8] * 10)
+    short = BondTerms(100, 3, [3])
+
+    issue_dates = [dt.date(2023, month, 1) for month in range(1, 13)]
+    dates = [dt.date(2024, 1, 1) + dt.timedelta(days=day) for day in range(0, 730, 30)]
+    terms = [capitalized if month % 2 else short for month in range(1, 13)]
+
+    values = accrue_unit_values(terms, issue_dates, dates)
+
+    assert values.shape == (12, len(dates))
+    for lot in range(12):
+        for index, date in enumerate(dates):
+            assert round(values[lot, index], 2) == unit_value(terms[lot], date, issue_date=issue_dates[lot])
+
+
+@pytest.mark.django_db
+def test_indexed_periods_use_the_announced_rates(test_treasury_bonds):
+
+    bond = test_treasury_bonds[0]
+    bond.is_intrest_rate_fixed = False
+    bond.initial_interest_rate = Decimal('7')
+    bond.duration = 4
+    bond.save()
+
+    RetailBondsInterestRate.objects.create(bond=bond, period=2, rate=Decimal('12.5'))
+
+    terms = BondTerms.from_bond(bond)
+
+    assert terms.period_months == 12
+    assert terms.rates == [7, 12.5, 12.5, 12.5]
+
+
+@pytest.mark.django_db
+def test_bond_lots_are_valued_with_their_rate_schedules(test_user, test_wallets, test_accounts, test_treasury_bonds, django_assert_num_queries):
+
+    bond = test_treasury_bonds[0]
+    bond.is_intrest_rate_fixed = False
+    bond.initial_interest_rate = Decimal('6.8')
+    bond.save()
+    RetailBondsInterestRate.objects.create(bond=bond, period=2, rate=Decimal('5'))
+
+    for month in range(1, 7):
+        UserTreasuryBonds.objects.create(
+            user=test_user[0], wallet=test_wallets[0], account=test_accounts[0], bond=bond, amount=10,
+            issue_date=dt.date(2023, month, 15), maturity_date=dt.date(2033, month, 15)
+        )
+
+    with django_assert_num_queries(2):
+        lots = list(UserTreasuryBonds.objects.select_related('bond').prefetch_related('bond__interest_rates'))
+        values = value_bond_lots(lots, dt.date(2024, 3, 15))
+
+    assert values[lots[2].id] == Decimal('1068.00')
+    assert values[lots[2].id] == lots[2].value_on(dt.date(2024, 3, 15))
+    assert lots[2].redemption_value <= lots[2].current_value
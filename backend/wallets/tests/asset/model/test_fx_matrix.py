@@ -0,0 +1,86 @@
+import pytest
+
+from decimal import Decimal
+
+from django.utils import timezone
+
+from wallets.models import CurrencyPrice, Deposit, Withdrawal
+from wallets.services import FXMatrix, MissingExchangeRate, fx_matrix
+
+from wallets.tests.test_fixture import test_user, test_countries, test_currencies
+from wallets.tests.wallet.test_fixture import test_wallets
+from wallets.tests.account.test_fixture import test_accounts, test_account_types, test_account_institution_types, test_institution
+
+
+def test_cross_rates_are_triangulated_through_the_base_currency():
+
+    fx = FXMatrix([('PLN', None), ('USD', Decimal('4')), ('EUR', Decimal('4.5')), ('GBP', None)], base='PLN')
+
+    assert fx.rate('USD', 'PLN') == Decimal('4')
+    assert fx.rate('PLN', 'EUR') == Decimal(1) / Decimal('4.5')
+    assert fx.rate('EUR', 'USD') == Decimal('1.125')
+    assert fx.rate('PLN', 'PLN') == 1
+
+    with pytest.raises(MissingExchangeRate):
+        fx.rate('GBP', 'PLN')
+
+    with pytest.raises(MissingExchangeRate):
+        fx.rate('JPY', 'PLN')
+
+
+def test_amounts_are_converted_in_bulk():
+
+    fx = FXMatrix([('USD', Decimal('4')), ('EUR', Decimal('4.5')), ('GBP', None)], base='PLN')
+
+    converted = fx.convert([100, 200, 450, 0], ['PLN', 'USD', 'EUR', 'GBP'], 'EUR')
+
+    assert [round(value, 2) for value in converted] == [22.22, 177.78, 450, 0]
+    assert fx.total({'PLN': Decimal('100'), 'USD': Decimal('200'), 'EUR': Decimal('450')}, 'PLN') == Decimal('2925.00')
+
+    with pytest.raises(MissingExchangeRate):
+        fx.convert([1], ['GBP'], 'EUR')
+
+
+def test_unpriced_currency_converts_to_itself():
+
+    fx = FXMatrix([('PLN', 1), ('USD', None)], base='PLN')
+
+    assert fx.rate('USD', 'USD') == 1
+    assert fx.total({'USD': Decimal('10')}, 'USD') == Decimal('10.00')
+    assert list(fx.convert([10], ['USD'], 'USD')) == [10]
+
+    with pytest.raises(MissingExchangeRate):
+        fx.total({'USD': Decimal('10'), 'PLN': Decimal('1')}, 'USD')
+
+
+def test_totals_are_computed_in_decimal():
+
+    fx = FXMatrix([('USD', Decimal('2'))], base='PLN')
+
+    # In floats both amounts are slightly below 2.675 and would be rounded down
+    assert fx.total({'PLN': Decimal('2.675')}, 'PLN') == Decimal('2.68')
+    assert fx.total({'USD': Decimal('1.3375')}, 'PLN') == Decimal('2.68')
+
+
+@pytest.mark.django_db
+def test_matrix_follows_the_latest_currency_prices(test_currencies):
+
+    CurrencyPrice.objects.create(currency=test_currencies[1], price=Decimal('4'))
+    assert fx_matrix().rate('USD', 'PLN') == Decimal('4')
+
+    CurrencyPrice.objects.create(currency=test_currencies[1], price=Decimal('3.9'))
+    assert fx_matrix().rate('USD', 'PLN') == Decimal('3.9')
+
+
+@pytest.mark.django_db
+def test_wallet_cash_balance_converts_every_currency(test_user, test_wallets, test_accounts, test_currencies):
+
+    test_accounts[0].currencies.add(test_currencies[1])
+    CurrencyPrice.objects.create(currency=test_currencies[1], price=Decimal('4'))
+
+    for currency, amount in [(test_currencies[0], 1000), (test_currencies[1], 100)]:
+        Deposit.objects.create(wallet=test_wallets[0], account=test_accounts[0], user=test_user[0], amount=amount, currency=currency, deposited_at=timezone.now())
+    Withdrawal.objects.create(wallet=test_wallets[0], account=test_accounts[0], user=test_user[0], amount=50, currency=test_currencies[1], withdrawn_at=timezone.now())
+
+    assert test_wallets[0].cash_balance == Decimal('1200.00')
+    assert test_wallets[0].cash_balance_in('USD') == Decimal('300.00')
@@ -0,0 +1,100 @@
+import pytest
+
+import datetime as dt
+
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.utils import timezone
+
+from wallets.models import Currency, CurrencyPrice
+from wallets.services import FXHistory, MissingExchangeRate, PriceHistory, import_currency_prices
+
+from wallets.tests.test_fixture import test_countries, test_currencies
+
+
+def day(number):
+    return dt.date(2024, 1, number)
+
+
+def test_prices_on_answers_many_pairs_at_once():
+
+    history = PriceHistory([
+        ('USD', day(2), Decimal('4.0')),
+        ('EUR', day(3), Decimal('4.3')),
+        ('USD', day(5), Decimal('3.9')),
+        ('USD', day(9), Decimal('4.1')),
+    ])
+
+    keys = ['USD', 'USD', 'USD', 'USD', 'EUR', 'EUR', 'GBP']
+    dates = [day(1), day(2), day(8), day(20), day(2), day(3), day(3)]
+
+    assert history.prices_on(keys, dates) == [None, Decimal('4.0'), Decimal('3.9'), Decimal('4.1'), None, Decimal('4.3'), None]
+    assert history.prices_on(keys, dates) == [history.price_on(key, date) for key, date in zip(keys, dates)]
+
+
+def test_fx_history_triangulates_rates_of_the_day():
+
+    fx = FXHistory(PriceHistory([
+        ('USD', day(2), Decimal('4')),
+        ('EUR', day(2), Decimal('4.4')),
+        ('USD', day(5), Decimal('4.4')),
+    ]), base='PLN')
+
+    assert fx.rate_on('USD', 'PLN', day(3)) == Decimal('4')
+    assert fx.rate_on('EUR', 'USD', day(5)) == Decimal('1')
+    assert fx.rate_on('USD', 'EUR', day(1)) is None
+
+    rates = fx.rates_on(['USD', 'USD', 'EUR', 'PLN'], ['PLN', 'EUR', 'USD', 'PLN'], [day(2), day(4), day(6), day(1)])
+    assert [round(rate, 4) for rate in rates] == [4, 0.9091, 1, 1]
+
+    converted = fx.convert([100, 100, 0], ['USD', 'EUR', 'USD'], 'PLN', [day(3), day(6), day(1)])
+    assert [round(value, 2) for value in converted] == [400, 440, 0]
+
+    with pytest.raises(MissingExchangeRate):
+        fx.convert([100], ['USD'], 'PLN', [day(1)])
+
+
+@pytest.mark.django_db
+def test_currency_prices_can_be_recorded_for_past_dates(test_currencies):
+
+    CurrencyPrice.objects.create(currency=test_currencies[1], price=Decimal('3.9'))
+    CurrencyPrice.objects.create(currency=test_currencies[1], price=Decimal('4.2'), date=timezone.now() - timezone.timedelta(days=30))
+
+    # An older rate does not replace the latest one
+    assert Currency.objects.get(pk=test_currencies[1].pk).last_price == Decimal('3.9')
+
+    fx = FXHistory.load(['USD'])
+    assert fx.rate_on('USD', 'PLN', timezone.localdate() - timezone.timedelta(days=10)) == Decimal('4.2')
+    assert fx.rate_on('USD', 'PLN', timezone.localdate()) == Decimal('3.9')
+
+
+@pytest.mark.django_db
+def test_import_currency_prices_backfills_history(test_currencies):
+
+    today = timezone.localdate()
+    rows = [{'currency': 'USD', 'date': (today - timezone.timedelta(days=days)).isoformat(), 'price': 4 + days / 100} for days in range(10)]
+
+    first = import_currency_prices(rows[:4])
+    second = import_currency_prices(rows + [{'currency': 'XYZ', 'date': today, 'price': 1}, {'currency': 'EUR', 'date': today, 'price': -1}], chunk_size=3)
+
+    assert first.rows_inserted == 4
+    assert second.rows_inserted == 6
+    assert second.rows_skipped == 4
+    assert [message for _, message in second.errors] == ['Currency XYZ does not exist.', 'Invalid price -1.']
+
+    assert CurrencyPrice.objects.filter(currency=test_currencies[1]).count() == 10
+    assert Currency.objects.get(pk=test_currencies[1].pk).last_price == Decimal('4')
+    assert FXHistory.load().rate_on('USD', 'PLN', today - timezone.timedelta(days=5)) == Decimal('4.05')
+
+
+@pytest.mark.django_db
+def test_import_prices_command_loads_currency_prices(tmp_path, test_currencies):
+
+    price_file = tmp_path / 'rates.csv'
+    price_file.write_text('currency,date,price\nUSD,2024-01-02,3.95\nEUR,2024-01-02,4.35\n')
+
+    call_command('import_prices', str(price_file), '--currencies', '--source', 'nbp')
+
+    assert CurrencyPrice.objects.filter(source='nbp').count() == 2
+    assert FXHistory.load().rate_on('EUR', 'USD', day(2)) == Decimal('4.35') / Decimal('3.95')
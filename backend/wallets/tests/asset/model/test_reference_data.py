@@ -0,0 +1,104 @@
+import pytest
+
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import override_settings
+
+from rest_framework.exceptions import ValidationError
+
+from wallets.models import AssetType, Country, Currency, CurrencyPrice, TreasuryBonds
+from wallets.reference import REFERENCE_CACHES, get_reference, invalidate_reference_data, reference_objects
+from wallets.serializers.fields import ReferenceSlugRelatedField
+
+from wallets.tests.test_fixture import test_countries, test_currencies
+from wallets.tests.asset.test_fixture import test_asset_types
+
+
+@pytest.mark.django_db
+def test_reference_lookups_are_loaded_once(test_currencies, test_countries, test_asset_types, django_assert_num_queries):
+
+    invalidate_reference_data()
+
+    with django_assert_num_queries(3):
+        for _ in range(3):
+            assert get_reference(Currency, code='PLN') == test_currencies[0]
+            assert get_reference(Currency, pk=test_currencies[1].pk).code == 'USD'
+            assert get_reference(Country, name='Poland') == test_countries[0]
+            assert len(reference_objects(AssetType)) == len(test_asset_types)
+
+
+@pytest.mark.django_db
+def test_reference_data_is_dropped_on_save_and_delete(test_currencies):
+
+    assert get_reference(Currency, code='PLN').name == 'Polish Zloty'
+
+    test_currencies[0].name = 'Zloty'
+    test_currencies[0].save()
+    assert get_reference(Currency, code='PLN').name == 'Zloty'
+
+    test_currencies[4].delete()
+    with pytest.raises(Currency.DoesNotExist):
+        get_reference(Currency, code='CHF')
+
+
+@pytest.mark.django_db
+def test_reference_lookup_falls_back_to_the_database(test_currencies):
+
+    get_reference(Currency, code='PLN')
+
+    Currency.objects.bulk_create([Currency(name='Japanese Yen', code='JPY')])
+
+    assert get_reference(Currency, code='JPY').name == 'Japanese Yen'
+
+
+@pytest.mark.django_db
+def test_reference_currencies_read_prices_from_the_database(test_currencies):
+
+    get_reference(Currency, code='PLN')
+    CurrencyPrice.objects.create(currency=test_currencies[0], price=Decimal('1.5'))
+
+    assert get_reference(Currency, code='PLN').last_price == Decimal('1.5')
+
+
+@pytest.mark.django_db
+@override_settings(REFERENCE_DATA_CACHE='default')
+def test_reference_data_changes_are_shared_through_the_cache(test_currencies, django_assert_num_queries):
+
+    cache.clear()
+    get_reference(Currency, code='PLN')
+
+    with django_assert_num_queries(0):
+        get_reference(Currency, code='USD')
+
+    # Another worker saved a currency
+    Currency.objects.filter(code='USD').update(name='Dollar')
+    cache.set(REFERENCE_CACHES[Currency].version_key, 'other-worker')
+
+    assert get_reference(Currency, code='USD').name == 'Dollar'
+
+
+@pytest.mark.django_db
+def test_reference_slug_field_resolves_codes_without_queries(test_currencies, django_assert_num_queries):
+
+    field = ReferenceSlugRelatedField(slug_field='code', queryset=Currency.objects.all())
+    get_reference(Currency, code='PLN')
+
+    with django_assert_num_queries(0):
+        assert field.to_internal_value('EUR') == test_currencies[2]
+
+    with pytest.raises(ValidationError):
+        field.to_internal_value('XXX')
+
+
+@pytest.mark.django_db
+def test_treasury_bonds_save_uses_reference_data(test_currencies, test_countries, test_asset_types):
+
+    bond = TreasuryBonds.objects.create(
+        name='Polish Treasury Bonds', code='PL-TB', price_currency=test_currencies[1], issuer_country=test_countries[0],
+        duration=4, duration_unit='Y', initial_interest_rate=6, premature_withdrawal_fee=1, nominal_value=120
+    )
+
+    assert bond.price_currency == test_currencies[0]
+    assert bond.nominal_value == Decimal('100.00')
+    assert bond.asset_type == test_asset_types[5]
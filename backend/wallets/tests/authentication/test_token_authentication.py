@@ -0,0 +1,94 @@
+import pytest
+
+from django.utils import timezone
+
+from rest_framework.authtoken.models import Token
+
+from wallets.authentication import token_cache
+
+from wallets.tests.test_fixture import test_user, api_client, api_url
+
+
+def obtain_token(client, username, password):
+
+    response = client.post(api_url('auth/token/'), {'username': username, 'password': password})
+
+    assert response.status_code == 200
+    return response.data['token']
+
+
+@pytest.mark.django_db
+def test_token_is_issued_once_for_valid_credentials(api_client, test_user):
+
+    token = obtain_token(api_client, 'john', 'johnpassword')
+
+    assert Token.objects.get(user=test_user[0]).key == token
+    assert obtain_token(api_client, 'john', 'johnpassword') == token
+
+    response = api_client.post(api_url('auth/token/'), {'username': 'john', 'password': 'wrong'})
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_token_requests_are_authenticated_from_the_cache(api_client, test_user, django_assert_num_queries):
+
+    token_cache.clear()
+    token = obtain_token(api_client, 'john', 'johnpassword')
+    api_client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+
+    response = api_client.get(api_url(f'users/{test_user[0].id}/'))
+    assert response.status_code == 200
+    assert response.wsgi_request.user == test_user[0]
+
+    # The token is answered from memory, only the view itself queries the database
+    with django_assert_num_queries(3):
+        assert api_client.get(api_url(f'users/{test_user[0].id}/')).status_code == 200
+
+    api_client.credentials()
+    api_client.force_authenticate(test_user[0])
+    with django_assert_num_queries(3):
+        assert api_client.get(api_url(f'users/{test_user[0].id}/')).status_code == 200
+
+
+@pytest.mark.django_db
+def test_revoked_token_is_rejected(api_client, test_user):
+
+    token = obtain_token(api_client, 'john', 'johnpassword')
+    api_client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+
+    assert api_client.get(api_url(f'users/{test_user[0].id}/')).status_code == 200
+    assert api_client.delete(api_url('auth/token/')).status_code == 204
+
+    response = api_client.get(api_url(f'users/{test_user[0].id}/'))
+    assert response.status_code == 401
+    assert response.data['detail'] == 'Invalid token.'
+
+
+@pytest.mark.django_db
+def test_inactive_user_token_is_rejected(api_client, test_user):
+
+    token = obtain_token(api_client, 'john', 'johnpassword')
+    api_client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+    assert api_client.get(api_url(f'users/{test_user[0].id}/')).status_code == 200
+
+    test_user[0].is_active = False
+    test_user[0].save()
+
+    assert api_client.get(api_url(f'users/{test_user[0].id}/')).status_code == 401
+
+
+@pytest.mark.django_db
+def test_expired_token_is_rejected_and_reissued(api_client, test_user, settings):
+
+    settings.AUTH_TOKEN_LIFETIME = 60
+    token = obtain_token(api_client, 'john', 'johnpassword')
+    Token.objects.filter(key=token).update(created=timezone.now() - timezone.timedelta(minutes=2))
+    token_cache.clear()
+
+    api_client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+    response = api_client.get(api_url(f'users/{test_user[0].id}/'))
+    assert response.status_code == 401
+    assert response.data['detail'] == 'Token has expired.'
+
+    api_client.credentials()
+    assert obtain_token(api_client, 'john', 'johnpassword') != token
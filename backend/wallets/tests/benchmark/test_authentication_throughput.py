@@ -0,0 +1,93 @@
+import base64
+import os
+import time
+
+from unittest import mock
+
+import pytest
+
+from django.contrib.auth.models import User
+from django.test import override_settings
+
+from wallets.authentication import token_cache
+
+from wallets.tests.test_fixture import test_user, api_client, api_url
+
+
+# BENCHMARK_AUTH_REQUESTS sets the number of requests made with every authentication scheme;
+# BENCHMARK_AUTH_TIMING=1 also compares their wall-clock throughput, which is too noisy on a
+# loaded machine for the regular test run.
+
+REQUESTS = int(os.environ.get('BENCHMARK_AUTH_REQUESTS', 10))
+
+TIMING = os.environ.get('BENCHMARK_AUTH_TIMING') == '1'
+
+# The production hasher, the test settings may use a cheaper one
+PRODUCTION_HASHERS = ['django.contrib.auth.hashers.PBKDF2PasswordHasher']
+
+
+def requests_per_second(client, url):
+
+    assert client.get(url).status_code == 200
+
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        client.get(url)
+
+    return REQUESTS / (time.perf_counter() - start)
+
+
+def authenticate_with_basic_and_token(api_client, user, measure):
+    """
+    Measure the requests made with basic authentication and then with a cached token, returning both measures
+    """
+
+    url = api_url(f'users/{user.id}/')
+
+    api_client.credentials(HTTP_AUTHORIZATION='Basic ' + base64.b64encode(b'john:johnpassword').decode())
+    basic = measure(api_client, url)
+
+    api_client.credentials()
+    token = api_client.post(api_url('auth/token/'), {'username': 'john', 'password': 'johnpassword'}).data['token']
+
+    token_cache.clear()
+    api_client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+    cached = measure(api_client, url)
+
+    return basic, cached
+
+
+def password_checks(client, url):
+
+    with mock.patch.object(User, 'check_password', autospec=True, side_effect=User.check_password) as check_password:
+        for _ in range(REQUESTS):
+            assert client.get(url).status_code == 200
+
+    return check_password.call_count
+
+
+@pytest.mark.django_db
+def test_token_authentication_skips_the_password_hash(api_client, test_user):
+
+    user = test_user[0]
+    user.set_password('johnpassword')
+    user.save()
+
+    basic, cached = authenticate_with_basic_and_token(api_client, user, password_checks)
+
+    assert basic == REQUESTS
+    assert cached == 0
+
+
+@pytest.mark.django_db
+@pytest.mark.skipif(not TIMING, reason='set BENCHMARK_AUTH_TIMING=1 to compare the throughput')
+def test_token_authentication_outpaces_basic_authentication(api_client, test_user):
+
+    with override_settings(PASSWORD_HASHERS=PRODUCTION_HASHERS):
+        user = test_user[0]
+        user.set_password('johnpassword')
+        user.save()
+
+        basic, cached = authenticate_with_basic_and_token(api_client, user, requests_per_second)
+
+    assert cached > basic * 2, f'basic: {basic:.1f} requests/s, token: {cached:.1f} requests/s ({cached / basic:.1f}x)'
@@ -0,0 +1,153 @@
+import json
+import os
+import time
+import tracemalloc
+
+from pathlib import Path
+
+import pytest
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from wallets.models import Deposit, Withdrawal, MarketAssetTransaction, TreasuryBondsTransaction
+
+from wallets.tests.test_fixture import test_user, test_countries, test_currencies, api_client, api_url, valuation_cache
+from wallets.tests.wallet.test_fixture import test_wallets
+from wallets.tests.account.test_fixture import test_accounts, test_account_types, test_account_institution_types, test_institution
+from wallets.tests.asset.test_fixture import test_asset_types, test_exchange_marketes, test_market_shares, test_treasury_bonds
+from wallets.tests.benchmark.test_fixture import benchmark_seed, LARGE_SCALE
+
+
+# BENCHMARK_SCALE sets the number of days of data seeded at the large scale, 30 by default, which
+# also adds a wallet and an account every DAYS_PER_ENTITY days, so the query count of every endpoint
+# must stay the same from the small to the large scale; wall times and peak memory are only
+# meaningful when it is raised, e.g. BENCHMARK_SCALE=365 with BENCHMARK_REPORT;
+# BENCHMARK_UPDATE_BASELINE=1 rewrites baseline.json with the measured query counts and
+# BENCHMARK_REPORT=<path> writes the query counts, wall times and peak memory of every endpoint.
+
+BASELINE_PATH = Path(__file__).with_name('baseline.json')
+
+UPDATE_BASELINE = os.environ.get('BENCHMARK_UPDATE_BASELINE') == '1'
+
+REPORT_PATH = os.environ.get('BENCHMARK_REPORT')
+
+# (name, url, role) for every GET endpoint of wallets/urls.py
+ENDPOINTS = [
+    ('wallets-list', 'wallets/', 'admin'),
+    ('wallets-detail', 'wallets/{wallet}/', 'owner'),
+    ('accounts-list', 'accounts/', 'admin'),
+    ('accounts-detail', 'accounts/{account}/', 'owner'),
+    ('deposit-list', 'deposits/', 'admin'),
+    ('deposit-detail', 'deposits/{deposit}/', 'owner'),
+    ('market_transaction-list', 'market_transactions/', 'admin'),
+    ('market_transaction-detail', 'market_transactions/{market_transaction}/', 'owner'),
+    ('treasury_bond_transaction-list', 'treasury_bond_transactions/', 'admin'),
+    ('treasury_bond_transaction-detail', 'treasury_bond_transactions/{bond_transaction}/', 'owner'),
+    ('withdrawal-list', 'withdrawals/', 'admin'),
+    ('withdrawal-detail', 'withdrawals/{withdrawal}/', 'owner'),
+    ('user-list', 'users/', 'admin'),
+    ('user-detail', 'users/{user}/', 'owner'),
+    ('account-transactions', 'accounts/{account}/transactions/', 'owner'),
+    ('account-treasury-bond-transactions', 'accounts/{account}/treasury_bond_transactions/', 'owner'),
+    ('account-assets', 'accounts/{account}/market_assets/', 'owner'),
+    ('account-assets-detailed', 'accounts/{account}/market_assets/?detailed', 'owner'),
+    ('account-treasury-bonds', 'accounts/{account}/treasury_bonds/', 'owner'),
+    ('account-treasury-bonds-detailed', 'accounts/{account}/treasury_bonds/?detailed', 'owner'),
+    ('account-returns', 'accounts/{account}/returns/', 'owner'),
+    ('wallet-transactions', 'wallets/{wallet}/transactions/', 'owner'),
+    ('wallet-treasury-bond-transactions', 'wallets/{wallet}/treasury_bond_transactions/', 'owner'),
+    ('wallet-assets', 'wallets/{wallet}/market_assets/', 'owner'),
+    ('wallet-treasury-bonds', 'wallets/{wallet}/treasury_bonds/', 'owner'),
+    ('wallet-history', 'wallets/{wallet}/history/', 'owner'),
+    ('wallet-performance', 'wallets/{wallet}/performance/', 'owner'),
+    ('wallet-allocation', 'wallets/{wallet}/allocation/', 'owner'),
+    ('wallet-returns', 'wallets/{wallet}/returns/', 'owner'),
+    ('user-transactions', 'users/{user}/transactions/', 'owner'),
+    ('user-treasury-bond-transactions', 'users/{user}/treasury_bond_transactions/', 'owner'),
+    ('user-assets', 'users/{user}/market_assets/', 'owner'),
+    ('user-treasury-bonds', 'users/{user}/treasury_bonds/', 'owner'),
+]
+
+# Endpoints whose query count still grows with the data, or which fail, to be fixed
+KNOWN_ISSUES = {}
+
+results = {}
+
+
+def load_baseline():
+
+    if BASELINE_PATH.exists():
+        return json.loads(BASELINE_PATH.read_text())
+    return {}
+
+
+@pytest.fixture(scope='module', autouse=True)
+def benchmark_report():
+
+    yield
+
+    if UPDATE_BASELINE:
+        baseline = load_baseline()
+        baseline.update({name: result['queries'] for name, result in results.items() if name not in KNOWN_ISSUES})
+        BASELINE_PATH.write_text(json.dumps(dict(sorted(baseline.items())), indent=4) + '\n')
+
+    if REPORT_PATH:
+        Path(REPORT_PATH).write_text(json.dumps(results, indent=4) + '\n')
+
+
+def measure(client, url):
+    """
+    Request the url, returning the response, the query count, the wall time and the peak traced memory
+    """
+
+    cache.clear()
+    tracemalloc.start()
+    started = time.perf_counter()
+
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(api_url(url))
+
+    elapsed = time.perf_counter() - started
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return response, len(queries), elapsed, peak_memory
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('name, url, role', [
+    pytest.param(*endpoint, marks=pytest.mark.xfail(reason=KNOWN_ISSUES[endpoint[0]], strict=True) if endpoint[0] in KNOWN_ISSUES else [])
+    for endpoint in ENDPOINTS
+])
+def test_endpoint_query_count(name, url, role, valuation_cache, api_client, test_user, test_wallets, test_accounts, benchmark_seed):
+
+    api_client.force_authenticate(user=test_user[4] if role == 'admin' else test_user[0])
+
+    ids = {
+        'wallet': test_wallets[0].id,
+        'account': test_accounts[0].id,
+        'user': test_user[0].id,
+        'deposit': Deposit.objects.first().id,
+        'withdrawal': Withdrawal.objects.first().id,
+        'market_transaction': MarketAssetTransaction.objects.first().id,
+        'bond_transaction': TreasuryBondsTransaction.objects.first().id,
+    }
+    url = url.format(**ids)
+
+    response, small_queries, _, _ = measure(api_client, url)
+    assert response.status_code == 200
+
+    benchmark_seed()
+
+    response, queries, elapsed, peak_memory = measure(api_client, url)
+    assert response.status_code == 200
+
+    results[name] = {'queries': queries, 'small_scale_queries': small_queries, 'seconds': round(elapsed, 4), 'peak_memory': peak_memory, 'scale': LARGE_SCALE}
+
+    assert queries <= small_queries, f'{name}: {small_queries} queries at the small scale but {queries} at the large scale.'
+
+    baseline = load_baseline()
+    if not UPDATE_BASELINE and name in baseline:
+        assert queries <= baseline[name], f'{name}: {queries} queries, the baseline is {baseline[name]}.'
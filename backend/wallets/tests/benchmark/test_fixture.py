@@ -0,0 +1,129 @@
+import os
+
+import pytest
+
+from django.utils import timezone
+
+from wallets.models import Account, Wallet, AssetPrice, CurrencyPrice, Deposit, Withdrawal, MarketAssetTransaction, TreasuryBondsTransaction, UserAsset, UserTreasuryBonds, WalletDailySnapshot
+
+
+# The default large scale keeps the benchmark quick in the regular test run, a year of data is
+# seeded with BENCHMARK_SCALE=365
+SMALL_SCALE = 1
+LARGE_SCALE = int(os.environ.get('BENCHMARK_SCALE', 30))
+
+# Every DAYS_PER_ENTITY days of scale add a wallet and an account, each with a week of history
+DAYS_PER_ENTITY = 15
+ENTITY_HISTORY = 7
+
+
+def seed_cash(user, wallet, account, currency, scale, offset=0):
+    """
+    Add scale days of deposits, withdrawals and daily snapshots to the wallet
+    """
+
+    now = timezone.now()
+    today = timezone.localdate()
+
+    Deposit.objects.bulk_create([
+        Deposit(user=user, wallet=wallet, account=account, currency=currency, amount=1000, deposited_at=now - timezone.timedelta(days=offset + day))
+        for day in range(scale)
+    ])
+    Withdrawal.objects.bulk_create([
+        Withdrawal(user=user, wallet=wallet, account=account, currency=currency, amount=10, withdrawn_at=now - timezone.timedelta(days=offset + day))
+        for day in range(scale)
+    ])
+    WalletDailySnapshot.objects.bulk_create([
+        WalletDailySnapshot(wallet=wallet, date=today - timezone.timedelta(days=offset + day), value=day)
+        for day in range(scale)
+    ])
+
+
+def seed_holdings(user, wallet, account, currency, assets, bonds, scale, offset=0, prices=True):
+    """
+    Add scale days of transactions, lots and, unless already seeded, prices of every asset and bond to the wallet
+    """
+
+    now = timezone.now()
+    today = timezone.localdate()
+
+    transactions = MarketAssetTransaction.objects.bulk_create([
+        MarketAssetTransaction(
+            user=user, transaction_type='B', account=account, wallet=wallet, asset=asset, amount=1, price=10,
+            account_currency=currency, currency_price=1, commission=0, transaction_date=now - timezone.timedelta(days=offset + day)
+        )
+        for asset in assets for day in range(scale)
+    ])
+    UserAsset.objects.bulk_create([
+        UserAsset(
+            user=user, account=account, wallet=wallet, asset=transaction.asset, amount=1, price=10,
+            account_currency=currency, currency_price=1, buy_transaction=transaction
+        )
+        for transaction in transactions
+    ])
+
+    bond_transactions = TreasuryBondsTransaction.objects.bulk_create([
+        TreasuryBondsTransaction(
+            user=user, transaction_type='B', account=account, wallet=wallet, bond=bond, amount=1, price=100,
+            account_currency=currency, currency_price=1, commission=0, transaction_date=now - timezone.timedelta(days=offset + day)
+        )
+        for bond in bonds for day in range(scale)
+    ])
+    UserTreasuryBonds.objects.bulk_create([
+        UserTreasuryBonds(
+            user=user, account=account, wallet=wallet, bond=transaction.bond, amount=1, buy_transaction=transaction,
+            issue_date=transaction.transaction_date.date(), maturity_date=transaction.transaction_date.date() + transaction.bond.maturity_date_delta
+        )
+        for transaction in bond_transactions
+    ])
+
+    if not prices:
+        return
+
+    AssetPrice.objects.bulk_create([
+        AssetPrice(asset=asset, price=10 + day % 7, date=today - timezone.timedelta(days=offset + day))
+        for asset in assets for day in range(scale)
+    ])
+
+
+def seed_entities(users, account, currency, assets, bonds, count):
+    """
+    Add count wallets and accounts spread over the users, each with a week of cash and holdings
+    """
+
+    for number in range(count):
+        user = users[number % len(users)]
+
+        wallet = Wallet.objects.create(owner=user, name=f'Benchmark Wallet {number}', description='Benchmark wallet')
+        entity_account = Account.objects.create(owner=user, name=f'Benchmark Account {number}', type=account.type, institution=account.institution, description='Benchmark account')
+        entity_account.wallets.set([wallet])
+        entity_account.currencies.set([currency])
+
+        seed_cash(user, wallet, entity_account, currency, ENTITY_HISTORY)
+        seed_holdings(user, wallet, entity_account, currency, assets, bonds, ENTITY_HISTORY, prices=False)
+
+
+@pytest.fixture
+def benchmark_seed(test_user, test_wallets, test_accounts, test_currencies, test_market_shares, test_treasury_bonds):
+    """
+    Seed the owner wallet with a single asset and bond at the small scale, and return a function
+    growing it to every asset and bond at the large scale and adding wallets and accounts in
+    proportion to it, so lists hold more rows than a page
+    """
+
+    owner = (test_user[0], test_wallets[0], test_accounts[0], test_currencies[0])
+
+    # Rates of the foreign currencies, so every endpoint can convert to the base currency
+    for currency in test_currencies[1:]:
+        CurrencyPrice.objects.create(currency=currency, price=4)
+
+    seed_cash(*owner, SMALL_SCALE)
+    seed_holdings(*owner, test_market_shares[:1], test_treasury_bonds[:1], SMALL_SCALE)
+
+    def grow():
+        seed_cash(*owner, LARGE_SCALE - SMALL_SCALE, SMALL_SCALE)
+        seed_holdings(*owner, test_market_shares[:1], test_treasury_bonds[:1], LARGE_SCALE - SMALL_SCALE, SMALL_SCALE)
+        seed_holdings(*owner, test_market_shares[1:], test_treasury_bonds[1:], LARGE_SCALE)
+        seed_entities(test_user[:4], test_accounts[0], test_currencies[0], test_market_shares, test_treasury_bonds, LARGE_SCALE // DAYS_PER_ENTITY)
+
+    return grow
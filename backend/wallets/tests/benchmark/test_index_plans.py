@@ -0,0 +1,100 @@
+import os
+
+import pytest
+
+from django.db import connection
+from django.db.models import Sum
+from django.utils import timezone
+
+from wallets.models import AssetPrice, CurrencyPrice, MarketAsset, UserAsset
+
+from wallets.tests.test_fixture import test_user, test_countries, test_currencies
+from wallets.tests.wallet.test_fixture import test_wallets
+from wallets.tests.account.test_fixture import test_accounts, test_account_types, test_account_institution_types, test_institution
+from wallets.tests.asset.test_fixture import test_asset_types, test_exchange_marketes, test_market_shares
+
+
+# BENCHMARK_PRICE_ROWS sets the number of seeded asset prices, e.g. 1000000 against PostgreSQL.
+
+PRICE_ROWS = int(os.environ.get('BENCHMARK_PRICE_ROWS', 20000))
+
+PRICED_ASSETS = 100
+
+
+@pytest.fixture
+def price_history(test_exchange_marketes, test_currencies):
+
+    assets = MarketAsset.objects.bulk_create([
+        MarketAsset(name=f'Asset {number}', code=f'A{number}', exchange_market=test_exchange_marketes[0], price_currency=test_currencies[0])
+        for number in range(PRICED_ASSETS)
+    ])
+
+    today = timezone.localdate()
+    days = PRICE_ROWS // PRICED_ASSETS
+
+    for asset in assets:
+        AssetPrice.objects.bulk_create([AssetPrice(asset=asset, price=day % 50 + 1, date=today - timezone.timedelta(days=day)) for day in range(days)], batch_size=5000)
+
+    CurrencyPrice.objects.bulk_create([CurrencyPrice(currency=currency, price=1) for currency in test_currencies for _ in range(days)], batch_size=5000)
+
+    return assets
+
+
+@pytest.fixture
+def lot_history(test_user, test_wallets, test_accounts, test_currencies, price_history):
+
+    # Mostly closed lots, as in a long-lived account
+    UserAsset.objects.bulk_create([
+        UserAsset(
+            user=test_user[0], account=test_accounts[0], wallet=test_wallets[0], asset=asset, amount=1, price=10,
+            account_currency=test_currencies[0], currency_price=1, active=number % 20 == 0
+        )
+        for asset in price_history for number in range(PRICE_ROWS // PRICED_ASSETS // 10)
+    ], batch_size=5000)
+
+
+def plan(queryset, dropped_index=None):
+    """
+    Return the query plan of the queryset, optionally as if the given index did not exist
+    """
+
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+        if dropped_index:
+            cursor.execute(f'DROP INDEX {dropped_index}')
+
+    return queryset.explain()
+
+
+def uses_index(query_plan, index):
+
+    if connection.vendor == 'postgresql':
+        return f'Index Only Scan using {index}' in query_plan or f'Index Scan using {index}' in query_plan
+
+    return f'INDEX {index}' in query_plan
+
+
+@pytest.mark.django_db
+def test_latest_asset_price_uses_index(price_history):
+
+    latest = AssetPrice.objects.filter(asset=price_history[0]).order_by('-date').values('price')[:1]
+
+    assert uses_index(plan(latest), 'asset_price_latest_idx')
+    assert not uses_index(plan(latest, dropped_index='asset_price_latest_idx'), 'asset_price_latest_idx')
+
+
+@pytest.mark.django_db
+def test_latest_currency_price_uses_index(price_history, test_currencies):
+
+    latest = CurrencyPrice.objects.filter(currency=test_currencies[0]).order_by('-date').values('price')[:1]
+
+    assert uses_index(plan(latest), 'currency_price_latest_idx')
+
+
+@pytest.mark.django_db
+def test_sell_validation_uses_open_lots_index(lot_history, test_user, test_accounts, price_history):
+
+    open_amount = test_user[0].assets.filter(asset=price_history[0], active=True, account=test_accounts[0])
+
+    assert uses_index(plan(open_amount.values('amount')), 'user_asset_open_lots_idx')
+    assert open_amount.aggregate(Sum('amount'))['amount__sum'] == PRICE_ROWS // PRICED_ASSETS // 10 // 20
@@ -3,6 +3,7 @@ import pytest
 from rest_framework.test import APIClient
 
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 
@@ -94,5 +95,16 @@ def admin_logged_client(api_client, test_user):
 
     return api_client
 
+@pytest.fixture
+def valuation_cache(settings):
+    """
+    Share the valuations through the default cache, emptied for the test
+    """
+
+    settings.VALUATION_CACHE = 'default'
+    cache.clear()
+    yield cache
+    cache.clear()
+
 def api_url(url):
     return '/api/v1/' + url
\ No newline at end of file
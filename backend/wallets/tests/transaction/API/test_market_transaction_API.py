@@ -5,6 +5,7 @@ from django.utils import timezone
 from django.utils.dateparse import parse_datetime
 
 from wallets.models import MarketAssetTransaction, Deposit, Wallet, Account, Currency
+from wallets.serializers import MarketAssetTransactionSerializer
 
 from wallets.tests.test_fixture import test_user, authenticated_client, api_client, admin_logged_client, api_url, test_currencies, test_countries
 from wallets.tests.account.test_fixture import test_accounts, test_account_types, test_account_institution_types, test_institution
@@ -1383,3 +1384,45 @@ def check_market_transaction_create_validations(api_client, data, error_field, e
     
     assert response.status_code == 400
     assert str(response.data[error_field][0]) == error_message
+
+
+def test_market_asset_transaction_serializer_loading_plan():
+
+    queryset = MarketAssetTransactionSerializer.setup_eager_loading(MarketAssetTransaction.objects.all())
+
+    assert queryset.query.select_related == {'asset': {}}
+    assert 'total_price' in queryset.query.annotations
+
+
+@pytest.mark.django_db
+def test_create_market_asset_transaction_converts_the_price_to_the_account_currency(api_client, test_market_shares, test_wallets, test_accounts, test_currencies, test_user):
+
+    # 10 shares at 40 PLN cost 100 USD at 0.25 USD per PLN
+    test_accounts[0].currencies.add(test_currencies[1])
+    Deposit.objects.create(wallet=test_wallets[0], account=test_accounts[0], user=test_user[0], amount=101, currency=test_currencies[1], deposited_at=timezone.now())
+
+    data = {
+        'code': test_market_shares[0].code,
+        'exchange_market': test_market_shares[0].exchange_market.id,
+        'wallet': test_wallets[0].id,
+        'account': test_accounts[0].id,
+        'transaction_type': 'B',
+        'amount': 10,
+        'price': 40,
+        'account_currency': test_currencies[1].code,
+        'currency_price': 0.25,
+        'commission': 1,
+        'transaction_date': timezone.now().isoformat()
+    }
+
+    api_client.force_authenticate(user=test_user[0])
+    response = api_client.post(api_url('market_transactions/'), data=data)
+
+    assert response.status_code == 201
+    assert test_accounts[0].get_balance(test_currencies[1]) == 0
+
+    data['currency_price'] = 1
+    response = api_client.post(api_url('market_transactions/'), data=data)
+
+    assert response.status_code == 400
+    assert 'not_enough_funds' in response.data
@@ -0,0 +1,137 @@
+import pytest
+
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.utils import timezone
+
+from wallets.models import AccountBalanceEntry, Deposit, MarketAssetTransaction, UserAssetSale
+
+from wallets.tests.test_fixture import test_user, authenticated_client, api_client, api_url, test_currencies, test_countries
+from wallets.tests.account.test_fixture import test_accounts, test_account_types, test_account_institution_types, test_institution
+from wallets.tests.asset.test_fixture import test_asset_types, test_exchange_marketes, test_market_shares
+from wallets.tests.wallet.test_fixture import test_wallets
+
+
+def transaction_row(test_wallets, test_accounts, test_market_shares, transaction_type, amount, price, days_ago, exchange_market=None):
+
+    return {
+        'account': test_accounts[0].id,
+        'wallet': test_wallets[0].id,
+        'transaction_type': transaction_type,
+        'amount': str(amount),
+        'price': str(price),
+        'account_currency': 'PLN',
+        'currency_price': '1',
+        'commission': '1',
+        'transaction_date': (timezone.now() - timezone.timedelta(days=days_ago)).isoformat(),
+        'code': test_market_shares[0].code,
+        'exchange_market': exchange_market or test_market_shares[0].exchange_market.id
+    }
+
+
+@pytest.fixture
+def funded_account(test_user, test_wallets, test_accounts, test_currencies):
+
+    Deposit.objects.create(wallet=test_wallets[0], account=test_accounts[0], user=test_user[0], amount=1000, currency=test_currencies[0], deposited_at=timezone.now() - timezone.timedelta(days=30))
+
+    return test_accounts[0]
+
+
+@pytest.mark.django_db
+def test_bulk_create_market_transactions(authenticated_client, funded_account, test_wallets, test_accounts, test_currencies, test_market_shares):
+
+    rows = [
+        transaction_row(test_wallets, test_accounts, test_market_shares, 'S', 4, 120, 1),
+        transaction_row(test_wallets, test_accounts, test_market_shares, 'B', 5, 100, 10, exchange_market=test_market_shares[0].exchange_market.code),
+        transaction_row(test_wallets, test_accounts, test_market_shares, 'B', 2, 50, 5),
+    ]
+
+    response = authenticated_client.post(api_url('market_transactions/bulk/'), rows, format='json')
+
+    assert response.status_code == 201
+    assert response.data['created'] == 3
+    assert MarketAssetTransaction.objects.count() == 3
+
+    lots = list(test_accounts[0].assets.order_by('created_at', 'id'))
+    assert [lot.amount for lot in lots] == [Decimal('1'), Decimal('2')]
+    assert UserAssetSale.objects.get().amount == Decimal('4')
+
+    assert funded_account.get_balance(test_currencies[0]) == Decimal('1000') - 501 - 101 + 479
+    assert list(AccountBalanceEntry.objects.filter(balance__account=funded_account).values_list('kind', flat=True)) == ['D', 'B', 'B', 'S']
+    assert funded_account.verify_balance(test_currencies[0])
+
+
+@pytest.mark.django_db
+def test_bulk_create_market_transactions_reports_rows(authenticated_client, funded_account, test_wallets, test_accounts, test_market_shares):
+
+    rows = [
+        transaction_row(test_wallets, test_accounts, test_market_shares, 'B', 5, 100, 10),
+        transaction_row(test_wallets, test_accounts, test_market_shares, 'B', 5, 100, 9),
+        transaction_row(test_wallets, test_accounts, test_market_shares, 'S', 20, 100, 1),
+    ]
+    rows[0]['account_currency'] = 'XXX'
+
+    response = authenticated_client.post(api_url('market_transactions/bulk/'), rows, format='json')
+
+    assert response.status_code == 400
+    assert response.data['errors'] == [{'row': 1, 'errors': {'account_currency': 'XXX is a wrong currency. Please provide a valid currency.'}}]
+
+    rows[0]['account_currency'] = 'PLN'
+    rows[1]['amount'] = '6'
+
+    response = authenticated_client.post(api_url('market_transactions/bulk/'), rows, format='json')
+
+    assert response.status_code == 400
+    assert [error['row'] for error in response.data['errors']] == [2, 3]
+    assert 'not_enough_funds' in response.data['errors'][0]['errors']
+    assert 'amount' in response.data['errors'][1]['errors']
+    assert not MarketAssetTransaction.objects.exists()
+
+
+@pytest.mark.django_db
+def test_bulk_create_market_transactions_dry_run(authenticated_client, funded_account, test_wallets, test_accounts, test_market_shares):
+
+    rows = [transaction_row(test_wallets, test_accounts, test_market_shares, 'B', 5, 100, 10)]
+
+    response = authenticated_client.post(api_url('market_transactions/bulk/?dry_run=true'), rows, format='json')
+
+    assert response.status_code == 200
+    assert response.data == {'created': 0, 'ids': []}
+    assert not MarketAssetTransaction.objects.exists()
+
+
+@pytest.mark.django_db
+def test_bulk_create_market_transactions_not_owner(api_client, test_user, funded_account, test_wallets, test_accounts, test_market_shares):
+
+    api_client.force_authenticate(user=test_user[3])
+
+    response = api_client.post(api_url('market_transactions/bulk/'), [transaction_row(test_wallets, test_accounts, test_market_shares, 'B', 1, 1, 1)], format='json')
+
+    assert response.status_code == 400
+    assert response.data['errors'][0]['errors']['account'] == 'You do not own this account.'
+    assert response.data['errors'][0]['errors']['wallet'] == 'You do not own this wallet.'
+
+
+@pytest.mark.django_db
+def test_bulk_create_market_transactions_query_count(authenticated_client, funded_account, test_wallets, test_accounts, test_market_shares, django_assert_max_num_queries):
+
+    rows = [transaction_row(test_wallets, test_accounts, test_market_shares, 'B', 1, 1, days) for days in range(1, 201)]
+
+    with django_assert_max_num_queries(40):
+        response = authenticated_client.post(api_url('market_transactions/bulk/'), rows, format='json')
+
+    assert response.status_code == 201
+    assert test_accounts[0].assets.count() == 200
+
+
+@pytest.mark.django_db
+def test_import_transactions_command(tmp_path, test_user, funded_account, test_wallets, test_accounts, test_market_shares):
+
+    path = tmp_path / 'statement.csv'
+    row = transaction_row(test_wallets, test_accounts, test_market_shares, 'B', 2, 10, 3)
+    path.write_text(','.join(row) + '\n' + ','.join(str(value) for value in row.values()) + '\n')
+
+    call_command('import_transactions', str(path), user=test_user[0].username)
+
+    assert MarketAssetTransaction.objects.get().amount == Decimal('2')
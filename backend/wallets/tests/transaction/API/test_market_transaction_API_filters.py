@@ -0,0 +1,69 @@
+import pytest
+
+from django.utils import timezone
+
+from wallets.models import MarketAssetTransaction
+
+from wallets.tests.test_fixture import test_user, authenticated_client, api_client, api_url, test_currencies, test_countries
+from wallets.tests.account.test_fixture import test_accounts, test_account_types, test_account_institution_types, test_institution
+from wallets.tests.asset.test_fixture import test_asset_types, test_exchange_marketes, test_market_shares
+from wallets.tests.wallet.test_fixture import test_wallets
+
+
+@pytest.fixture
+def transaction_history(test_user, test_wallets, test_accounts, test_currencies, test_market_shares):
+
+    now = timezone.now()
+
+    return MarketAssetTransaction.objects.bulk_create([
+        MarketAssetTransaction(
+            user=test_user[0], transaction_type=transaction_type, account=test_accounts[0], wallet=test_wallets[0], asset=asset,
+            amount=1, price=10, account_currency=test_currencies[0], currency_price=1, commission=0,
+            transaction_date=now - timezone.timedelta(days=days)
+        )
+        for transaction_type, asset, days in [
+            ('B', test_market_shares[0], 10),
+            ('B', test_market_shares[1], 5),
+            ('S', test_market_shares[0], 2),
+            ('B', test_market_shares[0], 0),
+        ]
+    ])
+
+
+def listed_ids(client, test_user, query):
+
+    response = client.get(api_url(f'users/{test_user[0].id}/transactions/?{query}'))
+
+    assert response.status_code == 200
+    return [row['id'] for row in response.data['results']]
+
+
+@pytest.mark.django_db
+def test_transaction_list_filters(authenticated_client, test_user, test_wallets, transaction_history):
+
+    ids = [transaction.id for transaction in transaction_history]
+    today = timezone.localdate()
+
+    assert listed_ids(authenticated_client, test_user, 'type=S') == [ids[2]]
+    assert listed_ids(authenticated_client, test_user, 'asset=NYSE:AAPL&transaction_type=B') == [ids[0], ids[3]]
+    assert listed_ids(authenticated_client, test_user, 'asset=MSFT') == [ids[1]]
+    assert listed_ids(authenticated_client, test_user, f'after={today - timezone.timedelta(days=5)}&before={today}') == ids[1:]
+    assert listed_ids(authenticated_client, test_user, f'before={today - timezone.timedelta(days=1)}') == ids[:3]
+    assert listed_ids(authenticated_client, test_user, f'wallet={test_wallets[0].id}&currency=PLN') == ids
+    assert listed_ids(authenticated_client, test_user, 'currency=USD') == []
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('query, param', [
+    ('user__wallets__accounts__name=Checking', 'user__wallets__accounts__name'),
+    ('price__gt=1', 'price__gt'),
+    ('type=X', 'type'),
+    ('account=first', 'account'),
+    ('after=yesterday', 'after'),
+])
+def test_transaction_list_rejects_unknown_filters(authenticated_client, test_user, transaction_history, query, param):
+
+    response = authenticated_client.get(api_url(f'users/{test_user[0].id}/transactions/?{query}'))
+
+    assert response.status_code == 400
+    assert param in response.data
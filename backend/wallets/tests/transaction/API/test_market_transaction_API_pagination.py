@@ -0,0 +1,108 @@
+import pytest
+
+import base64
+import json
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from wallets.models import MarketAssetTransaction
+from wallets.pagination import HybridPagination
+
+from wallets.tests.test_fixture import test_user, authenticated_client, api_client, api_url, test_currencies, test_countries
+from wallets.tests.account.test_fixture import test_accounts, test_account_types, test_account_institution_types, test_institution
+from wallets.tests.asset.test_fixture import test_asset_types, test_exchange_marketes, test_market_shares
+from wallets.tests.wallet.test_fixture import test_wallets
+
+
+@pytest.fixture
+def transaction_history(test_user, test_wallets, test_accounts, test_currencies, test_market_shares):
+
+    now = timezone.now()
+
+    # Pairs of transactions share a date, so the id has to break the ties
+    return MarketAssetTransaction.objects.bulk_create([
+        MarketAssetTransaction(
+            user=test_user[0], transaction_type='B', account=test_accounts[0], wallet=test_wallets[0], asset=test_market_shares[0],
+            amount=1, price=10, account_currency=test_currencies[0], currency_price=1, commission=0,
+            transaction_date=now - timezone.timedelta(days=25 - number // 2)
+        )
+        for number in range(25)
+    ])
+
+
+def get_pages(client, url):
+
+    pages = []
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        pages.append(response.data)
+        url = response.data['next']
+
+    return pages
+
+
+@pytest.mark.django_db
+def test_keyset_pagination_walks_the_history_in_date_order(authenticated_client, test_user, transaction_history):
+
+    pages = get_pages(authenticated_client, api_url(f'users/{test_user[0].id}/transactions/?cursor=&page_size=10'))
+
+    assert [len(page['results']) for page in pages] == [10, 10, 5]
+    assert all(page['count'] is None and page['previous'] is None for page in pages)
+    assert [row['id'] for page in pages for row in page['results']] == [transaction.id for transaction in transaction_history]
+
+
+@pytest.mark.django_db
+def test_keyset_pagination_does_not_count(authenticated_client, test_user, transaction_history):
+
+    with CaptureQueriesContext(connection) as context:
+        authenticated_client.get(api_url(f'users/{test_user[0].id}/transactions/?cursor='))
+
+    assert not any('COUNT(' in query['sql'] for query in context.captured_queries)
+
+
+@pytest.mark.django_db
+def test_keyset_pagination_rejects_invalid_cursor(authenticated_client, test_user, transaction_history):
+
+    response = authenticated_client.get(api_url(f'users/{test_user[0].id}/transactions/?cursor=invalid'))
+
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('values', [
+    {'transaction_date': '2024-01-01', 'id': '1'},
+    [['2024-01-01'], 1],
+    ['2024-01-01T00:00:00+00:00', None],
+    ['not a date', '1'],
+    ['2024-01-01T00:00:00+00:00', 'not an id'],
+])
+def test_keyset_pagination_rejects_malformed_cursor(authenticated_client, test_user, transaction_history, values):
+
+    cursor = base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    response = authenticated_client.get(api_url(f'users/{test_user[0].id}/transactions/'), {'cursor': cursor})
+
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_page_number_pagination_without_count(authenticated_client, test_user, transaction_history):
+
+    pages = get_pages(authenticated_client, api_url(f'users/{test_user[0].id}/transactions/?count=false&page_size=20'))
+
+    assert [len(page['results']) for page in pages] == [20, 5]
+    assert pages[0]['count'] is None and pages[0]['previous'] is None
+    assert pages[1]['previous'] is not None
+
+
+def test_page_size_is_capped():
+
+    request = Request(APIRequestFactory().get('/', {'page_size': 100000}))
+
+    assert HybridPagination().get_page_size(request) == HybridPagination.max_page_size
@@ -0,0 +1,145 @@
+import pytest
+
+from decimal import Decimal
+
+from django.utils import timezone
+
+from wallets.models import Deposit, MarketAssetTransaction, TreasuryBondsTransaction, UserAssetSale, UserTreasuryBondsSale
+from wallets.services import match_lots
+
+from wallets.tests.test_fixture import test_user, test_countries, test_currencies
+from wallets.tests.wallet.test_fixture import test_wallets
+from wallets.tests.account.test_fixture import test_accounts, test_account_types, test_account_institution_types, test_institution
+from wallets.tests.asset.test_fixture import test_asset_types, test_exchange_marketes, test_market_shares, test_treasury_bonds
+
+
+class Lot:
+
+    def __init__(self, amount, price):
+        self.amount = Decimal(amount)
+        self.price = Decimal(price)
+
+
+def consumed(matches):
+    return [(lot.price, amount) for lot, amount in matches]
+
+
+@pytest.fixture
+def lots():
+    return [Lot(10, 100), Lot(5, 150), Lot(5, 90)]
+
+
+def test_match_lots_fifo(lots):
+
+    assert consumed(match_lots(lots, 12)) == [(Decimal(100), Decimal(10)), (Decimal(150), Decimal(2))]
+
+
+def test_match_lots_lifo(lots):
+
+    assert consumed(match_lots(lots, 7, 'LIFO')) == [(Decimal(90), Decimal(5)), (Decimal(150), Decimal(2))]
+
+
+def test_match_lots_hifo(lots):
+
+    assert consumed(match_lots(lots, 7, 'HIFO')) == [(Decimal(150), Decimal(5)), (Decimal(100), Decimal(2))]
+
+
+def test_match_lots_average_consumes_lots_proportionally(lots):
+
+    matches = match_lots(lots, Decimal('10.01'), 'AVERAGE')
+
+    assert sum(amount for _, amount in matches) == Decimal('10.01')
+    assert consumed(matches) == [(Decimal(100), Decimal('5.01')), (Decimal(150), Decimal('2.50')), (Decimal(90), Decimal('2.50'))]
+
+
+def test_match_lots_returns_what_is_available(lots):
+
+    assert sum(amount for _, amount in match_lots(lots, 100)) == 20
+
+
+def test_match_lots_rejects_unknown_method(lots):
+
+    with pytest.raises(ValueError):
+        match_lots(lots, 1, 'RANDOM')
+
+
+def buy(user, wallet, account, currency, amount, price, model=MarketAssetTransaction, **kwargs):
+
+    return model.objects.create(
+        user=user,
+        transaction_type='B',
+        account=account,
+        wallet=wallet,
+        amount=amount,
+        price=price,
+        account_currency=currency,
+        currency_price=1,
+        commission=0,
+        transaction_date=timezone.now(),
+        **kwargs
+    )
+
+
+@pytest.mark.django_db
+def test_sell_assets_consumes_lots_in_bulk(test_user, test_wallets, test_accounts, test_currencies, test_market_shares, django_assert_max_num_queries):
+
+    Deposit.objects.create(wallet=test_wallets[0], account=test_accounts[0], user=test_user[0], amount=10000, currency=test_currencies[0], deposited_at=timezone.now())
+
+    for price in range(1, 21):
+        buy(test_user[0], test_wallets[0], test_accounts[0], test_currencies[0], 2, price, asset=test_market_shares[0])
+
+    sell = MarketAssetTransaction(
+        user=test_user[0],
+        transaction_type='S',
+        account=test_accounts[0],
+        wallet=test_wallets[0],
+        asset=test_market_shares[0],
+        amount=Decimal('25.5'),
+        price=30,
+        account_currency=test_currencies[0],
+        currency_price=1,
+        commission=0,
+        transaction_date=timezone.now()
+    )
+
+    with django_assert_max_num_queries(30):
+        sell.save()
+
+    lots = list(test_user[0].assets.filter(asset=test_market_shares[0]).order_by('created_at'))
+
+    assert [lot.active for lot in lots].count(False) == 12
+    assert lots[12].amount == Decimal('0.5')
+    assert all(lot.amount == 2 for lot in lots[13:])
+
+    assert sell.amount == Decimal('25.5')
+    assert sell.sell_user_assets.count() == 13
+    assert UserAssetSale.objects.filter(transaction=sell).count() == 13
+    assert sum(sale.amount for sale in sell.lot_sales.all()) == Decimal('25.5')
+    assert test_accounts[0].get_balance(test_currencies[0]) == 10000 - 420 + Decimal('765')
+
+
+@pytest.mark.django_db
+def test_sell_bonds_records_lot_sales(test_user, test_wallets, test_accounts, test_currencies, test_treasury_bonds):
+
+    Deposit.objects.create(wallet=test_wallets[0], account=test_accounts[0], user=test_user[0], amount=1000, currency=test_currencies[0], deposited_at=timezone.now())
+
+    for _ in range(3):
+        buy(test_user[0], test_wallets[0], test_accounts[0], test_currencies[0], 2, 100, model=TreasuryBondsTransaction, bond=test_treasury_bonds[0])
+
+    sell = TreasuryBondsTransaction.objects.create(
+        user=test_user[0],
+        transaction_type='S',
+        account=test_accounts[0],
+        wallet=test_wallets[0],
+        bond=test_treasury_bonds[0],
+        amount=5,
+        price=100,
+        account_currency=test_currencies[0],
+        currency_price=1,
+        commission=0,
+        transaction_date=timezone.now()
+    )
+
+    assert list(UserTreasuryBondsSale.objects.filter(transaction=sell).values_list('amount', flat=True)) == [2, 2, 1]
+    assert test_user[0].bonds.filter(active=True).get().amount == 1
+    assert test_accounts[0].get_balance(test_currencies[0]) == 900
@@ -0,0 +1,72 @@
+import pytest
+
+from decimal import Decimal
+
+from django.db.models import Sum
+from django.utils import timezone
+
+from wallets.models import Deposit, MarketAssetTransaction, TreasuryBondsTransaction
+
+from wallets.tests.test_fixture import test_user, test_countries, test_currencies
+from wallets.tests.wallet.test_fixture import test_wallets
+from wallets.tests.account.test_fixture import test_accounts, test_account_types, test_account_institution_types, test_institution
+from wallets.tests.asset.test_fixture import test_asset_types, test_exchange_marketes, test_market_shares, test_treasury_bonds
+
+
+def trade(user, wallet, account, currency, transaction_type, amount, price, currency_price, commission, model=MarketAssetTransaction, **kwargs):
+
+    return model.objects.create(
+        user=user,
+        transaction_type=transaction_type,
+        account=account,
+        wallet=wallet,
+        amount=amount,
+        price=price,
+        account_currency=currency,
+        currency_price=currency_price,
+        commission=commission,
+        transaction_date=timezone.now(),
+        **kwargs
+    )
+
+
+@pytest.fixture
+def traded_account(test_user, test_wallets, test_accounts, test_currencies, test_market_shares, test_treasury_bonds):
+
+    account = test_accounts[0]
+    account.currencies.add(test_currencies[1])
+
+    for currency in test_currencies[:2]:
+        Deposit.objects.create(wallet=test_wallets[0], account=account, user=test_user[0], amount=5000, currency=currency, deposited_at=timezone.now())
+
+    owner = (test_user[0], test_wallets[0], account)
+
+    trade(*owner, test_currencies[0], 'B', 2, 50, 1, 1, asset=test_market_shares[0])
+    trade(*owner, test_currencies[1], 'B', 4, 100, Decimal('0.25'), 2, asset=test_market_shares[0])
+    trade(*owner, test_currencies[0], 'S', 1, 60, 1, 1, asset=test_market_shares[0])
+    trade(*owner, test_currencies[1], 'B', 3, 100, 4, 0, model=TreasuryBondsTransaction, bond=test_treasury_bonds[0])
+
+    return account
+
+
+@pytest.mark.django_db
+def test_with_total_price_matches_the_property(traded_account):
+
+    for model in [MarketAssetTransaction, TreasuryBondsTransaction]:
+        for transaction in model.objects.filter(account=traded_account):
+            annotated = model.objects.with_total_price().get(pk=transaction.pk)
+
+            assert annotated.total_price == transaction.total_price
+
+
+@pytest.mark.django_db
+def test_with_total_price_is_computed_by_the_database(traded_account, django_assert_num_queries):
+
+    transactions = MarketAssetTransaction.objects.filter(account=traded_account).with_total_price()
+
+    with django_assert_num_queries(1):
+        assert [transaction.total_price for transaction in transactions.order_by('-total_price')] == [Decimal(102), Decimal(101), Decimal(59)]
+
+    assert transactions.filter(transaction_type='B').aggregate(volume=Sum('total_price'))['volume'] == Decimal(203)
+    assert transactions.filter(total_price__gt=100).count() == 2
+    assert TreasuryBondsTransaction.objects.with_total_price().get().total_price == Decimal(1200)
@@ -0,0 +1,98 @@
+import pytest
+
+from decimal import Decimal
+
+from django.utils import timezone
+
+from wallets.models import AssetTypeAssociation, CurrencyPrice, MarketETF, UserAsset, UserTreasuryBonds
+
+from wallets.tests.test_fixture import test_user, test_countries, test_currencies, authenticated_client, api_client, api_url, valuation_cache
+from wallets.tests.wallet.test_fixture import test_wallets
+from wallets.tests.account.test_fixture import test_accounts, test_account_types, test_account_institution_types, test_institution
+from wallets.tests.asset.test_fixture import test_asset_types, test_exchange_marketes, test_market_shares, test_treasury_bonds
+
+
+@pytest.fixture
+def diversified_wallet(valuation_cache, test_user, test_wallets, test_accounts, test_currencies, test_countries, test_asset_types, test_exchange_marketes, test_market_shares, test_treasury_bonds):
+    """
+    A wallet worth 3000 PLN: a Polish share, a German ETF split 60/30 between shares and bonds
+    held in USD at 4 PLN per USD, and Polish treasury bonds, each worth 1000 PLN
+    """
+
+    test_accounts[0].currencies.add(test_currencies[1])
+    CurrencyPrice.objects.create(currency=test_currencies[1], price=Decimal('4'))
+    CurrencyPrice.objects.create(currency=test_currencies[2], price=Decimal('5'))
+
+    etf = MarketETF.objects.create(
+        name='World', code='WRLD', exchange_market=test_exchange_marketes[0], price_currency=test_currencies[1],
+        fund_country=test_countries[2], replication_method='Physical'
+    )
+    AssetTypeAssociation.objects.create(asset=etf, asset_type=test_asset_types[0], percentage=Decimal('0.6'))
+    AssetTypeAssociation.objects.create(asset=etf, asset_type=test_asset_types[5], percentage=Decimal('0.3'))
+
+    for asset, currency, amount, price in [(test_market_shares[0], test_currencies[0], 10, 100), (etf, test_currencies[1], 5, 50)]:
+        UserAsset.objects.create(
+            user=test_user[0], wallet=test_wallets[0], account=test_accounts[0], asset=asset,
+            amount=amount, price=price, account_currency=currency, currency_price=1
+        )
+
+    UserTreasuryBonds.objects.create(
+        user=test_user[0], wallet=test_wallets[0], account=test_accounts[0], bond=test_treasury_bonds[0], amount=10,
+        issue_date=timezone.localdate(), maturity_date=timezone.localdate() + timezone.timedelta(days=3650)
+    )
+
+    return test_wallets[0]
+
+
+def exposures(rows):
+    return {row['name']: (row['value'], row['share']) for row in rows}
+
+
+@pytest.mark.django_db
+def test_allocation_looks_through_etfs(authenticated_client, diversified_wallet):
+
+    response = authenticated_client.get(api_url(f'wallets/{diversified_wallet.id}/allocation/'))
+
+    assert response.status_code == 200
+    assert response.data['currency'] == 'PLN'
+    assert response.data['total'] == '3000.00'
+
+    assert exposures(response.data['asset_types']) == {
+        'Share': ('1600.00', '0.5333'),
+        'Treasury Bonds': ('1300.00', '0.4333'),
+        'Unclassified': ('100.00', '0.0333'),
+    }
+    assert [row['name'] for row in response.data['asset_types']] == ['Share', 'Treasury Bonds', 'Unclassified']
+
+    assert exposures(response.data['countries']) == {
+        'Poland': ('2000.00', '0.6667'),
+        'Germany': ('1000.00', '0.3333'),
+    }
+
+
+@pytest.mark.django_db
+def test_allocation_in_the_requested_currency(authenticated_client, diversified_wallet, django_assert_max_num_queries):
+
+    url = api_url(f'wallets/{diversified_wallet.id}/allocation/?currency=EUR')
+    authenticated_client.get(url)
+
+    # The valuation and the cross rates are cached, the instruments are loaded with one query
+    with django_assert_max_num_queries(3):
+        response = authenticated_client.get(url)
+
+    assert response.data['currency'] == 'EUR'
+    assert response.data['total'] == '600.00'
+    assert exposures(response.data['countries'])['Germany'] == ('200.00', '0.3333')
+
+
+@pytest.mark.django_db
+def test_allocation_of_empty_or_foreign_wallet(authenticated_client, test_wallets, test_accounts):
+
+    response = authenticated_client.get(api_url(f'wallets/{test_wallets[0].id}/allocation/'))
+
+    assert response.status_code == 200
+    assert response.data['total'] == '0.00'
+    assert response.data['asset_types'] == []
+
+    assert authenticated_client.get(api_url(f'wallets/{test_wallets[3].id}/allocation/')).status_code == 403
+    assert authenticated_client.get(api_url(f'wallets/{test_wallets[0].id}/allocation/?currency=XYZ')).status_code == 400
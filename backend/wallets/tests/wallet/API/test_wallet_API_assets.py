@@ -0,0 +1,89 @@
+import pytest
+
+from django.utils import timezone
+
+from wallets.models import AssetPrice, Deposit, MarketAssetTransaction
+
+from wallets.tests.test_fixture import test_user, test_countries, test_currencies, authenticated_client, api_client, api_url
+from wallets.tests.wallet.test_fixture import test_wallets
+from wallets.tests.account.test_fixture import test_accounts, test_account_types, test_account_institution_types, test_institution
+from wallets.tests.asset.test_fixture import test_asset_types, test_exchange_marketes, test_market_shares
+
+
+def buy(test_user, test_wallets, test_accounts, test_currencies, asset, amount, price):
+
+    return MarketAssetTransaction.objects.create(
+        user=test_user[0],
+        transaction_type='B',
+        account=test_accounts[0],
+        wallet=test_wallets[0],
+        asset=asset,
+        amount=amount,
+        price=price,
+        account_currency=test_currencies[0],
+        currency_price=1,
+        commission=0,
+        transaction_date=timezone.now()
+    )
+
+
+@pytest.fixture
+def held_assets(test_user, test_wallets, test_accounts, test_currencies, test_market_shares):
+
+    Deposit.objects.create(wallet=test_wallets[0], account=test_accounts[0], user=test_user[0], amount=10000, currency=test_currencies[0], deposited_at=timezone.now())
+
+    buy(test_user, test_wallets, test_accounts, test_currencies, test_market_shares[0], 2, 100)
+    buy(test_user, test_wallets, test_accounts, test_currencies, test_market_shares[0], 3, 110)
+    buy(test_user, test_wallets, test_accounts, test_currencies, test_market_shares[1], 4, 50)
+
+    AssetPrice.objects.create(asset=test_market_shares[0], price=120, date=timezone.now().date())
+
+    return test_wallets[0]
+
+
+@pytest.mark.django_db
+def test_wallet_assets_are_aggregated_per_asset(authenticated_client, held_assets):
+
+    response = authenticated_client.get(api_url(f'wallets/{held_assets.id}/market_assets/'))
+
+    assert response.status_code == 200
+    assert response.data['results'] == [
+        {
+            'asset': 'NYSE:AAPL',
+            'amount': '5.00',
+            'price_currency': 'PLN',
+            'last_price': '120.0000000000',
+            'last_price_date': timezone.now().date().isoformat(),
+            'market_value': '600.00'
+        },
+        {
+            'asset': 'NYSE:MSFT',
+            'amount': '4.00',
+            'price_currency': 'PLN',
+            'last_price': None,
+            'last_price_date': None,
+            'market_value': None
+        }
+    ]
+
+
+@pytest.mark.django_db
+def test_wallet_assets_query_count_does_not_depend_on_holdings(authenticated_client, held_assets, test_user, test_wallets, test_accounts, test_currencies, test_market_shares, django_assert_max_num_queries):
+
+    for asset in test_market_shares[2:]:
+        buy(test_user, test_wallets, test_accounts, test_currencies, asset, 1, 10)
+
+    with django_assert_max_num_queries(6):
+        response = authenticated_client.get(api_url(f'wallets/{held_assets.id}/market_assets/'))
+
+    assert len(response.data['results']) == len(test_market_shares)
+
+
+@pytest.mark.django_db
+def test_wallet_assets_keyset_pagination(authenticated_client, held_assets):
+
+    first = authenticated_client.get(api_url(f'wallets/{held_assets.id}/market_assets/?cursor=&page_size=1'))
+    second = authenticated_client.get(first.data['next'])
+
+    assert [row['asset'] for row in first.data['results'] + second.data['results']] == ['NYSE:AAPL', 'NYSE:MSFT']
+    assert second.data['next'] is None
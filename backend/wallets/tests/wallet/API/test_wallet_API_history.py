@@ -0,0 +1,77 @@
+import pytest
+
+from django.utils import timezone
+
+from wallets.models import WalletDailySnapshot
+
+from wallets.tests.test_fixture import test_user, authenticated_client, api_client, api_url
+from wallets.tests.wallet.test_fixture import test_wallets
+
+
+@pytest.fixture
+def test_snapshots(test_wallets):
+
+    today = timezone.localdate()
+
+    return WalletDailySnapshot.objects.bulk_create([
+        WalletDailySnapshot(wallet=test_wallets[0], date=today - timezone.timedelta(days=days), value=days, assets_value=days, cash={'PLN': '1.00'})
+        for days in range(60)
+    ])
+
+
+@pytest.mark.django_db
+def test_wallet_history_owner(authenticated_client, test_wallets, test_snapshots):
+
+    response = authenticated_client.get(api_url(f'wallets/{test_wallets[0].id}/history/'))
+
+    assert response.status_code == 200
+    assert len(response.data) == 60
+    assert response.data[0]['date'] == str(timezone.localdate() - timezone.timedelta(days=59))
+    assert response.data[-1]['value'] == '0.00'
+    assert response.data[-1]['cash'] == {'PLN': '1.00'}
+
+
+@pytest.mark.django_db
+def test_wallet_history_date_range(authenticated_client, test_wallets, test_snapshots):
+
+    after = timezone.localdate() - timezone.timedelta(days=10)
+    before = timezone.localdate() - timezone.timedelta(days=5)
+
+    response = authenticated_client.get(api_url(f'wallets/{test_wallets[0].id}/history/?after={after}&before={before}'))
+
+    assert response.status_code == 200
+    assert [point['date'] for point in response.data] == [str(after + timezone.timedelta(days=day)) for day in range(6)]
+
+
+@pytest.mark.django_db
+def test_wallet_history_monthly(authenticated_client, test_wallets, test_snapshots):
+
+    response = authenticated_client.get(api_url(f'wallets/{test_wallets[0].id}/history/?interval=month'))
+
+    assert response.status_code == 200
+    assert response.data[-1]['date'] == str(timezone.localdate())
+    assert len(response.data) in [2, 3]
+
+
+@pytest.mark.django_db
+def test_wallet_history_invalid_params(authenticated_client, test_wallets, test_snapshots):
+
+    response = authenticated_client.get(api_url(f'wallets/{test_wallets[0].id}/history/?interval=year'))
+
+    assert response.status_code == 400
+    assert 'interval' in response.data
+
+    response = authenticated_client.get(api_url(f'wallets/{test_wallets[0].id}/history/?after=yesterday'))
+
+    assert response.status_code == 400
+    assert 'after' in response.data
+
+
+@pytest.mark.django_db
+def test_wallet_history_not_owner(api_client, test_user, test_wallets, test_snapshots):
+
+    api_client.force_authenticate(user=test_user[3])
+
+    response = api_client.get(api_url(f'wallets/{test_wallets[0].id}/history/'))
+
+    assert response.status_code == 403
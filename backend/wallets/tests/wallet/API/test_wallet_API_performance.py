@@ -0,0 +1,131 @@
+import pytest
+
+from decimal import Decimal
+
+from django.utils import timezone
+
+from wallets.models import AssetPrice, Deposit, MarketAsset, MarketAssetTransaction, TreasuryBondsTransaction
+from wallets.services import wallet_performance
+
+from wallets.tests.test_fixture import test_user, test_countries, test_currencies, authenticated_client, api_client, api_url, valuation_cache
+from wallets.tests.wallet.test_fixture import test_wallets
+from wallets.tests.account.test_fixture import test_accounts, test_account_types, test_account_institution_types, test_institution
+from wallets.tests.asset.test_fixture import test_asset_types, test_exchange_marketes, test_market_shares, test_treasury_bonds
+
+
+def market_transaction(test_user, test_wallets, test_accounts, test_currencies, test_market_shares, transaction_type, amount, price, commission):
+
+    return MarketAssetTransaction.objects.create(
+        user=test_user[0],
+        transaction_type=transaction_type,
+        account=test_accounts[0],
+        wallet=test_wallets[0],
+        asset=test_market_shares[0],
+        amount=amount,
+        price=price,
+        account_currency=test_currencies[0],
+        currency_price=1,
+        commission=commission,
+        transaction_date=timezone.now()
+    )
+
+
+@pytest.fixture
+def traded_wallet(test_user, test_wallets, test_accounts, test_currencies, test_market_shares):
+
+    Deposit.objects.create(wallet=test_wallets[0], account=test_accounts[0], user=test_user[0], amount=2000, currency=test_currencies[0], deposited_at=timezone.now())
+
+    market_transaction(test_user, test_wallets, test_accounts, test_currencies, test_market_shares, 'B', 10, 100, 5)
+    market_transaction(test_user, test_wallets, test_accounts, test_currencies, test_market_shares, 'S', 4, 120, 2)
+
+    AssetPrice.objects.create(asset=test_market_shares[0], price=130, date=timezone.now().date())
+
+    return test_wallets[0]
+
+
+@pytest.mark.django_db
+def test_wallet_performance_owner(authenticated_client, traded_wallet):
+
+    response = authenticated_client.get(api_url(f'wallets/{traded_wallet.id}/performance/'))
+
+    assert response.status_code == 200
+    assert response.data['wallet'] == traded_wallet.id
+    assert response.data['currencies'] == [{
+        'currency': 'PLN',
+        'net_deposits': '2000.00',
+        'fees': '7.00',
+        'realized': '80.00',
+        'unrealized': '180.00',
+        'holdings_value': '780.00'
+    }]
+
+
+@pytest.mark.django_db
+def test_wallet_performance_not_owner(api_client, test_user, traded_wallet):
+
+    api_client.force_authenticate(user=test_user[1])
+
+    response = api_client.get(api_url(f'wallets/{traded_wallet.id}/performance/'))
+
+    assert response.status_code == 403
+
+
+@pytest.mark.django_db
+def test_wallet_performance_not_existing_wallet(authenticated_client):
+
+    response = authenticated_client.get(api_url('wallets/999/performance/'))
+
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_wallet_performance_is_cached_until_wallet_changes(valuation_cache, traded_wallet, test_user, test_accounts, test_currencies, django_assert_num_queries):
+
+    wallet_performance(traded_wallet)
+
+    with django_assert_num_queries(0):
+        report = wallet_performance(traded_wallet)
+
+    assert report[0]['net_deposits'] == Decimal('2000')
+
+    Deposit.objects.create(wallet=traded_wallet, account=test_accounts[0], user=test_user[0], amount=500, currency=test_currencies[0], deposited_at=timezone.now())
+
+    assert wallet_performance(traded_wallet)[0]['net_deposits'] == Decimal('2500')
+
+
+@pytest.mark.django_db
+def test_wallet_performance_follows_price_changes(valuation_cache, traded_wallet, test_market_shares):
+
+    assert wallet_performance(traded_wallet)[0]['holdings_value'] == Decimal('780')
+
+    # A corrected price written in bulk, as by an import
+    AssetPrice.objects.filter(asset=test_market_shares[0]).update(price=150)
+    MarketAsset.objects.filter(pk=test_market_shares[0].pk).refresh_latest_prices()
+
+    report = wallet_performance(traded_wallet)[0]
+    assert report['holdings_value'] == Decimal('900')
+    assert report['unrealized'] == Decimal('300')
+
+
+@pytest.mark.django_db
+def test_wallet_performance_realizes_bonds_at_their_buy_price(test_user, test_wallets, test_accounts, test_currencies, test_treasury_bonds):
+
+    Deposit.objects.create(wallet=test_wallets[0], account=test_accounts[0], user=test_user[0], amount=1000, currency=test_currencies[0], deposited_at=timezone.now())
+
+    # Bought below the nominal value of 100
+    for transaction_type, price in [('B', 90), ('S', 95)]:
+        TreasuryBondsTransaction.objects.create(
+            user=test_user[0],
+            transaction_type=transaction_type,
+            account=test_accounts[0],
+            wallet=test_wallets[0],
+            bond=test_treasury_bonds[0],
+            amount=2,
+            price=price,
+            account_currency=test_currencies[0],
+            currency_price=1,
+            commission=0,
+            transaction_date=timezone.now()
+        )
+
+    assert wallet_performance(test_wallets[0])[0]['realized'] == Decimal('10')
@@ -0,0 +1,126 @@
+import pytest
+
+from decimal import Decimal
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from wallets.models import AssetPrice, Currency, CurrencyPrice, MarketAsset, UserAsset
+
+from wallets.tests.test_fixture import test_user, test_countries, test_currencies, authenticated_client, api_client, api_url, valuation_cache
+from wallets.tests.wallet.test_fixture import test_wallets
+from wallets.tests.account.test_fixture import test_accounts, test_account_types, test_account_institution_types, test_institution
+from wallets.tests.asset.test_fixture import test_asset_types, test_exchange_marketes, test_market_shares
+
+
+@pytest.fixture
+def multi_currency_wallet(test_user, test_wallets, test_accounts, test_currencies, test_market_shares):
+    """
+    A wallet holding a PLN share on a PLN account and a USD share on a USD account, with
+    1 USD = 4 PLN and 1 EUR = 4.5 PLN
+    """
+
+    test_accounts[0].currencies.add(test_currencies[1])
+
+    MarketAsset.objects.filter(pk=test_market_shares[1].pk).update(price_currency=test_currencies[1])
+    CurrencyPrice.objects.create(currency=test_currencies[1], price=Decimal('4'))
+    CurrencyPrice.objects.create(currency=test_currencies[2], price=Decimal('4.5'))
+
+    for asset, currency, amount, price in [(test_market_shares[0], test_currencies[0], 10, 90), (test_market_shares[1], test_currencies[1], 5, 45)]:
+        UserAsset.objects.create(
+            user=test_user[0], wallet=test_wallets[0], account=test_accounts[0], asset=asset,
+            amount=amount, price=price, account_currency=currency, currency_price=1
+        )
+        AssetPrice.objects.create(asset=asset, price=price, date=timezone.now().date())
+
+    return test_wallets[0]
+
+
+@pytest.mark.django_db
+def test_wallet_value_is_reported_in_the_requested_currency(authenticated_client, multi_currency_wallet):
+
+    response = authenticated_client.get(api_url(f'wallets/{multi_currency_wallet.id}/?currency=EUR'))
+
+    assert response.status_code == 200
+    # 900 PLN and 225 USD
+    assert response.data['current_value'] == '400.00'
+    assert response.data['currency'] == 'EUR'
+
+    response = authenticated_client.get(api_url(f'wallets/{multi_currency_wallet.id}/?currency=PLN'))
+    assert response.data['current_value'] == '1800.00'
+
+    response = authenticated_client.get(api_url(f'wallets/{multi_currency_wallet.id}/'))
+    assert 'currency' not in response.data
+
+
+@pytest.mark.django_db
+def test_account_value_is_reported_in_the_requested_currency(authenticated_client, multi_currency_wallet, test_accounts):
+
+    test_accounts[0].balances.filter(currency__code='USD').update(balance=100)
+
+    response = authenticated_client.get(api_url(f'accounts/{test_accounts[0].id}/?currency=USD'))
+
+    assert response.status_code == 200
+    assert response.data['current_value'] == '450.00'
+    assert response.data['cash_balance'] == '100.00'
+    assert response.data['currency'] == 'USD'
+
+
+@pytest.mark.django_db
+def test_holdings_are_converted_without_queries_per_row(valuation_cache, authenticated_client, multi_currency_wallet, django_assert_num_queries):
+
+    url = api_url(f'wallets/{multi_currency_wallet.id}/market_assets/')
+
+    # The first conversion loads the cross rates, later ones take them from the cache
+    authenticated_client.get(url + '?reporting_currency=EUR')
+
+    with CaptureQueriesContext(connection) as plain:
+        authenticated_client.get(url)
+
+    with django_assert_num_queries(len(plain)):
+        response = authenticated_client.get(url + '?reporting_currency=EUR')
+
+    assert [(row['market_value'], row['value'], row['currency']) for row in response.data['results']] == [
+        ('900.00', '200.00', 'EUR'),
+        ('225.00', '200.00', 'EUR'),
+    ]
+
+
+@pytest.mark.django_db
+def test_unknown_or_unpriced_reporting_currency_is_rejected(authenticated_client, multi_currency_wallet):
+
+    response = authenticated_client.get(api_url(f'wallets/{multi_currency_wallet.id}/?currency=XYZ'))
+    assert response.status_code == 400
+    assert 'currency' in response.data
+
+    response = authenticated_client.get(api_url(f'wallets/{multi_currency_wallet.id}/?currency=GBP'))
+    assert response.status_code == 400
+    assert response.data['currency'] == 'There is no exchange rate from PLN to GBP.'
+
+
+@pytest.mark.django_db
+def test_wallet_value_is_in_the_base_currency_by_default(authenticated_client, multi_currency_wallet):
+
+    response = authenticated_client.get(api_url(f'wallets/{multi_currency_wallet.id}/'))
+
+    assert response.status_code == 200
+    # 900 PLN and 225 USD
+    assert response.data['current_value'] == '1800.00'
+    assert 'current_value_error' not in response.data
+
+
+@pytest.mark.django_db
+def test_wallet_value_without_a_rate_is_flagged(authenticated_client, multi_currency_wallet, test_currencies):
+
+    Currency.objects.filter(pk=test_currencies[1].pk).update(last_price=None)
+
+    response = authenticated_client.get(api_url(f'wallets/{multi_currency_wallet.id}/'))
+
+    assert response.status_code == 200
+    assert response.data['current_value'] is None
+    assert response.data['current_value_error'] == 'There is no exchange rate from USD to PLN.'
+
+    response = authenticated_client.get(api_url(f'wallets/{multi_currency_wallet.id}/?currency=EUR'))
+
+    assert response.status_code == 400
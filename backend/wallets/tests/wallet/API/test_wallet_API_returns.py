@@ -0,0 +1,80 @@
+import pytest
+
+from django.utils import timezone
+
+from wallets.models import AssetPrice, Deposit, MarketAssetTransaction
+
+from wallets.tests.test_fixture import test_user, test_countries, test_currencies, authenticated_client, api_client, api_url, valuation_cache
+from wallets.tests.wallet.test_fixture import test_wallets
+from wallets.tests.account.test_fixture import test_accounts, test_account_types, test_account_institution_types, test_institution
+from wallets.tests.asset.test_fixture import test_asset_types, test_exchange_marketes, test_market_shares
+
+
+@pytest.fixture
+def invested_wallet(valuation_cache, test_user, test_wallets, test_accounts, test_currencies, test_market_shares):
+
+    year_ago = timezone.now() - timezone.timedelta(days=365)
+
+    Deposit.objects.create(wallet=test_wallets[0], account=test_accounts[0], user=test_user[0], amount=1000, currency=test_currencies[0], deposited_at=year_ago)
+
+    MarketAssetTransaction.objects.create(
+        user=test_user[0], transaction_type='B', account=test_accounts[0], wallet=test_wallets[0], asset=test_market_shares[0],
+        amount=10, price=100, account_currency=test_currencies[0], currency_price=1, commission=0, transaction_date=year_ago
+    )
+
+    AssetPrice.objects.create(asset=test_market_shares[0], price=110, date=timezone.localdate())
+
+    return test_wallets[0]
+
+
+@pytest.mark.django_db
+def test_wallet_returns_owner(authenticated_client, invested_wallet):
+
+    response = authenticated_client.get(api_url(f'wallets/{invested_wallet.id}/returns/'))
+
+    assert response.status_code == 200
+    assert response.data == {
+        'wallet': invested_wallet.id,
+        'currency': 'PLN',
+        'net_deposits': '1000.00',
+        'value': '1100.00',
+        'xirr': '0.100000',
+        'twr': None
+    }
+
+
+@pytest.mark.django_db
+def test_wallet_returns_not_owner(api_client, test_user, invested_wallet):
+
+    api_client.force_authenticate(user=test_user[3])
+
+    response = api_client.get(api_url(f'wallets/{invested_wallet.id}/returns/'))
+
+    assert response.status_code == 403
+
+
+@pytest.mark.django_db
+def test_wallet_returns_unknown_currency(authenticated_client, invested_wallet):
+
+    response = authenticated_client.get(api_url(f'wallets/{invested_wallet.id}/returns/'), {'currency': 'XXX'})
+
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_account_returns_owner(authenticated_client, invested_wallet, test_accounts):
+
+    response = authenticated_client.get(api_url(f'accounts/{test_accounts[0].id}/returns/'))
+
+    assert response.status_code == 200
+    assert response.data['account'] == test_accounts[0].id
+    assert response.data['xirr'] == '0.100000'
+    assert response.data['twr'] is None
+
+
+@pytest.mark.django_db
+def test_account_returns_does_not_exist(authenticated_client):
+
+    response = authenticated_client.get(api_url('accounts/9999/returns/'))
+
+    assert response.status_code == 404
@@ -0,0 +1,56 @@
+import pytest
+
+from wallets.access import access_scope, account_has_currency, can_access_account, can_access_wallet, wallet_has_account
+
+from wallets.tests.test_fixture import test_user, test_countries, test_currencies
+from wallets.tests.wallet.test_fixture import test_wallets
+from wallets.tests.account.test_fixture import test_accounts, test_account_types, test_account_institution_types, test_institution
+
+
+@pytest.mark.django_db
+def test_access_checks_are_loaded_once_per_scope(test_user, test_wallets, test_accounts, test_currencies, django_assert_num_queries):
+
+    co_owner = test_user[1]
+
+    with access_scope():
+        with django_assert_num_queries(4):
+            for _ in range(3):
+                assert can_access_account(co_owner, test_accounts[0])
+                assert not can_access_wallet(co_owner, test_wallets[0])
+                assert wallet_has_account(co_owner, test_wallets[1], test_accounts[1])
+                assert account_has_currency(co_owner, test_accounts[0], test_currencies[0])
+                assert not account_has_currency(co_owner, test_accounts[0], test_currencies[1])
+
+
+@pytest.mark.django_db
+def test_owner_checks_do_not_query(test_user, test_wallets, test_accounts, django_assert_num_queries):
+
+    with access_scope():
+        with django_assert_num_queries(0):
+            assert can_access_wallet(test_user[0], test_wallets[0])
+            assert can_access_account(test_user[0], test_accounts[0])
+
+
+@pytest.mark.django_db
+def test_access_scope_sees_membership_changes(test_user, test_wallets, test_accounts, test_currencies):
+
+    co_owner = test_user[3]
+
+    with access_scope():
+        assert not can_access_wallet(co_owner, test_wallets[0])
+        assert not account_has_currency(test_user[0], test_accounts[0], test_currencies[1])
+
+        test_wallets[0].co_owners.add(co_owner)
+        test_accounts[0].currencies.add(test_currencies[1])
+
+        assert can_access_wallet(co_owner, test_wallets[0])
+        assert account_has_currency(test_user[0], test_accounts[0], test_currencies[1])
+
+
+@pytest.mark.django_db
+def test_access_checks_outside_of_a_scope(test_user, test_wallets, test_accounts, test_currencies):
+
+    assert can_access_account(test_user[1], test_accounts[0])
+    assert not can_access_wallet(test_user[1], test_wallets[0])
+    assert wallet_has_account(test_user[3], test_wallets[0], test_accounts[0])
+    assert not account_has_currency(test_user[3], test_accounts[0], test_currencies[1])
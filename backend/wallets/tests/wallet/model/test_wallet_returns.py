@@ -0,0 +1,195 @@
+import pytest
+
+import csv
+import io
+import numpy as np
+
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from wallets.models import AssetPrice, CurrencyPrice, Deposit, MarketAssetTransaction, Withdrawal
+from wallets.services import build_wallet_snapshots, compute_returns, time_weighted_returns, wallet_returns, account_returns, xirr
+
+from wallets.tests.test_fixture import test_user, test_countries, test_currencies, valuation_cache
+from wallets.tests.wallet.test_fixture import test_wallets
+from wallets.tests.account.test_fixture import test_accounts, test_account_types, test_account_institution_types, test_institution
+from wallets.tests.asset.test_fixture import test_asset_types, test_exchange_marketes, test_market_shares
+
+
+def days_ago(days):
+    return timezone.now() - timezone.timedelta(days=days)
+
+
+@pytest.fixture
+def invested_wallet(valuation_cache, test_user, test_wallets, test_accounts, test_currencies, test_market_shares):
+    """
+    A wallet which bought shares for its whole deposit of 1000 PLN a year ago, now worth 1100 PLN
+    """
+
+    Deposit.objects.create(wallet=test_wallets[0], account=test_accounts[0], user=test_user[0], amount=1000, currency=test_currencies[0], deposited_at=days_ago(365))
+
+    MarketAssetTransaction.objects.create(
+        user=test_user[0], transaction_type='B', account=test_accounts[0], wallet=test_wallets[0], asset=test_market_shares[0],
+        amount=10, price=100, account_currency=test_currencies[0], currency_price=1, commission=0, transaction_date=days_ago(365)
+    )
+
+    AssetPrice.objects.create(asset=test_market_shares[0], price=110, date=timezone.localdate())
+
+    return test_wallets[0]
+
+
+def test_xirr_solves_many_series_at_once():
+
+    # The first series is the usual spreadsheet XIRR example
+    days = np.array([0, 60, 303, 411, 456])
+    amounts = np.array([
+        [-10000, 2750, 4250, 3250, 2750],
+        [-1000, 1100, 0, 0, 0],
+        [-100, 10000, 0, 0, 0],
+        [-1000, -500, 0, 0, 0],
+    ])
+    years = np.array([days / 365, [0, 1, 0, 0, 0], [0, 1, 0, 0, 0], [0, 1, 0, 0, 0]])
+
+    rates = xirr(amounts, years)
+
+    assert rates[0] == pytest.approx(0.373362535, abs=1e-8)
+    assert rates[1] == pytest.approx(0.1)
+    assert rates[2] == pytest.approx(99)
+    assert np.isnan(rates[3])
+
+
+def test_xirr_handles_losses_and_rates_newton_overshoots():
+
+    years = np.array([[0, 0.5, 1], [0, 0.1, 0.2]])
+    amounts = np.array([[-1000, -1000, 100], [-1, 0, 30]])
+
+    rates = xirr(amounts, years)
+
+    for row in range(2):
+        discounted = (amounts[row] * (1 + rates[row]) ** -years[row]).sum()
+        assert discounted == pytest.approx(0, abs=1e-5)
+    assert rates[0] == pytest.approx(-0.991608, abs=1e-6)
+    assert rates[1] == pytest.approx(30 ** 5 - 1)
+
+
+def test_time_weighted_returns_ignore_the_flows():
+
+    values = np.array([[100, 110, 220], [50, 25, np.nan]])
+    flows = np.array([[100, 0, 100], [50, 0, 0]])
+
+    returns = time_weighted_returns(values, flows)
+
+    assert returns[0] == pytest.approx(1.1 * 220 / 210 - 1)
+    assert returns[1] == pytest.approx(-0.5)
+
+
+@pytest.mark.django_db
+def test_wallet_returns_close_with_the_current_value(invested_wallet):
+
+    returns = wallet_returns(invested_wallet.id)
+
+    assert returns.currency == 'PLN'
+    assert returns.net_deposits == Decimal('1000.00')
+    assert returns.value == Decimal('1100.00')
+    assert returns.xirr == Decimal('0.100000')
+    assert returns.twr is None
+
+    build_wallet_snapshots(invested_wallet)
+
+    assert wallet_returns(invested_wallet.id).twr == Decimal('0.100000')
+
+
+@pytest.mark.django_db
+def test_wallet_returns_convert_flows_on_their_day(test_user, test_wallets, test_accounts, test_currencies):
+
+    test_accounts[0].currencies.add(test_currencies[1])
+    CurrencyPrice.objects.create(currency=test_currencies[1], price=4, date=days_ago(400))
+    CurrencyPrice.objects.create(currency=test_currencies[1], price=5, date=timezone.now())
+
+    Deposit.objects.create(wallet=test_wallets[0], account=test_accounts[0], user=test_user[0], amount=100, currency=test_currencies[1], deposited_at=days_ago(365))
+
+    returns = wallet_returns(test_wallets[0].id)
+
+    assert returns.net_deposits == Decimal('400.00')
+    assert returns.value == Decimal('500.00')
+    assert returns.xirr == Decimal('0.250000')
+
+    assert wallet_returns(test_wallets[0].id, 'USD').xirr == Decimal('0.000000')
+
+
+@pytest.mark.django_db
+def test_returns_without_a_rate_are_unknown(test_user, test_wallets, test_accounts, test_currencies):
+
+    test_accounts[0].currencies.add(test_currencies[1])
+    Deposit.objects.create(wallet=test_wallets[0], account=test_accounts[0], user=test_user[0], amount=100, currency=test_currencies[1], deposited_at=days_ago(30))
+
+    returns = wallet_returns(test_wallets[0].id)
+
+    assert returns.xirr is None
+    assert returns.value is None
+
+
+@pytest.mark.django_db
+def test_returns_of_many_wallets_take_a_fixed_number_of_queries(invested_wallet, test_user, test_wallets, test_accounts, test_currencies, test_market_shares):
+
+    for wallet, account in zip(test_wallets[1:4], test_accounts[1:4]):
+        Deposit.objects.create(wallet=wallet, account=account, user=wallet.owner, amount=500, currency=test_currencies[0], deposited_at=days_ago(100))
+        Withdrawal.objects.create(wallet=wallet, account=account, user=wallet.owner, amount=100, currency=test_currencies[0], withdrawn_at=days_ago(50))
+        MarketAssetTransaction.objects.create(
+            user=wallet.owner, transaction_type='B', account=account, wallet=wallet, asset=test_market_shares[0],
+            amount=1, price=100, account_currency=test_currencies[0], currency_price=1, commission=0, transaction_date=days_ago(100)
+        )
+        build_wallet_snapshots(wallet)
+
+    ids = [wallet.id for wallet in test_wallets[:4]]
+
+    with CaptureQueriesContext(connection) as single:
+        compute_returns('wallet', ids[:1])
+
+    with CaptureQueriesContext(connection) as many:
+        returns = compute_returns('wallet', ids)
+
+    # The flows, the cash, the lots, the rates and the snapshots are loaded once for all wallets
+    assert len(many) == len(single)
+
+    assert returns[invested_wallet.id].xirr == Decimal('0.100000')
+    assert returns[test_wallets[1].id].net_deposits == Decimal('400.00')
+    assert returns[test_wallets[1].id].value == Decimal('410.00')
+
+
+@pytest.mark.django_db
+def test_time_weighted_return_is_computed_in_the_reporting_currency(test_user, test_wallets, test_accounts, test_currencies):
+
+    # 1000 PLN held while the USD fell from 5 to 4 PLN: no return in PLN, 25% in USD
+    CurrencyPrice.objects.create(currency=test_currencies[1], price=5, date=days_ago(30))
+    CurrencyPrice.objects.create(currency=test_currencies[1], price=4, date=days_ago(10))
+
+    Deposit.objects.create(wallet=test_wallets[0], account=test_accounts[0], user=test_user[0], amount=1000, currency=test_currencies[0], deposited_at=days_ago(20))
+    build_wallet_snapshots(test_wallets[0])
+
+    assert wallet_returns(test_wallets[0].id).twr == Decimal('0.000000')
+    assert wallet_returns(test_wallets[0].id, 'USD').twr == Decimal('0.250000')
+
+
+@pytest.mark.django_db
+def test_account_returns(invested_wallet, test_accounts):
+
+    returns = account_returns(test_accounts[0].id)
+
+    assert returns.xirr == Decimal('0.100000')
+    assert returns.twr is None
+
+
+@pytest.mark.django_db
+def test_compute_returns_command_writes_csv(invested_wallet):
+
+    output = io.StringIO()
+    call_command('compute_returns', '--wallet', str(invested_wallet.id), '--workers', '1', stdout=output, stderr=io.StringIO())
+
+    rows = list(csv.DictReader(io.StringIO(output.getvalue())))
+
+    assert rows == [{'wallet': str(invested_wallet.id), 'currency': 'PLN', 'net_deposits': '1000.00', 'value': '1100.00', 'xirr': '0.100000', 'twr': ''}]
@@ -0,0 +1,166 @@
+import pytest
+
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.utils import timezone
+
+from wallets.models import AssetPrice, CurrencyPrice, Deposit, MarketAssetTransaction, WalletDailySnapshot
+from wallets.services import build_wallet_snapshots, downsample_snapshots, MissingExchangeRate
+
+from wallets.tests.test_fixture import test_user, test_countries, test_currencies
+from wallets.tests.wallet.test_fixture import test_wallets
+from wallets.tests.account.test_fixture import test_accounts, test_account_types, test_account_institution_types, test_institution
+from wallets.tests.asset.test_fixture import test_asset_types, test_exchange_marketes, test_market_shares
+
+
+def days_ago(days):
+    return timezone.now() - timezone.timedelta(days=days)
+
+
+@pytest.fixture
+def wallet_with_history(test_user, test_wallets, test_accounts, test_currencies, test_market_shares):
+
+    Deposit.objects.create(wallet=test_wallets[0], account=test_accounts[0], user=test_user[0], amount=1000, currency=test_currencies[0], deposited_at=days_ago(10))
+
+    MarketAssetTransaction.objects.create(
+        user=test_user[0],
+        transaction_type='B',
+        account=test_accounts[0],
+        wallet=test_wallets[0],
+        asset=test_market_shares[0],
+        amount=5,
+        price=100,
+        account_currency=test_currencies[0],
+        currency_price=1,
+        commission=0,
+        transaction_date=days_ago(8)
+    )
+
+    AssetPrice.objects.create(asset=test_market_shares[0], price=110, date=timezone.localdate() - timezone.timedelta(days=5))
+    AssetPrice.objects.create(asset=test_market_shares[0], price=120, date=timezone.localdate() - timezone.timedelta(days=2))
+
+    return test_wallets[0]
+
+
+@pytest.mark.django_db
+def test_build_wallet_snapshots_replays_history(wallet_with_history):
+
+    assert build_wallet_snapshots(wallet_with_history) == 11
+
+    snapshots = {snapshot.date: snapshot for snapshot in wallet_with_history.snapshots.all()}
+
+    first = snapshots[timezone.localdate() - timezone.timedelta(days=10)]
+    assert first.value == Decimal('1000')
+    assert first.assets_value == 0
+    assert first.cash == {'PLN': '1000.00'}
+
+    after_buy = snapshots[timezone.localdate() - timezone.timedelta(days=8)]
+    assert after_buy.assets_value == Decimal('500')
+    assert after_buy.cash == {'PLN': '500.00'}
+    assert after_buy.value == Decimal('1000')
+
+    assert snapshots[timezone.localdate() - timezone.timedelta(days=5)].value == Decimal('1050')
+    assert snapshots[timezone.localdate()].assets_value == Decimal('600')
+    assert snapshots[timezone.localdate()].value == Decimal('1100')
+
+
+@pytest.mark.django_db
+def test_build_wallet_snapshots_is_incremental(wallet_with_history, django_assert_max_num_queries):
+
+    build_wallet_snapshots(wallet_with_history, until=timezone.localdate() - timezone.timedelta(days=3))
+
+    assert wallet_with_history.snapshots.count() == 8
+    assert build_wallet_snapshots(wallet_with_history, until=timezone.localdate() - timezone.timedelta(days=3)) == 0
+
+    with django_assert_max_num_queries(15):
+        assert build_wallet_snapshots(wallet_with_history) == 3
+
+    assert wallet_with_history.snapshots.count() == 11
+
+
+@pytest.mark.django_db
+def test_new_price_invalidates_later_snapshots(wallet_with_history, test_market_shares):
+
+    build_wallet_snapshots(wallet_with_history)
+
+    AssetPrice.objects.create(asset=test_market_shares[0], price=200, date=timezone.localdate() - timezone.timedelta(days=1))
+
+    assert wallet_with_history.snapshots.count() == 9
+    assert build_wallet_snapshots(wallet_with_history) == 2
+    assert wallet_with_history.snapshots.get(date=timezone.localdate()).assets_value == Decimal('1000')
+
+
+@pytest.mark.django_db
+def test_build_wallet_snapshots_command(wallet_with_history):
+
+    call_command('build_wallet_snapshots')
+    call_command('build_wallet_snapshots', '--wallet', str(wallet_with_history.id), '--since', str(timezone.localdate() - timezone.timedelta(days=4)))
+
+    assert WalletDailySnapshot.objects.count() == 11
+
+
+def test_downsample_snapshots():
+
+    dates = [timezone.datetime(2024, 1, day).date() for day in range(1, 32)] + [timezone.datetime(2024, 2, 1).date()]
+    snapshots = [WalletDailySnapshot(date=date) for date in dates]
+
+    assert [snapshot.date.day for snapshot in downsample_snapshots(snapshots, 'month')] == [31, 1]
+    assert len(downsample_snapshots(snapshots, 'week')) == 5
+    assert len(downsample_snapshots(snapshots, 'day')) == 32
+
+
+@pytest.mark.django_db
+def test_snapshots_convert_with_the_exchange_rates_of_the_day(test_user, test_wallets, test_accounts, test_currencies, test_market_shares):
+
+    # A PLN share bought on a USD account, USD rates recorded on two past days
+    test_accounts[0].currencies.add(test_currencies[1])
+    Deposit.objects.create(wallet=test_wallets[0], account=test_accounts[0], user=test_user[0], amount=1000, currency=test_currencies[1], deposited_at=days_ago(6))
+
+    CurrencyPrice.objects.create(currency=test_currencies[1], price=4, date=days_ago(6))
+    CurrencyPrice.objects.create(currency=test_currencies[1], price=5, date=days_ago(2))
+
+    MarketAssetTransaction.objects.create(
+        user=test_user[0], transaction_type='B', account=test_accounts[0], wallet=test_wallets[0], asset=test_market_shares[0],
+        amount=10, price=100, account_currency=test_currencies[1], currency_price=Decimal('0.25'), commission=0, transaction_date=days_ago(4)
+    )
+
+    build_wallet_snapshots(test_wallets[0])
+
+    snapshots = {snapshot.date: snapshot for snapshot in test_wallets[0].snapshots.all()}
+
+    # The share is worth 1000 PLN, the 750 USD left are converted with the rate of the day
+    after_buy = snapshots[timezone.localdate() - timezone.timedelta(days=4)]
+    assert after_buy.assets_value == Decimal('1000')
+    assert after_buy.cash == {'USD': '750.00'}
+    assert after_buy.value == Decimal('4000')
+
+    assert snapshots[timezone.localdate() - timezone.timedelta(days=2)].value == Decimal('4750')
+
+
+@pytest.mark.django_db
+def test_snapshot_value_sums_currencies_in_the_base_currency(test_user, test_wallets, test_accounts, test_currencies):
+
+    test_accounts[0].currencies.add(test_currencies[1])
+    CurrencyPrice.objects.create(currency=test_currencies[1], price=4, date=days_ago(3))
+
+    for currency in test_currencies[:2]:
+        Deposit.objects.create(wallet=test_wallets[0], account=test_accounts[0], user=test_user[0], amount=1000, currency=currency, deposited_at=days_ago(1))
+
+    build_wallet_snapshots(test_wallets[0])
+
+    snapshot = test_wallets[0].snapshots.get(date=timezone.localdate())
+    assert snapshot.value == Decimal('5000')
+    assert snapshot.cash == {'PLN': '1000.00', 'USD': '1000.00'}
+
+
+@pytest.mark.django_db
+def test_snapshots_are_not_built_without_a_rate(test_user, test_wallets, test_accounts, test_currencies):
+
+    test_accounts[0].currencies.add(test_currencies[1])
+    Deposit.objects.create(wallet=test_wallets[0], account=test_accounts[0], user=test_user[0], amount=1000, currency=test_currencies[1], deposited_at=days_ago(1))
+
+    with pytest.raises(MissingExchangeRate):
+        build_wallet_snapshots(test_wallets[0])
+
+    assert not test_wallets[0].snapshots.exists()
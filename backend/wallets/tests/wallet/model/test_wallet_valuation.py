@@ -0,0 +1,185 @@
+import pytest
+
+from decimal import Decimal
+from dateutil.relativedelta import relativedelta
+
+from django.utils import timezone
+
+from wallets.models import AssetPrice, CurrencyPrice, MarketAsset, UserAsset, UserTreasuryBonds
+from wallets.services import value_wallet, value_account, wallet_valuation, account_valuation
+
+from wallets.tests.test_fixture import test_user, test_countries, test_currencies, valuation_cache
+from wallets.tests.wallet.test_fixture import test_wallets
+from wallets.tests.account.test_fixture import test_accounts, test_account_types, test_account_institution_types, test_institution
+from wallets.tests.asset.test_fixture import test_asset_types, test_exchange_marketes, test_market_shares, test_treasury_bonds
+
+
+def create_lot(user, wallet, account, asset, amount, price, account_currency, currency_price=1):
+
+    return UserAsset.objects.create(
+        user=user,
+        wallet=wallet,
+        account=account,
+        asset=asset,
+        amount=amount,
+        price=price,
+        account_currency=account_currency,
+        currency_price=currency_price
+    )
+
+
+@pytest.mark.django_db
+def test_wallet_current_value_uses_latest_prices(test_user, test_wallets, test_accounts, test_currencies, test_market_shares):
+
+    create_lot(test_user[0], test_wallets[0], test_accounts[0], test_market_shares[0], 10, 100, test_currencies[0])
+    create_lot(test_user[0], test_wallets[0], test_accounts[0], test_market_shares[0], 5, 120, test_currencies[0])
+    create_lot(test_user[0], test_wallets[0], test_accounts[0], test_market_shares[1], 2, 50, test_currencies[0])
+
+    AssetPrice.objects.create(asset=test_market_shares[0], price=110, date=timezone.now().date() - timezone.timedelta(days=1))
+    AssetPrice.objects.create(asset=test_market_shares[0], price=150, date=timezone.now().date())
+
+    valuation = value_wallet(test_wallets[0])
+
+    assert valuation.assets[test_market_shares[0].id] == Decimal('2250')
+    assert valuation.assets[test_market_shares[1].id] == Decimal('100')
+    assert valuation.total_assets == Decimal('2350')
+    assert test_wallets[0].current_value == Decimal('2350.00')
+    assert test_accounts[0].current_value == Decimal('2350')
+
+
+@pytest.mark.django_db
+def test_wallet_current_value_converts_foreign_currency(test_user, test_wallets, test_accounts, test_currencies, test_market_shares):
+
+    # A PLN asset held on a USD account, bought at 0.25 USD per PLN
+    lot = create_lot(test_user[0], test_wallets[0], test_accounts[0], test_market_shares[0], 10, 100, test_currencies[1], currency_price=Decimal('0.25'))
+
+    assert value_wallet(test_wallets[0]).lots[lot.id] == Decimal('250')
+
+    CurrencyPrice.objects.create(currency=test_currencies[1], price=5)
+
+    assert value_wallet(test_wallets[0]).lots[lot.id] == Decimal('200')
+
+
+@pytest.mark.django_db
+def test_account_totals_are_in_the_base_currency(test_user, test_wallets, test_accounts, test_currencies, test_market_shares):
+
+    create_lot(test_user[0], test_wallets[0], test_accounts[0], test_market_shares[0], 10, 100, test_currencies[0])
+    create_lot(test_user[0], test_wallets[0], test_accounts[0], test_market_shares[0], 10, 100, test_currencies[1], currency_price=Decimal('0.25'))
+
+    CurrencyPrice.objects.create(currency=test_currencies[1], price=5)
+
+    # 1000 PLN and 200 USD worth 1000 PLN
+    assert value_account(test_accounts[0]).values_by_currency == {'PLN': Decimal('1000'), 'USD': Decimal('200')}
+    assert test_accounts[0].current_value == Decimal('2000.00')
+    assert test_wallets[0].current_value == Decimal('2000.00')
+    assert test_wallets[0].wallet_proportion['assets'] == (1, Decimal('2000.00'))
+
+
+@pytest.mark.django_db
+def test_wallet_proportion_splits_assets_and_bonds(test_user, test_wallets, test_accounts, test_currencies, test_market_shares, test_treasury_bonds):
+
+    create_lot(test_user[0], test_wallets[0], test_accounts[0], test_market_shares[0], 3, 100, test_currencies[0])
+
+    UserTreasuryBonds.objects.create(
+        user=test_user[0],
+        wallet=test_wallets[0],
+        account=test_accounts[0],
+        bond=test_treasury_bonds[0],
+        amount=1,
+        issue_date=timezone.localdate() - relativedelta(years=1),
+        maturity_date=timezone.localdate() + relativedelta(years=9)
+    )
+
+    proportion = test_wallets[0].wallet_proportion
+
+    # The first year interest of 0.5% is capitalized
+    assert proportion['assets'] == (Decimal('300') / Decimal('400.50'), Decimal('300'))
+    assert proportion['bonds'] == (Decimal('100.50') / Decimal('400.50'), Decimal('100.50'))
+
+
+@pytest.mark.django_db
+def test_wallet_valuation_skips_inactive_lots(test_user, test_wallets, test_accounts, test_currencies, test_market_shares):
+
+    lot = create_lot(test_user[0], test_wallets[0], test_accounts[0], test_market_shares[0], 10, 100, test_currencies[0])
+    lot.active = False
+    lot.save()
+
+    assert value_account(test_accounts[0]).total == 0
+    assert test_wallets[0].current_value == 0
+
+
+@pytest.mark.django_db
+def test_wallet_valuation_query_count_does_not_depend_on_lots(test_user, test_wallets, test_accounts, test_currencies, test_market_shares, django_assert_num_queries):
+
+    for asset in test_market_shares:
+        AssetPrice.objects.create(asset=asset, price=10, date=timezone.now().date())
+        for _ in range(5):
+            create_lot(test_user[0], test_wallets[0], test_accounts[0], asset, 1, 1, test_currencies[1])
+
+    with django_assert_num_queries(2):
+        valuation = value_wallet(test_wallets[0])
+
+    assert len(valuation.lots) == 25
+    assert valuation.values_by_currency == {'USD': Decimal('250')}
+
+
+@pytest.mark.django_db
+def test_cached_wallet_valuation_is_served_until_an_input_changes(valuation_cache, test_user, test_wallets, test_accounts, test_currencies, test_market_shares, django_assert_num_queries):
+
+    lot = create_lot(test_user[0], test_wallets[0], test_accounts[0], test_market_shares[0], 10, 100, test_currencies[0])
+
+    assert wallet_valuation(test_wallets[0].id).total == Decimal('1000')
+    assert test_wallets[0].current_value == Decimal('1000.00')
+
+    with django_assert_num_queries(0):
+        assert wallet_valuation(test_wallets[0].id).total == Decimal('1000')
+        assert test_wallets[0].current_value == Decimal('1000.00')
+
+    AssetPrice.objects.create(asset=test_market_shares[0], price=120, date=timezone.now().date())
+    assert wallet_valuation(test_wallets[0].id).total == Decimal('1200')
+
+    lot.amount = 5
+    lot.save()
+    assert wallet_valuation(test_wallets[0].id).total == Decimal('600')
+    assert account_valuation(test_accounts[0].id).total == Decimal('600')
+
+
+@pytest.mark.django_db
+def test_cached_wallet_valuation_follows_bulk_price_refreshes(valuation_cache, test_user, test_wallets, test_accounts, test_currencies, test_market_shares):
+
+    create_lot(test_user[0], test_wallets[0], test_accounts[0], test_market_shares[0], 10, 100, test_currencies[1], currency_price=4)
+
+    assert wallet_valuation(test_wallets[0].id).values_by_currency == {'USD': Decimal('4000')}
+
+    AssetPrice.objects.bulk_create([AssetPrice(asset=test_market_shares[0], price=200, date=timezone.now().date())])
+    MarketAsset.objects.filter(pk=test_market_shares[0].pk).refresh_latest_prices()
+
+    assert wallet_valuation(test_wallets[0].id).values_by_currency == {'USD': Decimal('8000')}
+
+
+@pytest.mark.django_db
+def test_cached_wallet_valuation_survives_lost_watermarks(valuation_cache, test_user, test_wallets, test_accounts, test_currencies, test_market_shares):
+
+    create_lot(test_user[0], test_wallets[0], test_accounts[0], test_market_shares[0], 10, 100, test_currencies[0])
+    assert wallet_valuation(test_wallets[0].id).total == Decimal('1000')
+
+    # The watermarks were evicted and the lots changed without signals
+    valuation_cache.delete_many(['valuation-watermark:prices', f'valuation-watermark:wallet:{test_wallets[0].id}'])
+    UserAsset.objects.filter(wallet=test_wallets[0]).update(amount=1)
+
+    assert wallet_valuation(test_wallets[0].id).total == Decimal('100')
+
+
+@pytest.mark.django_db
+def test_wallet_valuation_is_not_cached_without_a_shared_cache(settings, test_user, test_wallets, test_accounts, test_currencies, test_market_shares, django_assert_num_queries):
+
+    settings.VALUATION_CACHE = None
+    create_lot(test_user[0], test_wallets[0], test_accounts[0], test_market_shares[0], 10, 100, test_currencies[0])
+
+    assert wallet_valuation(test_wallets[0].id).total == Decimal('1000')
+
+    # Another process changed the lots, which a cache local to this one would not notice
+    UserAsset.objects.filter(wallet=test_wallets[0]).update(amount=1)
+
+    with django_assert_num_queries(2):
+        assert wallet_valuation(test_wallets[0].id).values_by_currency == {'PLN': Decimal('100')}
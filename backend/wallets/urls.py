@@ -79,21 +79,28 @@ urlpatterns = [
     path('deposits/', deposit_list, name='deposit-list'),
     path('deposits/<int:pk>/', deposit_detail, name='deposit-detail'),
     path('market_transactions/', market_transaction_list, name='market_transaction-list'),
+    path('market_transactions/bulk/', views.MarketAssetTransactionBulkCreate.as_view(), name='market_transaction-bulk'),
     path('market_transactions/<int:pk>/', market_transaction_detail, name='market_transaction-detail'),
     path('treasury_bond_transactions/', treasury_bond_transaction_list, name='treasury_bond_transaction-list'),
     path('treasury_bond_transactions/<int:pk>/', treasury_bond_transaction_detail, name='treasury_bond_transaction-detail'),
     path('withdrawals/', withdrawal_list, name='withdrawal-list'),
     path('withdrawals/<int:pk>/', withdrawal_detail, name='withdrawal-detail'),
+    path('auth/token/', views.AuthTokenView.as_view(), name='auth-token'),
     path('users/', views.UserList.as_view(), name='user-list'),
     path('users/<int:pk>/', views.UserDetail.as_view()),
     path('accounts/<int:account_id>/transactions/', views.ObjectMarketTransactionsList.as_view(), name='account-transactions'),
     path('accounts/<int:account_id>/treasury_bond_transactions/', views.ObjectTreasuryBondsTransactionsList.as_view(), name='account-treasury-bond-transactions'),
     path('accounts/<int:account_id>/market_assets/', views.ObjectUserAssetsList.as_view(), name='account-assets'),
     path('accounts/<int:account_id>/treasury_bonds/', views.ObjectUserTreasuryBondsList.as_view(), name='account-treasury-bonds'),
+    path('accounts/<int:account_id>/returns/', views.AccountReturnsView.as_view(), name='account-returns'),
     path('wallets/<int:wallet_id>/transactions/', views.ObjectMarketTransactionsList.as_view(), name='wallet-transactions'),
     path('wallets/<int:wallet_id>/treasury_bond_transactions/', views.ObjectTreasuryBondsTransactionsList.as_view(), name='wallet-treasury-bond-transactions'),
     path('wallets/<int:wallet_id>/market_assets/', views.ObjectUserAssetsList.as_view(), name='wallet-assets'),
     path('wallets/<int:wallet_id>/treasury_bonds/', views.ObjectUserTreasuryBondsList.as_view(), name='wallet-treasury-bonds'),
+    path('wallets/<int:wallet_id>/history/', views.WalletHistoryList.as_view(), name='wallet-history'),
+    path('wallets/<int:wallet_id>/performance/', views.WalletPerformanceView.as_view(), name='wallet-performance'),
+    path('wallets/<int:wallet_id>/allocation/', views.WalletAllocationView.as_view(), name='wallet-allocation'),
+    path('wallets/<int:wallet_id>/returns/', views.WalletReturnsView.as_view(), name='wallet-returns'),
     path('users/<int:user_id>/transactions/', views.ObjectMarketTransactionsList.as_view(), name='user-transactions'),
     path('users/<int:user_id>/treasury_bond_transactions/', views.ObjectTreasuryBondsTransactionsList.as_view(), name='user-treasury-bond-transactions'),
     path('users/<int:user_id>/market_assets/', views.ObjectUserAssetsList.as_view(), name='user-assets'),
@@ -1,22 +1,95 @@
 from django.contrib.auth.models import User
-from django.db.models import Sum
-from django.core.exceptions import ValidationError, FieldError
+from django.core.exceptions import ValidationError
 from django.core.exceptions import PermissionDenied
 from django.http import Http404
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 
 from rest_framework.response import Response
 from rest_framework.decorators import api_view
 from rest_framework.generics import ListAPIView, RetrieveAPIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.reverse import reverse 
-from rest_framework import  permissions, viewsets
+from rest_framework import  permissions, status, viewsets
+from rest_framework.exceptions import ValidationError as APIValidationError
+from rest_framework.views import APIView
+from rest_framework.authtoken.models import Token
+from rest_framework.authtoken.serializers import AuthTokenSerializer
 
-from .models import Wallet, Account, Deposit, MarketAssetTransaction, TreasuryBondsTransaction, Withdrawal, UserAsset, UserTreasuryBonds
+from .models import Wallet, Account, Deposit, MarketAssetTransaction, TreasuryBondsTransaction, Withdrawal, UserAsset, UserTreasuryBonds, WalletDailySnapshot
 from .serializers import WalletSerializer, WalletCreateSerializer, UserSerializer, AccountSerializer, AccountCreateSerializer, DepositSerializer, DepositCreateSerializer, MarketAssetTransactionCreateSerializer, MarketAssetTransactionSerializer, WithdrawalSerializer, WithdrawalCreateSerializer, TreasuryBondsTransactionCreateSerializer, TreasuryBondsTransactionSerializer
 from .serializers import UserDetailedAssetSerializer, UserSimpleAssetSerializer, UserDetailedTreasuryBondsSerializer, UserSimpleTreasuryBondsSerializer
+from .serializers import WalletDailySnapshotSerializer, CurrencyPerformanceSerializer, AllocationSerializer, ReturnsSerializer
+from .services import downsample_snapshots, wallet_performance, wallet_allocation, wallet_returns, account_returns, import_market_transactions, fx_matrix, MissingExchangeRate
 
 from .permissions import IsOwnerOrCoOwner, IsOwner
-    
+from .access import can_access_account, can_access_wallet
+from .authentication import token_expires_at
+from .filters import MarketAssetTransactionFilterSet, TreasuryBondsTransactionFilterSet, UserAssetFilterSet, UserTreasuryBondsFilterSet
+
+
+class EagerQuerysetMixin:
+    """
+    Load the relations used by the serializer of the view together with its queryset, so that
+    listing does not query the database once per presented object
+    """
+
+    def get_queryset(self):
+
+        return self.eager_load(super().get_queryset())
+
+    def eager_load(self, queryset):
+
+        serializer_class = self.get_serializer_class()
+
+        if hasattr(serializer_class, 'setup_eager_loading'):
+            queryset = serializer_class.setup_eager_loading(queryset)
+
+        return queryset
+
+
+class ReportingCurrencyViewMixin:
+    """
+    Present the values of the view in the currency given by a query parameter, e.g. ?currency=EUR.
+    The cross rates of the latest currency prices are loaded once per request, or taken from the
+    cache, and shared by every presented object.
+    """
+
+    reporting_currency_param = 'currency'
+
+    def get_serializer_context(self):
+
+        context = super().get_serializer_context()
+
+        currency = self.request.query_params.get(self.reporting_currency_param)
+        if currency:
+            fx = fx_matrix()
+            if currency not in fx:
+                raise APIValidationError({self.reporting_currency_param: f'{currency} is not a known currency.'})
+
+            context.update(fx=fx, reporting_currency=currency)
+
+        return context
+
+
+class WalletObjectMixin:
+    """
+    Retrieve the wallet given by the wallet_id of the URL, provided the user may view it
+    """
+
+    def get_object(self):
+
+        try:
+            wallet = Wallet.objects.get(id=self.kwargs['wallet_id'])
+        except Wallet.DoesNotExist:
+            raise Http404({'wallet':'Wallet does not exist.'})
+
+        if not can_access_wallet(self.request.user, wallet):
+            raise PermissionDenied('You do not have permission to view this wallet.')
+
+        return wallet
+
+
 @api_view(['GET'])
 def api_root(request, format=None):
     return Response({
@@ -24,7 +97,7 @@ def api_root(request, format=None):
         'wallets': reverse('wallets-list', request=request, format=format)
     })
     
-class UserList(ListAPIView):
+class UserList(EagerQuerysetMixin, ListAPIView):
     """
     List all users.
     
@@ -38,6 +111,47 @@ class UserList(ListAPIView):
     serializer_class = UserSerializer
 
 
+class AuthTokenView(APIView):
+    """
+    Issue or revoke an authentication token.
+
+    POST checks the username and password once and returns the token of the user, issuing a
+    new one when the previous one expired. Later requests authenticate with the
+    "Authorization: Token <token>" header instead of the password. DELETE revokes the token
+    the request is authenticated with.
+    """
+
+    def get_permissions(self):
+
+        if self.request.method == 'DELETE':
+            return [IsAuthenticated()]
+        return [permissions.AllowAny()]
+
+    def post(self, request):
+
+        serializer = AuthTokenSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        user = serializer.validated_data['user']
+
+        token, created = Token.objects.get_or_create(user=user)
+        expires_at = token_expires_at(token)
+        if not created and expires_at is not None and expires_at <= timezone.now():
+            token.delete()
+            token = Token.objects.create(user=user)
+            expires_at = token_expires_at(token)
+
+        return Response({'token': token.key, 'expires_at': expires_at})
+
+    def delete(self, request):
+
+        if not isinstance(request.auth, Token):
+            raise APIValidationError({'token': 'The request is not authenticated with a token.'})
+
+        request.auth.delete()
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
 class UserDetail(RetrieveAPIView):
     """
     Retrieve a user.
@@ -54,7 +168,7 @@ class UserDetail(RetrieveAPIView):
     permission_classes = [IsOwnerOrCoOwner]
 
 
-class WalletViewSet(viewsets.ModelViewSet):
+class WalletViewSet(EagerQuerysetMixin, ReportingCurrencyViewMixin, viewsets.ModelViewSet):
     """
     Viewset for Wallet model.
     
@@ -95,7 +209,7 @@ class WalletViewSet(viewsets.ModelViewSet):
         return WalletSerializer
     
 
-class AccountViewSet(viewsets.ModelViewSet):
+class AccountViewSet(EagerQuerysetMixin, ReportingCurrencyViewMixin, viewsets.ModelViewSet):
     """
     Viewset for Account model.
     
@@ -137,7 +251,7 @@ class AccountViewSet(viewsets.ModelViewSet):
         return AccountSerializer
     
 
-class DepositViewSet(viewsets.ModelViewSet):
+class DepositViewSet(EagerQuerysetMixin, viewsets.ModelViewSet):
     """
     Viewset for Deposit model.
     
@@ -149,6 +263,7 @@ class DepositViewSet(viewsets.ModelViewSet):
     """
 
     queryset = Deposit.objects.all()
+    keyset_ordering = ('deposited_at', 'id')
     permission_classes = [permissions.IsAuthenticated]
     
     def get_permissions(self):
@@ -173,7 +288,7 @@ class DepositViewSet(viewsets.ModelViewSet):
             return DepositCreateSerializer
         return DepositSerializer
     
-class WithdrawalViewSet(viewsets.ModelViewSet):
+class WithdrawalViewSet(EagerQuerysetMixin, viewsets.ModelViewSet):
     """
     Viewset for Withdrawal model.
     
@@ -185,6 +300,7 @@ class WithdrawalViewSet(viewsets.ModelViewSet):
     """
 
     queryset = Withdrawal.objects.all()
+    keyset_ordering = ('withdrawn_at', 'id')
     permission_classes = [permissions.IsAuthenticated]
     
     def get_permissions(self):
@@ -209,7 +325,7 @@ class WithdrawalViewSet(viewsets.ModelViewSet):
             return WithdrawalCreateSerializer
         return WithdrawalSerializer
 
-class MarketAssetTransactionViewSet(viewsets.ModelViewSet):
+class MarketAssetTransactionViewSet(EagerQuerysetMixin, viewsets.ModelViewSet):
     """
     Viewset for Transaction model.
     
@@ -221,6 +337,7 @@ class MarketAssetTransactionViewSet(viewsets.ModelViewSet):
     """
 
     queryset = MarketAssetTransaction.objects.all()
+    keyset_ordering = ('transaction_date', 'id')
     permission_classes = [permissions.IsAuthenticated]
     
     def get_permissions(self):
@@ -245,7 +362,42 @@ class MarketAssetTransactionViewSet(viewsets.ModelViewSet):
             return MarketAssetTransactionCreateSerializer
         return MarketAssetTransactionSerializer
     
-class TreasuryBondsTransactionViewSet(viewsets.ModelViewSet):
+class MarketAssetTransactionBulkCreate(APIView):
+    """
+    Create a batch of market asset transactions, e.g. imported from a broker statement.
+
+    The body is a list of transactions with the fields of the market transaction API, or an
+    object with such a list under "transactions". The whole batch is validated before anything
+    is written; rejected rows are reported with their 1-based row number and nothing is created.
+
+    Query parameters:
+        dry_run: Only validate the batch.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+
+        rows = request.data.get('transactions') if isinstance(request.data, dict) else request.data
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise APIValidationError({'transactions': 'Expected a list of transactions.'})
+
+        dry_run = request.query_params.get('dry_run', '').lower() in ['1', 'true']
+        result = import_market_transactions(request.user, rows, dry_run=dry_run)
+
+        if not result.is_valid:
+            return Response(
+                {'errors': [{'row': row, 'errors': errors} for row, errors in result.errors]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(
+            {'created': 0 if dry_run else len(result.transactions), 'ids': [] if dry_run else [transaction.id for transaction in result.transactions]},
+            status=status.HTTP_200_OK if dry_run else status.HTTP_201_CREATED
+        )
+
+
+class TreasuryBondsTransactionViewSet(EagerQuerysetMixin, viewsets.ModelViewSet):
     """
     Viewset for Transaction model.
     
@@ -257,6 +409,7 @@ class TreasuryBondsTransactionViewSet(viewsets.ModelViewSet):
     """
 
     queryset = TreasuryBondsTransaction.objects.all()
+    keyset_ordering = ('transaction_date', 'id')
     permission_classes = [permissions.IsAuthenticated]
     
     def get_permissions(self):
@@ -282,7 +435,7 @@ class TreasuryBondsTransactionViewSet(viewsets.ModelViewSet):
         return TreasuryBondsTransactionSerializer
     
 
-class ObjectDependeciesList(ListAPIView):
+class ObjectDependeciesList(EagerQuerysetMixin, ListAPIView):
 
     permission_classes = [IsAuthenticated]
     
@@ -297,7 +450,7 @@ class ObjectDependeciesList(ListAPIView):
             except Account.DoesNotExist:
                 raise Http404({'account':'Account does not exist.'})
             
-            if self.request.user != account.owner and self.request.user not in account.co_owners.all():
+            if not can_access_account(self.request.user, account):
                 raise PermissionDenied('You do not have permission to view these transactions.')
             
         elif 'wallet_id' in self.kwargs:
@@ -309,7 +462,7 @@ class ObjectDependeciesList(ListAPIView):
             except Wallet.DoesNotExist:
                 raise Http404({'wallet':'Wallet does not exist.'})
             
-            if self.request.user != wallet.owner and self.request.user not in wallet.co_owners.all():
+            if not can_access_wallet(self.request.user, wallet):
                 raise PermissionDenied('You do not have permission to view these transactions.')
             
         elif 'user_id' in self.kwargs:
@@ -324,72 +477,48 @@ class ObjectDependeciesList(ListAPIView):
             if self.request.user != user:
                 raise PermissionDenied('You do not have permission to view these transactions.')
             
-        return queryset
+        return self.eager_load(queryset)
 
 
 class ObjectTreasuryBondsTransactionsList(ObjectDependeciesList):
 
     serializer_class = TreasuryBondsTransactionSerializer
     object_class = TreasuryBondsTransaction
+    filterset_class = TreasuryBondsTransactionFilterSet
+    keyset_ordering = ('transaction_date', 'id')
     
     def get_queryset(self):
-        
-        params = self.request.query_params
-        queryset = super().get_queryset()
-        
-        for param in params:
-            
-            try:
-                if param == 'currency':
-                    queryset = queryset.filter(currency__code=params[param])
-                    continue
-                elif param == 'after':
-                    queryset = queryset.filter(transaction_date__gte=params[param])
-                    continue
-                elif param == 'before':
-                    queryset = queryset.filter(transaction_date__lte=params[param])
-                    continue
-                else:
-                    queryset = queryset.filter(**{param: params[param]})
-            except FieldError:
-                pass
-        
-        return queryset    
+
+        return self.filterset_class.filter_queryset(super().get_queryset(), self.request.query_params)
+
 
 class ObjectMarketTransactionsList(ObjectDependeciesList):
 
     serializer_class = MarketAssetTransactionSerializer
     object_class = MarketAssetTransaction
+    filterset_class = MarketAssetTransactionFilterSet
+    keyset_ordering = ('transaction_date', 'id')
    
     def get_queryset(self):
 
-        params = self.request.query_params
-        queryset = super().get_queryset()
-        
-        for param in params:
+        return self.filterset_class.filter_queryset(super().get_queryset(), self.request.query_params)
 
-            try:
-                if param == 'currency':
-                    queryset = queryset.filter(currency__code=params[param])
-                    continue
-                elif param == 'after':
-                    queryset = queryset.filter(transaction_date__gte=params[param])
-                    continue
-                elif param == 'before':
-                    queryset = queryset.filter(transaction_date__lte=params[param])
-                    continue
-                else:
-                    queryset = queryset.filter(**{param: params[param]})
-            except FieldError:
-                pass
-
-        return queryset
     
 
-class ObjectUserAssetsList(ObjectDependeciesList):
+class ObjectUserAssetsList(ReportingCurrencyViewMixin, ObjectDependeciesList):
 
     serializer_class = UserDetailedAssetSerializer
     object_class = UserAsset
+    filterset_class = UserAssetFilterSet
+    # currency filters the lots by their account currency
+    reporting_currency_param = 'reporting_currency'
+
+    @property
+    def keyset_ordering(self):
+
+        if "detailed" in self.request.query_params:
+            return ('created_at', 'id')
+        return ('label',)
 
     def get_serializer_class(self):
     
@@ -405,26 +534,21 @@ class ObjectUserAssetsList(ObjectDependeciesList):
 
         if "all" not in params:
             queryset = queryset.filter(active=True)
-        
-        for param in params:
-            try:
-                if param == 'currency':
-                    queryset = queryset.filter(currency__code=params[param])
-                    continue
-                else:
-                    queryset = queryset.filter(**{param: params[param]})
-            except FieldError:
-                pass
+
+        queryset = self.filterset_class.filter_queryset(queryset, params)
 
         if 'detailed' not in params:
-            queryset = queryset.values('asset').annotate(amount=Sum('amount'))
+            queryset = queryset.holdings()
         
         return queryset
     
-class ObjectUserTreasuryBondsList(ObjectDependeciesList):
+class ObjectUserTreasuryBondsList(ReportingCurrencyViewMixin, ObjectDependeciesList):
 
     serializer_class = UserDetailedTreasuryBondsSerializer
     object_class = UserTreasuryBonds
+    filterset_class = UserTreasuryBondsFilterSet
+    reporting_currency_param = 'reporting_currency'
+    keyset_ordering = ('created_at', 'id')
 
     def get_serializer_class(self):
     
@@ -440,21 +564,160 @@ class ObjectUserTreasuryBondsList(ObjectDependeciesList):
 
         if "all" not in params:
             queryset = queryset.filter(active=True)
-        
-        for param in params:
-            try:
-                queryset = queryset.filter(**{param: params[param]})
-            except FieldError:
-                pass
-        
+
+        return self.filterset_class.filter_queryset(queryset, params)
+
+class WalletHistoryList(ObjectDependeciesList):
+    """
+    List the daily value history of a wallet.
+
+    The history is read from the precomputed wallet snapshots with a single range scan.
+
+    Query parameters:
+        after: The first day of the history (YYYY-MM-DD).
+        before: The last day of the history (YYYY-MM-DD).
+        interval: One of day, week or month. With week or month only the last snapshot of every period is returned.
+    """
+
+    serializer_class = WalletDailySnapshotSerializer
+    object_class = WalletDailySnapshot
+    pagination_class = None
+
+    INTERVALS = ['day', 'week', 'month']
+
+    def get_queryset(self):
+
+        params = self.request.query_params
+        queryset = super().get_queryset().order_by('date')
+
+        for param, lookup in [('after', 'date__gte'), ('before', 'date__lte')]:
+            if param in params:
+                date = parse_date(params[param]) if params[param] else None
+                if date is None:
+                    raise APIValidationError({param: 'Date has wrong format. Use YYYY-MM-DD.'})
+                queryset = queryset.filter(**{lookup: date})
+
         return queryset
 
-from django.http import HttpResponse
+    def list(self, request, *args, **kwargs):
+
+        interval = request.query_params.get('interval', 'day')
+        if interval not in self.INTERVALS:
+            raise APIValidationError({'interval': f'Interval must be one of: {", ".join(self.INTERVALS)}.'})
+
+        snapshots = downsample_snapshots(self.get_queryset().iterator(), interval)
+
+        return Response(self.get_serializer(snapshots, many=True).data)
+
+
+class WalletPerformanceView(WalletObjectMixin, RetrieveAPIView):
+    """
+    Report the performance of a wallet per currency.
+
+    Every currency lists the net deposits, the fees paid, the realized profit of the sold lots,
+    the unrealized profit of the held lots and the current value of the held lots.
+    """
+
+    serializer_class = CurrencyPerformanceSerializer
+    permission_classes = [IsAuthenticated]
+
+    def retrieve(self, request, *args, **kwargs):
+
+        wallet = self.get_object()
+
+        return Response({
+            'wallet': wallet.id,
+            'currencies': self.get_serializer(wallet_performance(wallet), many=True).data
+        })
+
+
+class WalletAllocationView(WalletObjectMixin, ReportingCurrencyViewMixin, RetrieveAPIView):
+    """
+    Report the allocation of a wallet by asset type and by country.
+
+    ETFs are looked through by their asset type splits, the countries are those of the companies,
+    funds and bond issuers. The values are in the base currency, or in the one given with ?currency=.
+    """
+
+    serializer_class = AllocationSerializer
+    permission_classes = [IsAuthenticated]
+
+    def retrieve(self, request, *args, **kwargs):
+
+        wallet = self.get_object()
+        context = self.get_serializer_context()
+
+        try:
+            allocation = wallet_allocation(wallet.id, context.get('reporting_currency'), context.get('fx'))
+        except MissingExchangeRate as e:
+            raise APIValidationError({'currency': str(e)})
+
+        return Response({'wallet': wallet.id, **self.get_serializer(allocation).data})
+
+
+class WalletReturnsView(WalletObjectMixin, ReportingCurrencyViewMixin, RetrieveAPIView):
+    """
+    Report the money-weighted (XIRR) and time-weighted returns of a wallet.
+
+    The deposits and withdrawals are converted with the rates of their own days, to the base
+    currency or to the one given with ?currency=. The time-weighted return is chained from the
+    daily snapshots of the wallet.
+    """
+
+    serializer_class = ReturnsSerializer
+    permission_classes = [IsAuthenticated]
+
+    def retrieve(self, request, *args, **kwargs):
+
+        wallet = self.get_object()
+        returns = wallet_returns(wallet.id, self.get_serializer_context().get('reporting_currency'))
+
+        return Response({'wallet': wallet.id, **self.get_serializer(returns).data})
+
+
+class AccountReturnsView(ReportingCurrencyViewMixin, RetrieveAPIView):
+    """
+    Report the money-weighted (XIRR) return of an account.
+
+    The deposits and withdrawals are converted with the rates of their own days, to the base
+    currency or to the one given with ?currency=. Accounts have no daily snapshots, so their
+    time-weighted return is always null.
+    """
+
+    serializer_class = ReturnsSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_object(self):
+
+        try:
+            account = Account.objects.get(id=self.kwargs['account_id'])
+        except Account.DoesNotExist:
+            raise Http404({'account':'Account does not exist.'})
+
+        if not can_access_account(self.request.user, account):
+            raise PermissionDenied('You do not have permission to view this account.')
+
+        return account
+
+    def retrieve(self, request, *args, **kwargs):
+
+        account = self.get_object()
+        returns = account_returns(account.id, self.get_serializer_context().get('reporting_currency'))
+
+        return Response({'account': account.id, **self.get_serializer(returns).data})
+
+
+from django.http import HttpResponse, HttpResponseBadRequest
 
 def AccountTest(account_id):
 
     wallet = Wallet.objects.get(id=1)
 
+    try:
+        cash_balance, current_value = wallet.cash_balance, wallet.current_value
+    except MissingExchangeRate as e:
+        return HttpResponseBadRequest(str(e))
+
     free_cash = {}
     for account in wallet.accounts.all():
         if len(account.wallets.all()) == 1:
@@ -467,7 +730,7 @@ def AccountTest(account_id):
 
     html =f'''
     <h1>Wallet: {wallet.name}</h1>
-    <h2>Deposited: {wallet.cash_balance}</h2>
+    <h2>Deposited: {cash_balance}</h2>
     <h2>Free cash:</h2>
     <ul>
     '''
@@ -476,12 +739,12 @@ def AccountTest(account_id):
         if free_cash[key] != 0:
             html += f'<li><h3>{key}: {free_cash[key]}</h3></li>'
 
-    html +=f'</ul><h2>Curent assets value: {wallet.current_value}</h2>'
+    html +=f'</ul><h2>Curent assets value: {current_value}</h2>'
 
 
-    html += f'<h1>Total wallet value: {wallet.current_value + sum(free_cash.values())}</h1>'
+    html += f'<h1>Total wallet value: {current_value + sum(free_cash.values())}</h1>'
 
-    html += f'<h1>Income: {wallet.current_value + sum(free_cash.values()) - wallet.cash_balance}</h1>'
+    html += f'<h1>Income: {current_value + sum(free_cash.values()) - cash_balance}</h1>'
 
     
     propotion = wallet.wallet_proportion